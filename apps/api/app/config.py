@@ -27,8 +27,30 @@ def _env_flag(*names: str) -> bool | None:
 class Settings(BaseSettings):
     OPENAI_API_KEY: str | None = None
     OPENAI_BASE_URL: str | None = None
-    SESSION_TTL_MINUTES: int = 30
+    SESSION_TTL_MINUTES: int = 30  # idle time since last use
+    SESSION_REAPER_INTERVAL_SECONDS: int = 30
+    SESSION_INDEX_MEMORY_BUDGET_MB: int = 1024  # 0 disables spilling
+    SESSION_INDEX_SPILL_DIR: str | None = None  # defaults to <tmp>/rag-index-spill
+    SESSION_IDLE_COMPRESS_MINUTES: int = 0  # opt-in: compress indexes unread this long; 0 disables
+    SESSION_IDLE_EMBEDDINGS: str = "float16"  # float16 | int8 (lossy) | disk | keep (lossless)
+    SESSION_PERSIST_DIR: str | None = None  # unset keeps sessions in memory only
+    SESSION_BACKEND: str = "memory"  # memory | sqlite (shared across worker processes)
+    SESSION_SQLITE_PATH: str | None = None  # defaults to <SESSION_PERSIST_DIR>/sessions.sqlite3
+    SESSION_LOCK_STRIPES: int = 64  # lock stripes guarding per-session updates
+    SESSION_SNAPSHOT_PATH: str | None = None  # restored on startup when the file exists
+    SESSION_SNAPSHOT_ON_SHUTDOWN: bool = False  # export to SESSION_SNAPSHOT_PATH when draining
+    SESSION_SNAPSHOT_WORKERS: int = 4
     EMBEDDINGS_PROVIDER: str = "openai"
+    EMBED_BATCH_SIZE: int = 256
+    VECTOR_STORE_MODE: str = (
+        "session"  # 'session' (one FAISS index per session) or 'global' (shared ANN index)
+    )
+    GLOBAL_INDEX_TYPE: str = "flat"  # flat | hnsw | ivf
+    GLOBAL_INDEX_HNSW_M: int = 32
+    GLOBAL_INDEX_HNSW_EF_SEARCH: int = 64
+    GLOBAL_INDEX_IVF_NLIST: int = 1024
+    GLOBAL_INDEX_IVF_NPROBE: int = 16
+    GLOBAL_INDEX_COMPACT_RATIO: float = 0.25  # tombstoned share of vectors that triggers a rebuild
     GOOGLE_AUTH_ENABLED: bool = Field(
         default=False,
         validation_alias=AliasChoices(
@@ -45,7 +67,18 @@ class Settings(BaseSettings):
     MAX_FILES_PER_UPLOAD: int = 20
     MAX_FILE_MB: int = 100
     MAX_PAGES_PER_PDF: int = 2000
+    PDF_EXTRACTION_MODE: str = (
+        "layout"  # 'layout' strips repeated headers/footers, 'plain' keeps raw page text
+    )
+    PDF_BOILERPLATE_MARGIN: float = 0.12
     MAX_QUERIES_PER_SESSION: int = 20
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_QUERY_CONCURRENCY: int = 8  # concurrent /query answers
+    ADMISSION_ADVANCED_CONCURRENCY: int = 4
+    ADMISSION_ANSWER_CONCURRENCY: int = 8
+    ADMISSION_COMPARE_CONCURRENCY: int = 2
+    ADMISSION_QUEUE_SIZE: int = 32  # waiters per endpoint before shedding with 503
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0
     SIMILARITY_FLOOR: float = 0.18
     MAX_RETRIEVED: int = 8
     MIN_RETRIEVAL_SIMILARITY: float | None = None  # legacy override hook
@@ -68,6 +101,8 @@ class Settings(BaseSettings):
     MMR_LAMBDA: float = 0.7
     ANSWER_TOP_K: int = 8
     FALLBACK_WIDEN_K: int = 30
+    NEAR_DEDUP_ENABLED: bool = False
+    NEAR_DEDUP_MAX_DISTANCE: int = 3
     GRAPH_ENABLED: bool = Field(
         default=False,
         validation_alias=AliasChoices("GRAPH_ENABLED", "RAG_GRAPH_ENABLED"),
@@ -75,8 +110,32 @@ class Settings(BaseSettings):
     GRAPH_BACKEND: str = Field(
         default="memory",
         validation_alias=AliasChoices("GRAPH_BACKEND", "RAG_GRAPH_BACKEND"),
+    )  # memory | sqlite (out-of-core, one database file per index)
+    GRAPH_SQLITE_DIR: str | None = (
+        None  # defaults to <SESSION_PERSIST_DIR>/graphs, else temporary files
     )
+    GRAPH_SQLITE_MAX_MB: int = 1024  # LRU databases not open are evicted above this (0 = unbounded)
     MAX_GRAPH_HOPS: int = 2
+    GRAPH_SCORER: str = (
+        "ppr"  # ppr (personalized PageRank) | bfs (discovery order) | cooccurrence (entity 2-hop)
+    )
+    GRAPH_MAX_CANDIDATES: int = 10  # graph sections passed on to merging and reranking
+    GRAPH_PPR_ALPHA: float = 0.15  # restart probability
+    GRAPH_PPR_MAX_ITER: int = 30
+    GRAPH_BUILD_MODE: str = (
+        "lazy"  # lazy (first advanced query) | background (after indexing) | eager
+    )
+    GRAPH_BUILD_WORKERS: int = 0  # entity extraction processes; 0 = min(4, CPUs), 1 = serial
+    GRAPH_BUILD_BATCH_CHUNKS: int = 256
+    GRAPH_BUILD_PARALLEL_MIN_CHUNKS: int = 1024  # smaller corpora are not worth the IPC
+    GRAPH_CACHE_ENABLED: bool = True  # reuse graphs built from the same documents and chunking
+    GRAPH_CACHE_DIR: str | None = None  # defaults to <tmp>/rag-graph-cache
+    GRAPH_CACHE_MAX_MB: int = (
+        256  # least recently used entries are evicted above this (0 = unbounded)
+    )
+    GRAPH_ENTITY_CACHE_CHUNKS: int = (
+        200_000  # per-chunk entity extraction results kept in memory; 0 disables
+    )
     LLM_RERANK_ENABLED: bool = Field(
         default=False,
         validation_alias=AliasChoices("LLM_RERANK_ENABLED", "RAG_LLM_RERANK_ENABLED"),
@@ -135,7 +194,9 @@ class Settings(BaseSettings):
     )
     ANSWER_MAX_TOKENS: int = Field(
         default=800,
-        validation_alias=AliasChoices("ANSWER_MAX_TOKENS", "ANSWER__MAX_TOKENS", "RAG_ANSWER_MAX_TOKENS"),
+        validation_alias=AliasChoices(
+            "ANSWER_MAX_TOKENS", "ANSWER__MAX_TOKENS", "RAG_ANSWER_MAX_TOKENS"
+        ),
     )
     ANSWER_TEMP: float = Field(
         default=0.2,
@@ -157,6 +218,19 @@ class Settings(BaseSettings):
         default=1,
         validation_alias=AliasChoices("GCS_INGESTION_TTL_DAYS", "RAG_GCS_INGESTION_TTL_DAYS"),
     )
+    GCS_INGESTION_BACKEND: str = (
+        "gcs"  # 'gcs' or 'local' (filesystem stand-in rooted at GCS_INGESTION_LOCAL_ROOT)
+    )
+    GCS_INGESTION_LOCAL_ROOT: str | None = None
+    GCS_INGESTION_MAX_WORKERS: int = 8
+    GCS_INGESTION_STREAM_THRESHOLD_MB: int = 16
+    GCS_INGESTION_CHUNK_MB: int = 8
+    EXTRACT_CACHE_ENABLED: bool = True
+    EXTRACT_CACHE_DIR: str | None = None  # defaults to <tmp>/rag-extract-cache
+    EXTRACT_CACHE_MAX_MB: int = (
+        256  # least recently used entries are evicted above this (0 = unbounded)
+    )
+    EXTRACT_CACHE_GCS_SIDECAR: bool = False
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
@@ -199,9 +273,48 @@ class Settings(BaseSettings):
     def _finalize(self) -> "Settings":
         if self.MIN_RETRIEVAL_SIMILARITY is not None:
             object.__setattr__(self, "SIMILARITY_FLOOR", self.MIN_RETRIEVAL_SIMILARITY)
-        object.__setattr__(self, "RETRIEVER_STRATEGY", (self.RETRIEVER_STRATEGY or "hybrid").strip().lower())
-        object.__setattr__(self, "RERANK_STRATEGY", (self.RERANK_STRATEGY or "none").strip().lower())
-        object.__setattr__(self, "GRAPH_BACKEND", (self.GRAPH_BACKEND or "memory").strip().lower())
+        object.__setattr__(
+            self, "RETRIEVER_STRATEGY", (self.RETRIEVER_STRATEGY or "hybrid").strip().lower()
+        )
+        object.__setattr__(
+            self, "RERANK_STRATEGY", (self.RERANK_STRATEGY or "none").strip().lower()
+        )
+        graph_backend = (self.GRAPH_BACKEND or "memory").strip().lower()
+        object.__setattr__(
+            self,
+            "GRAPH_BACKEND",
+            graph_backend if graph_backend in {"memory", "sqlite"} else "memory",
+        )
+        if self.GRAPH_BUILD_WORKERS <= 0:
+            object.__setattr__(self, "GRAPH_BUILD_WORKERS", min(4, os.cpu_count() or 1))
+        build_mode = (self.GRAPH_BUILD_MODE or "lazy").strip().lower()
+        object.__setattr__(
+            self,
+            "GRAPH_BUILD_MODE",
+            build_mode if build_mode in {"lazy", "background", "eager"} else "lazy",
+        )
+        graph_scorer = (self.GRAPH_SCORER or "ppr").strip().lower()
+        object.__setattr__(
+            self,
+            "GRAPH_SCORER",
+            graph_scorer if graph_scorer in {"ppr", "bfs", "cooccurrence"} else "ppr",
+        )
+        store_mode = (self.VECTOR_STORE_MODE or "session").strip().lower()
+        object.__setattr__(
+            self,
+            "VECTOR_STORE_MODE",
+            store_mode if store_mode in {"session", "global"} else "session",
+        )
+        index_type = (self.GLOBAL_INDEX_TYPE or "flat").strip().lower()
+        object.__setattr__(
+            self,
+            "GLOBAL_INDEX_TYPE",
+            index_type if index_type in {"flat", "hnsw", "ivf"} else "flat",
+        )
+        pdf_mode = (self.PDF_EXTRACTION_MODE or "layout").strip().lower()
+        object.__setattr__(
+            self, "PDF_EXTRACTION_MODE", pdf_mode if pdf_mode in {"layout", "plain"} else "layout"
+        )
         if self.EMBEDDINGS_PROVIDER != "fake" and not self.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY is required unless EMBEDDINGS_PROVIDER=fake")
         if not self.SESSION_SECRET:
@@ -213,7 +326,9 @@ class Settings(BaseSettings):
             if not self.GOOGLE_CLIENT_ID:
                 raise ValueError("GOOGLE_CLIENT_ID is required when GOOGLE_AUTH_ENABLED=true")
             if not os.getenv("SESSION_SECRET"):
-                raise ValueError("SESSION_SECRET environment variable is required when GOOGLE_AUTH_ENABLED=true")
+                raise ValueError(
+                    "SESSION_SECRET environment variable is required when GOOGLE_AUTH_ENABLED=true"
+                )
         prefix = (self.GCS_INGESTION_PREFIX or "uploads/").strip()
         prefix = prefix.lstrip("/")
         if prefix and not prefix.endswith("/"):
@@ -221,8 +336,31 @@ class Settings(BaseSettings):
         if not prefix:
             prefix = "uploads/"
         object.__setattr__(self, "GCS_INGESTION_PREFIX", prefix)
+        idle_embeddings = (self.SESSION_IDLE_EMBEDDINGS or "float16").strip().lower()
+        object.__setattr__(
+            self,
+            "SESSION_IDLE_EMBEDDINGS",
+            idle_embeddings
+            if idle_embeddings in {"float16", "int8", "disk", "keep"}
+            else "float16",
+        )
+        session_backend = (self.SESSION_BACKEND or "memory").strip().lower()
+        object.__setattr__(
+            self,
+            "SESSION_BACKEND",
+            session_backend if session_backend in {"memory", "sqlite"} else "memory",
+        )
+        backend = (self.GCS_INGESTION_BACKEND or "gcs").strip().lower()
+        object.__setattr__(
+            self, "GCS_INGESTION_BACKEND", backend if backend in {"gcs", "local"} else "gcs"
+        )
         if self.GCS_INGESTION_ENABLED:
-            if not self.GCS_INGESTION_BUCKET:
+            if self.GCS_INGESTION_BACKEND == "local":
+                if not self.GCS_INGESTION_LOCAL_ROOT:
+                    raise ValueError(
+                        "GCS_INGESTION_LOCAL_ROOT is required when GCS_INGESTION_BACKEND=local"
+                    )
+            elif not self.GCS_INGESTION_BUCKET:
                 raise ValueError("GCS_INGESTION_BUCKET is required when GCS_INGESTION_ENABLED=true")
             if self.GCS_INGESTION_TTL_DAYS <= 0:
                 raise ValueError("GCS_INGESTION_TTL_DAYS must be greater than zero")
@@ -1,12 +1,62 @@
+import asyncio
+import contextlib
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import settings
 from .middleware import cleanup_session_middleware
+from .routers import (
+    answer,
+    auth,
+    compare,
+    debug,
+    feedback,
+    health,
+    ingest,
+    metrics,
+    query,
+    query_advanced,
+    snapshots,
+)
 from .services.cors import cors_config_summary
-from .routers import answer, auth, compare, debug, feedback, health, ingest, metrics, query, query_advanced
+from .services.graph import shutdown_extract_pool
+from .services.graph_build import shutdown_graph_builds
+from .services.session import restore_persisted_sessions, run_session_reaper
+from .services.snapshot import export_snapshot, import_snapshot
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    snapshot_path = settings.SESSION_SNAPSHOT_PATH
+    if snapshot_path and await asyncio.to_thread(os.path.isfile, snapshot_path):
+        try:
+            report = await asyncio.to_thread(import_snapshot, snapshot_path)
+            print(
+                f"[SESSIONS] restored {report['restored']} session(s) from snapshot in {report['ms']:.0f} ms"
+            )
+        except Exception as exc:  # a bad snapshot must not keep the instance from starting
+            print(f"[SESSIONS] snapshot restore failed: {exc}")
+    restored = restore_persisted_sessions()
+    if restored:
+        print(f"[SESSIONS] restored {restored} persisted session(s)")
+    reaper = asyncio.create_task(run_session_reaper())
+    try:
+        yield
+    finally:
+        reaper.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await reaper
+        shutdown_graph_builds()
+        shutdown_extract_pool()
+        if snapshot_path and settings.SESSION_SNAPSHOT_ON_SHUTDOWN:
+            report = await asyncio.to_thread(export_snapshot, snapshot_path)
+            print(f"[SESSIONS] exported {report['exported']} session(s) to {snapshot_path}")
+
 
-app = FastAPI(title="RAG Playground API", version="0.1.0")
+app = FastAPI(title="RAG Playground API", version="0.1.0", lifespan=lifespan)
 
 cors_origins, cors_source = cors_config_summary(settings.ALLOW_ORIGINS)
 print(f"[CONFIG] cors allow_origins={cors_origins} source={cors_source}")
@@ -31,3 +81,4 @@ app.include_router(answer.router, prefix="/api")
 app.include_router(debug.router)
 app.include_router(metrics.router, prefix="/api")
 app.include_router(feedback.router, prefix="/api")
+app.include_router(snapshots.router, prefix="/api")
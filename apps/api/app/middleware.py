@@ -1,9 +1,12 @@
 from fastapi import Request
 
-from .services.session import cleanup_expired_sessions
+from .services.session import cleanup_expired_sessions, reaper_running
 
 
 async def cleanup_session_middleware(request: Request, call_next):
-    cleanup_expired_sessions()
+    # The lifespan reaper normally handles expiry; this O(1) heap peek only covers
+    # deployments where the lifespan task is not running.
+    if not reaper_running():
+        cleanup_expired_sessions()
     response = await call_next(request)
     return response
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends
 from fastapi.responses import StreamingResponse
 
 from ..schemas import AnswerFromSnippetsRequest
+from ..services.admission import admit, release_after
 from ..services.generate import stream_answer
 from ..services.session_auth import SessionUser, get_session_user, maybe_require_auth
 
@@ -23,10 +24,11 @@ async def answer_from_snippets(
 ):
     maybe_require_auth(user)
     pairs = [(snippet.rank, snippet.text) for snippet in req.snippets]
+    ticket = await admit("answer")
     gen = stream_answer(
         prompt=req.prompt,
         snippets=pairs,
         model=req.model,
         temperature=req.temperature,
     )
-    return StreamingResponse(sse_wrap(gen), media_type="text/event-stream")
+    return StreamingResponse(release_after(ticket, sse_wrap(gen)), media_type="text/event-stream")
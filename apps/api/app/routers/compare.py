@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 from ..schemas import CompareRequest
+from ..services.admission import admit
 from ..services.chunk import chunk_text
 from ..services.embed import embed_texts
 from ..services.index import build_faiss_index, search_index
@@ -24,7 +26,7 @@ async def compare(req: CompareRequest, user: SessionUser | None = Depends(get_se
         all_chunks = []
         for doc_id, doc in sess["docs"].items():
             chunks = chunk_text(doc["text"], chunk_size=profile.chunk_size, overlap=profile.overlap)
-            for (start, end, ch_txt) in chunks:
+            for start, end, ch_txt in chunks:
                 chunk_map.append((doc_id, start, end, ch_txt))
                 all_chunks.append(ch_txt)
         X = embed_texts(all_chunks)
@@ -36,9 +38,16 @@ async def compare(req: CompareRequest, user: SessionUser | None = Depends(get_se
             if row_idx < 0 or row_idx >= len(chunk_map):
                 continue
             (doc_id, start, end, txt) = chunk_map[row_idx]
-            retrieved.append({"rank": rank, "doc_id": doc_id, "start": start, "end": end, "text": txt})
+            retrieved.append(
+                {"rank": rank, "doc_id": doc_id, "start": start, "end": end, "text": txt}
+            )
         return retrieved
 
-    a = build_profile(req.profile_a)
-    b = build_profile(req.profile_b)
+    ticket = await admit("compare")
+    try:
+        a = await run_in_threadpool(build_profile, req.profile_a)
+        b = await run_in_threadpool(build_profile, req.profile_b)
+    finally:
+        if ticket is not None:
+            ticket.release()
     return {"profile_a": a, "profile_b": b}
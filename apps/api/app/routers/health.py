@@ -2,8 +2,8 @@ from fastapi import APIRouter
 
 from ..config import settings
 from ..services.cors import cors_config_summary
-from ..services.reranker import ce_available, llm_available, effective_strategy
 from ..services.gcs_ingestion import get_gcs_ingestion_config
+from ..services.reranker import ce_available, effective_strategy, llm_available
 from ..services.runtime_config import (
     get_runtime_config,
     get_runtime_config_metadata,
@@ -57,6 +57,7 @@ async def health_details():
             "bucket": gcs_cfg.bucket,
             "prefix": gcs_cfg.prefix,
             "ttl_days": gcs_cfg.ttl_days,
+            "backend": gcs_cfg.backend,
         },
         "version": "local-dev",
     }
@@ -1,24 +1,39 @@
 from __future__ import annotations
 
+import hashlib
+import importlib.util
+import json
 import uuid
-from typing import List
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator, List, Tuple
 
 import numpy as np
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 
 from ..config import settings
-from ..schemas import IndexRequest, IndexResponse, UploadResponse
-from ..services.chunk import chunk_text
-from ..services.embed import embed_texts
-from ..services.extract import extract_text_from_pdf_bytes, extract_text_from_txt_bytes
-from ..services.graph import build_graph_store
-from ..services import gcs_ingestion
-from ..services.index import build_faiss_index
-from ..services.retrieve import build_bm25
-from ..services.session import SessionIndex, ensure_session, new_session, set_session_index
+from ..schemas import IndexedDocumentStats, IndexRequest, IndexResponse, UploadResponse
+from ..services import gcs_ingestion, text_cache
+from ..services.chunk import chunk_text, estimate_chunk_count, iter_token_chunks
+from ..services.dedup import ChunkDeduper, content_hash, doc_id_for_hash
+from ..services.embed import embed_stream
+from ..services.extract import ExtractedText, extract_pdf, extract_text_from_txt_bytes, open_pdf
+from ..services.graph_build import build_session_graph, schedule_session_graph
+from ..services.index import build_session_vector_index
 from ..services.observability import record_index_built
-from ..services.session_auth import SessionUser, get_session_user, maybe_require_auth
+from ..services.retrieve import build_bm25
 from ..services.runtime_config import get_runtime_config
+from ..services.session import (
+    SessionIndex,
+    ensure_session,
+    new_session,
+    save_session,
+    session_lock,
+    set_session_index,
+    share_session_index,
+)
+from ..services.session_auth import SessionUser, get_session_user, maybe_require_auth
 
 router = APIRouter()
 
@@ -32,43 +47,124 @@ def _detect_file_type(filename: str) -> str:
     raise HTTPException(status_code=400, detail="Unsupported file type; use PDF, TXT, or MD.")
 
 
-def _extract_text_from_bytes(data: bytes, filename: str) -> str:
+def _extract_text(source: bytes | Path, filename: str) -> ExtractedText:
     file_type = _detect_file_type(filename)
     if file_type == "pdf":
+        if importlib.util.find_spec("fitz") is None:
+            raise HTTPException(status_code=500, detail="PDF support not available")
         try:
-            import fitz  # type: ignore[attr-defined]
-        except ImportError as exc:
-            raise HTTPException(status_code=500, detail="PDF support not available") from exc
-        try:
-            with fitz.open(stream=data, filetype="pdf") as doc:
+            with open_pdf(source) as doc:
                 if doc.page_count > settings.MAX_PAGES_PER_PDF:
                     raise HTTPException(
                         status_code=413,
                         detail=f"PDF too long: max {settings.MAX_PAGES_PER_PDF} pages",
                     )
-            return extract_text_from_pdf_bytes(data)
+            return extract_pdf(
+                source,
+                strip_boilerplate=settings.PDF_EXTRACTION_MODE == "layout",
+                margin=settings.PDF_BOILERPLATE_MARGIN,
+            )
         except HTTPException:
             raise
         except Exception as exc:
             raise HTTPException(status_code=400, detail="Failed to read PDF") from exc
-    return extract_text_from_txt_bytes(data)
+    data = source.read_bytes() if isinstance(source, Path) else source
+    return ExtractedText(text=extract_text_from_txt_bytes(data))
+
+
+def _fetch_gcs_source(doc: dict) -> bytes | Path:
+    """Download a GCS-backed document; large objects are streamed to a temp file."""
+    object_path = doc.get("object_path")
+    if not object_path:
+        raise HTTPException(status_code=500, detail="Document missing GCS object path.")
+    threshold = settings.GCS_INGESTION_STREAM_THRESHOLD_MB * 1024 * 1024
+    try:
+        if int(doc.get("size") or 0) > threshold:
+            suffix = Path(doc.get("name") or "").suffix
+            return gcs_ingestion.download_blob_to_tempfile(object_path, suffix=suffix)
+        return gcs_ingestion.download_blob_bytes(object_path)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
 
 
-def _load_document_text(session_id: str, doc_id: str, doc: dict) -> str:
+def _gcs_cache_key(doc: dict) -> str | None:
+    digest = doc.get("content_hash")
+    if not digest:
+        return None
+    return text_cache.cache_key(digest, _detect_file_type(doc.get("name") or "document"))
+
+
+def _fetch_gcs_document(doc: dict) -> ExtractedText | bytes | Path:
+    """Return cached extracted text when available, otherwise the raw object."""
+    key = _gcs_cache_key(doc)
+    if key:
+        cached = text_cache.load_extracted(key)
+        if cached is not None:
+            return cached
+    return _fetch_gcs_source(doc)
+
+
+def _load_document_text(
+    session_id: str,
+    doc_id: str,
+    doc: dict,
+    source: ExtractedText | bytes | Path | None = None,
+) -> ExtractedText:
     storage = doc.get("storage") or "memory"
     if storage == "gcs":
-        object_path = doc.get("object_path")
-        if not object_path:
-            raise HTTPException(status_code=500, detail="Document missing GCS object path.")
+        raw = source if source is not None else _fetch_gcs_document(doc)
+        if isinstance(raw, ExtractedText):
+            return raw
         try:
-            raw = gcs_ingestion.download_blob_bytes(object_path)
-        except RuntimeError as exc:
-            raise HTTPException(status_code=500, detail=str(exc)) from exc
-        return _extract_text_from_bytes(raw, doc.get("name") or "document")
+            extracted = _extract_text(raw, doc.get("name") or "document")
+        finally:
+            if isinstance(raw, Path):
+                raw.unlink(missing_ok=True)
+        key = _gcs_cache_key(doc)
+        if key:
+            text_cache.store_extracted(key, extracted)
+        return extracted
     text = doc.get("text")
     if text is None:
         raise HTTPException(status_code=500, detail="Document text missing.")
-    return text
+    extraction = doc.get("extraction") or {}
+    return ExtractedText(
+        text=text,
+        page_offsets=list(doc.get("page_offsets") or [0]),
+        boilerplate_lines_removed=int(extraction.get("boilerplate_lines_removed", 0)),
+        boilerplate_chars_removed=int(extraction.get("boilerplate_chars_removed", 0)),
+        boilerplate_bytes_removed=int(extraction.get("boilerplate_bytes_removed", 0)),
+    )
+
+
+def _discard_source(source: ExtractedText | bytes | Path | None) -> None:
+    if isinstance(source, Path):
+        source.unlink(missing_ok=True)
+
+
+def _iter_loaded_documents(
+    session_id: str, docs: dict
+) -> Iterator[Tuple[str, dict, ExtractedText]]:
+    """Yield extracted documents in order while GCS downloads run ahead on the transfer pool.
+
+    Only the network fetch (or extract-cache lookup) is parallel; PDF parsing stays
+    on the calling thread because PyMuPDF is not thread-safe.
+    """
+    items = list(docs.items())
+
+    def fetch(item: Tuple[str, dict]) -> ExtractedText | bytes | Path | None:
+        _doc_id, doc = item
+        if (doc.get("storage") or "memory") != "gcs":
+            return None
+        return _fetch_gcs_document(doc)
+
+    sources = gcs_ingestion.map_bounded(fetch, items, discard=_discard_source)
+    try:
+        for (doc_id, doc), source in zip(items, sources, strict=True):
+            yield doc_id, doc, _load_document_text(session_id, doc_id, doc, source)
+    finally:
+        # Deletes temp files of downloads that ran ahead if indexing stops early.
+        sources.close()
 
 
 @router.post("/upload", response_model=UploadResponse)
@@ -85,12 +181,18 @@ async def upload(
 
     sid = new_session()
     doc_ids = []
+    duplicate_files: List[str] = []
     sess = ensure_session(sid)
     gcs_cfg = gcs_ingestion.get_gcs_ingestion_config()
     use_gcs = gcs_cfg.enabled
-    if use_gcs and not gcs_cfg.bucket:
-        raise HTTPException(status_code=500, detail="GCS ingestion is enabled but the bucket is not configured.")
+    if use_gcs and gcs_cfg.backend != "local" and not gcs_cfg.bucket:
+        raise HTTPException(
+            status_code=500, detail="GCS ingestion is enabled but the bucket is not configured."
+        )
 
+    pending: List[
+        Tuple[str, str, str, bytes, str]
+    ] = []  # (doc_id, filename, content_type, data, digest)
     for f in files:
         data = await f.read()
         size_mb = len(data) / (1024 * 1024)
@@ -99,26 +201,128 @@ async def upload(
                 status_code=413,
                 detail=f"File {f.filename} exceeds {settings.MAX_FILE_MB} MB",
             )
-        doc_id = str(uuid.uuid4())
         filename = f.filename or "upload"
         _ = _detect_file_type(filename)  # validate extension early
-        if use_gcs:
-            try:
-                object_path = gcs_ingestion.upload_file_for_session(sid, doc_id, filename, data)
-            except RuntimeError as exc:
-                raise HTTPException(status_code=500, detail=str(exc)) from exc
+        digest = content_hash(data)
+        doc_id = doc_id_for_hash(digest)
+        if doc_id in doc_ids:
+            duplicate_files.append(filename)
+            continue
+        doc_ids.append(doc_id)
+        pending.append((doc_id, filename, f.content_type or "", data, digest))
+
+    if use_gcs:
+        try:
+            object_paths = gcs_ingestion.upload_files_for_session(
+                sid,
+                [(doc_id, filename, data) for doc_id, filename, _ctype, data, _digest in pending],
+            )
+        except RuntimeError as exc:
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+        for (doc_id, filename, content_type, data, digest), object_path in zip(
+            pending, object_paths, strict=True
+        ):
             sess["docs"][doc_id] = {
                 "name": filename,
                 "storage": "gcs",
                 "object_path": object_path,
-                "mime_type": f.content_type or "",
+                "mime_type": content_type,
                 "size": len(data),
+                "content_hash": digest,
             }
-        else:
-            text = _extract_text_from_bytes(data, filename)
-            sess["docs"][doc_id] = {"name": filename, "storage": "memory", "text": text}
-        doc_ids.append(doc_id)
-    return UploadResponse(session_id=sid, doc_ids=doc_ids)
+    else:
+        for doc_id, filename, _ctype, data, digest in pending:
+            extracted = _extract_text(data, filename)
+            sess["docs"][doc_id] = {
+                "name": filename,
+                "storage": "memory",
+                "text": extracted.text,
+                "page_offsets": extracted.page_offsets,
+                "extraction": extracted.stats(),
+                "content_hash": digest,
+            }
+    save_session(sid, sess)
+    return UploadResponse(session_id=sid, doc_ids=doc_ids, duplicate_files=duplicate_files)
+
+
+def _corpus_share_key(
+    docs: dict, req: IndexRequest, near_dedup: bool, graph_enabled: bool
+) -> str | None:
+    """Key identifying an index by its inputs, so identical corpora can share one copy.
+
+    Content-addressed doc ids make the chunk map itself identical across sessions;
+    names only matter when the graph (which records document titles) is built.
+    """
+    hashes = [doc.get("content_hash") for doc in docs.values()]
+    if not hashes or not all(hashes):
+        return None
+    inputs = {
+        "docs": sorted(
+            [doc["content_hash"], doc.get("name") if graph_enabled else None]
+            for doc in docs.values()
+        ),
+        "chunker": req.chunker,
+        "chunking": [req.chunk_tokens, req.overlap_tokens]
+        if req.chunker == "tokens"
+        else [req.chunk_size, req.overlap],
+        "embed": [settings.EMBEDDINGS_PROVIDER, req.embed_model],
+        "near_dedup": settings.NEAR_DEDUP_MAX_DISTANCE if near_dedup else None,
+        "pdf": [settings.PDF_EXTRACTION_MODE, settings.PDF_BOILERPLATE_MARGIN],
+        "graph": graph_enabled,
+    }
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"corpus-{digest[:40]}"
+
+
+def _shared_index_response(sess: dict, meta: dict) -> IndexResponse:
+    documents = [
+        IndexedDocumentStats(
+            **{**stats, "name": (sess["docs"].get(stats["doc_id"]) or {}).get("name")}
+        )
+        for stats in meta.get("documents", [])
+    ]
+    return IndexResponse(
+        index_id=meta["index_id"],
+        chunks_indexed=meta["chunks_indexed"],
+        duplicate_chunks_skipped=meta["duplicate_chunks_skipped"],
+        near_duplicate_chunks_skipped=meta["near_duplicate_chunks_skipped"],
+        documents=documents,
+    )
+
+
+# The session lock is a thread lock and saving may write to disk, so the locked
+# sections below run on the threadpool rather than on the event loop.
+def _attach_shared_index(
+    session_id: str, sess: dict, share_key: str, embed_model: str
+) -> dict | None:
+    with session_lock(session_id):
+        shared = share_session_index(session_id, share_key)
+        if shared is not None:
+            # Same documents, same parameters: reuse the existing read-only index.
+            sess["index"] = {
+                "index_id": shared["index_id"],
+                "chunks": shared["chunks_indexed"],
+                "embed_model": embed_model,
+                "artifact": shared.get("artifact"),
+            }
+            save_session(session_id, sess)
+        return shared
+
+
+def _install_index(
+    session_id: str, sess: dict, index: SessionIndex, share_key: str | None, meta: dict
+) -> None:
+    with session_lock(session_id):
+        artifact = set_session_index(session_id, index, share_key=share_key, meta=meta)
+        # Heavy structures live in the session index store (which may spill them to disk);
+        # the session record only keeps what request handlers need to route a query.
+        sess["index"] = {
+            "index_id": index.index_id,
+            "chunks": len(index.chunk_map),
+            "embed_model": index.embed_model,
+            "artifact": artifact,
+        }
+        save_session(session_id, sess)
 
 
 @router.post("/index", response_model=IndexResponse)
@@ -130,37 +334,120 @@ async def build_index(
     sess = ensure_session(req.session_id)
     if not sess["docs"]:
         raise HTTPException(status_code=400, detail="No documents uploaded for this session.")
+    near_dedup = settings.NEAR_DEDUP_ENABLED if req.near_dedup is None else req.near_dedup
+    graph_enabled = get_runtime_config().features.graph_enabled
+    share_key = _corpus_share_key(sess["docs"], req, near_dedup, graph_enabled)
+    shared = (
+        await run_in_threadpool(
+            _attach_shared_index, req.session_id, sess, share_key, req.embed_model
+        )
+        if share_key
+        else None
+    )
+    if shared is not None:
+        record_index_built()
+        if graph_enabled and settings.GRAPH_BUILD_MODE == "background":
+            schedule_session_graph(req.session_id)
+        return _shared_index_response(sess, shared)
+    deduper = ChunkDeduper(settings.NEAR_DEDUP_MAX_DISTANCE if near_dedup else None)
     chunk_map = []
     all_chunks = []
-    for doc_id, doc in sess["docs"].items():
-        text = _load_document_text(req.session_id, doc_id, doc)
-        chunks = chunk_text(text, chunk_size=req.chunk_size, overlap=req.overlap)
-        for (start, end, ch_txt) in chunks:
-            chunk_map.append((doc_id, start, end, ch_txt))
-            all_chunks.append(ch_txt)
-    X = embed_texts(all_chunks, model=req.embed_model)
+    chunk_aliases: dict[int, list[tuple[str, int, int]]] = {}
+    doc_stats: List[IndexedDocumentStats] = []
+
+    def iter_doc_chunks(text: str):
+        if req.chunker == "tokens":
+            return iter_token_chunks(
+                text, req.chunk_tokens, req.overlap_tokens, model=req.embed_model
+            )
+        return iter(chunk_text(text, chunk_size=req.chunk_size, overlap=req.overlap))
+
+    def iter_unique_chunks():
+        """Stream unique chunk texts to the embedder, recording chunk_map/alias/stat side data."""
+        for doc_id, doc, extracted in _iter_loaded_documents(req.session_id, sess["docs"]):
+            text = extracted.text
+            produced = 0
+            for start, end, ch_txt in iter_doc_chunks(text):
+                produced += 1
+                duplicate = deduper.check(ch_txt)
+                if duplicate is not None:
+                    canonical_idx, _kind = duplicate
+                    chunk_aliases.setdefault(canonical_idx, []).append((doc_id, start, end))
+                    continue
+                chunk_map.append((doc_id, start, end, ch_txt))
+                all_chunks.append(ch_txt)
+                yield ch_txt
+            saved_chunks = 0
+            if extracted.boilerplate_chars_removed:
+                if req.chunker == "tokens":
+                    avg_chars = len(text) / produced if produced else len(text)
+                    saved_chunks = int(extracted.boilerplate_chars_removed // max(1.0, avg_chars))
+                else:
+                    saved_chunks = (
+                        estimate_chunk_count(
+                            len(text) + extracted.boilerplate_chars_removed,
+                            req.chunk_size,
+                            req.overlap,
+                        )
+                        - produced
+                    )
+            doc_stats.append(
+                IndexedDocumentStats(
+                    doc_id=doc_id,
+                    name=doc.get("name"),
+                    chunks=produced,
+                    boilerplate_lines_removed=extracted.boilerplate_lines_removed,
+                    boilerplate_bytes_removed=extracted.boilerplate_bytes_removed,
+                    boilerplate_chunks_saved=max(0, saved_chunks),
+                )
+            )
+
+    unique_chunks = iter_unique_chunks()
+    try:
+        X = embed_stream(unique_chunks, model=req.embed_model)
+    finally:
+        unique_chunks.close()
+    if not all_chunks:
+        raise HTTPException(
+            status_code=400, detail="No text could be extracted from the uploaded documents."
+        )
     X = X.astype(np.float32)
     norms = np.linalg.norm(X, axis=1, keepdims=True) + 1e-8
     X_norm = X / norms
-    faiss_index = build_faiss_index(X_norm, metric="cosine")
-    bm25_index, bm25_tokens = build_bm25(all_chunks)
     idx_id = str(uuid.uuid4())
-    sess["index"] = {"faiss": faiss_index, "chunk_map": chunk_map, "embed_model": req.embed_model}
+    faiss_index = build_session_vector_index(X_norm, owner=idx_id)
+    bm25_index, bm25_tokens = build_bm25(all_chunks)
     graph_store = None
-    if get_runtime_config().features.graph_enabled:
-        graph_store = build_graph_store(sess["docs"], chunk_map)
-    set_session_index(
-        req.session_id,
-        SessionIndex(
-            faiss_index=faiss_index,
-            chunk_map=chunk_map,
-            embeddings=X_norm,
-            texts=all_chunks,
-            bm25=bm25_index,
-            bm25_tokens=bm25_tokens,
-            embed_model=req.embed_model,
-            graph=graph_store,
-        ),
+    graph_build_ms = None
+    if graph_enabled and settings.GRAPH_BUILD_MODE == "eager":
+        graph_started = perf_counter()
+        graph_store = build_session_graph(sess["docs"], chunk_map)
+        graph_build_ms = round((perf_counter() - graph_started) * 1000, 3)
+    response = IndexResponse(
+        index_id=idx_id,
+        chunks_indexed=len(chunk_map),
+        duplicate_chunks_skipped=deduper.exact_skipped,
+        near_duplicate_chunks_skipped=deduper.near_skipped,
+        graph_build_ms=graph_build_ms,
+        documents=doc_stats,
+    )
+    index = SessionIndex(
+        faiss_index=faiss_index,
+        chunk_map=chunk_map,
+        embeddings=X_norm,
+        texts=all_chunks,
+        bm25=bm25_index,
+        bm25_tokens=bm25_tokens,
+        embed_model=req.embed_model,
+        graph=graph_store,
+        chunk_aliases=chunk_aliases,
+        index_id=idx_id,
+    )
+    await run_in_threadpool(
+        _install_index, req.session_id, sess, index, share_key, response.model_dump()
     )
     record_index_built()
-    return IndexResponse(index_id=idx_id)
+    if graph_enabled and settings.GRAPH_BUILD_MODE == "background":
+        # Lazy modes leave graph_build_ms unset; advanced queries build on demand.
+        schedule_session_graph(req.session_id)
+    return response
@@ -1,22 +1,24 @@
 from __future__ import annotations
 
-import logging
 import json
+import logging
 from time import perf_counter
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 
 from ..config import settings
 from ..schemas import QueryRequest
+from ..services.admission import admit, release_after
 from ..services.compose import build_messages
 from ..services.generate import stream_chat
+from ..services.observability import record_query, record_query_error
 from ..services.pipeline import prepare_answer_context, resolve_answer_mode
 from ..services.session import ensure_session, incr_query
+from ..services.session_auth import SessionUser, get_session_user, maybe_require_auth
 from ..services.telemetry import new_query_id, record_query_event
 from ..services.tokenizer import estimate_tokens
-from ..services.observability import record_query, record_query_error
-from ..services.session_auth import SessionUser, get_session_user, maybe_require_auth
 
 router = APIRouter()
 
@@ -39,17 +41,24 @@ async def query(
     user: SessionUser | None = Depends(get_session_user),
 ):
     maybe_require_auth(user)
+    ticket = None
+    streaming = False
     try:
         sess = ensure_session(req.session_id)
         if not sess.get("index"):
-            raise HTTPException(status_code=400, detail="No index for this session. Call /api/index first.")
+            raise HTTPException(
+                status_code=400, detail="No index for this session. Call /api/index first."
+            )
         if int(sess.get("queries_used", 0)) >= settings.MAX_QUERIES_PER_SESSION:
             raise HTTPException(status_code=429, detail="Rate limit: session query cap reached")
 
+        # Held until the answer stream ends: the LLM call is the expensive part.
+        ticket = await admit("query")
         query_id = new_query_id()
         start = perf_counter()
         mode = resolve_answer_mode(req.mode)
-        context = prepare_answer_context(
+        context = await run_in_threadpool(
+            prepare_answer_context,
             req.session_id,
             req.query,
             req.k,
@@ -122,8 +131,9 @@ async def query(
             )
 
         if insufficient and mode == "grounded":
+            streaming = True
             return StreamingResponse(
-                sse_wrap(prelude, insufficient_stream(), finish),
+                release_after(ticket, sse_wrap(prelude, insufficient_stream(), finish)),
                 media_type="text/event-stream",
             )
 
@@ -137,8 +147,9 @@ async def query(
             temperature=temperature,
             max_tokens=max_tokens,
         )
+        streaming = True
         return StreamingResponse(
-            sse_wrap(prelude, gen, finish),
+            release_after(ticket, sse_wrap(prelude, gen, finish)),
             media_type="text/event-stream",
         )
     except HTTPException:
@@ -147,3 +158,6 @@ async def query(
     except Exception:
         record_query_error()
         raise
+    finally:
+        if ticket is not None and not streaming:
+            ticket.release()
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 from ..schemas import AdvancedQueryRequest, AdvancedQueryResponse
+from ..services.admission import admit
 from ..services.advanced import run_advanced_query
 from ..services.runtime_config import get_runtime_config
 from ..services.session_auth import SessionUser, get_session_user, maybe_require_auth
@@ -23,8 +25,12 @@ async def query_advanced(
         raise HTTPException(status_code=400, detail="session_id is required.")
     if not req.query:
         raise HTTPException(status_code=400, detail="query is required.")
+    ticket = await admit("query_advanced")
     try:
-        result = run_advanced_query(req)
+        result = await run_in_threadpool(run_advanced_query, req)
     except ValueError as err:
         raise HTTPException(status_code=400, detail=str(err)) from err
+    finally:
+        if ticket is not None:
+            ticket.release()
     return result
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, UploadFile
+from fastapi.responses import FileResponse
+
+from ..services.runtime_config import google_auth_enabled_effective
+from ..services.session_auth import SessionUser, get_session_user, require_admin
+from ..services.snapshot import SnapshotError, export_snapshot, import_snapshot
+
+router = APIRouter()
+
+
+def _require_snapshot_admin(user: SessionUser | None) -> None:
+    # Snapshots contain every session's documents; never expose them without auth.
+    if not google_auth_enabled_effective():
+        raise HTTPException(status_code=403, detail="Auth disabled")
+    require_admin(user)
+
+
+@router.post("/admin/sessions/export")
+def export_sessions(
+    background: BackgroundTasks,
+    user: SessionUser | None = Depends(get_session_user),
+):
+    _require_snapshot_admin(user)
+    fd, path = tempfile.mkstemp(prefix="rag-sessions-", suffix=".tar.gz")
+    os.close(fd)
+    report = export_snapshot(path)
+    background.add_task(os.remove, path)
+    return FileResponse(
+        path,
+        media_type="application/gzip",
+        filename="sessions.tar.gz",
+        headers={
+            "X-Snapshot-Sessions": str(report["exported"]),
+            "X-Snapshot-Bytes": str(report["compressed_bytes"]),
+            "X-Snapshot-Ms": str(report["ms"]),
+        },
+    )
+
+
+@router.post("/admin/sessions/import")
+def import_sessions(
+    file: UploadFile = File(...),
+    user: SessionUser | None = Depends(get_session_user),
+):
+    _require_snapshot_admin(user)
+    with tempfile.NamedTemporaryFile(prefix="rag-sessions-", suffix=".tar.gz") as tmp:
+        shutil.copyfileobj(file.file, tmp)
+        tmp.flush()
+        try:
+            return import_snapshot(tmp.name)
+        except SnapshotError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -6,6 +6,7 @@ from pydantic import BaseModel
 class UploadResponse(BaseModel):
     session_id: str
     doc_ids: List[str]
+    duplicate_files: List[str] = []
 
 
 class IndexRequest(BaseModel):
@@ -13,10 +14,28 @@ class IndexRequest(BaseModel):
     chunk_size: int = 800
     overlap: int = 120
     embed_model: str = "text-embedding-3-large"
+    near_dedup: Optional[bool] = None
+    chunker: Literal["chars", "tokens"] = "chars"
+    chunk_tokens: int = 256
+    overlap_tokens: int = 32
+
+
+class IndexedDocumentStats(BaseModel):
+    doc_id: str
+    name: Optional[str] = None
+    chunks: int = 0
+    boilerplate_lines_removed: int = 0
+    boilerplate_bytes_removed: int = 0
+    boilerplate_chunks_saved: int = 0
 
 
 class IndexResponse(BaseModel):
     index_id: str
+    chunks_indexed: int = 0
+    duplicate_chunks_skipped: int = 0
+    near_duplicate_chunks_skipped: int = 0
+    graph_build_ms: Optional[float] = None  # set when this request built the entity graph
+    documents: List[IndexedDocumentStats] = []
 
 
 class QueryRequest(BaseModel):
@@ -101,6 +120,7 @@ class AdvancedQueryRequest(BaseModel):
     query: str
     k: Optional[int] = None
     max_hops: Optional[int] = None
+    traversal: Optional[Literal["ppr", "bfs", "cooccurrence"]] = None  # defaults to GRAPH_SCORER
     temperature: Optional[float] = None
     rerank: Optional[Literal["ce", "llm"]] = None
     verification_mode: Optional[Literal["none", "ragv", "llm"]] = None
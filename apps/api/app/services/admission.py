@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..config import settings
+
+# Endpoint name -> setting holding its concurrency limit.
+_LIMIT_SETTINGS = {
+    "query": "ADMISSION_QUERY_CONCURRENCY",
+    "query_advanced": "ADMISSION_ADVANCED_CONCURRENCY",
+    "answer": "ADMISSION_ANSWER_CONCURRENCY",
+    "compare": "ADMISSION_COMPARE_CONCURRENCY",
+}
+# Smoothing for the average time a slot is held (feeds Retry-After).
+_HOLD_EWMA_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    def __init__(self, endpoint: str, reason: str, retry_after: int) -> None:
+        super().__init__(f"{endpoint} overloaded ({reason})")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request's slot; ``release`` is idempotent and thread-safe."""
+
+    def __init__(self, gate: "_Gate") -> None:
+        self._gate = gate
+        self._started = time.perf_counter()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._gate.release(time.perf_counter() - self._started)
+
+
+class _Gate:
+    """Concurrency limit with a bounded FIFO of waiters.
+
+    State is guarded by a thread lock because slots are often released from a
+    worker thread (streaming responses iterate sync generators in a threadpool);
+    waiters are woken on their own event loop.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float) -> None:
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = deque()
+        self._hold_avg = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queued = 0
+        self._wait_total = 0.0
+        self.max_wait_ms = 0.0
+        self.last_wait_ms: Optional[float] = None
+
+    def _retry_after(self) -> int:
+        # Time for the queue ahead of a retry to drain, at the observed hold time.
+        waves = (len(self._waiters) + 1) / self.limit
+        return max(1, min(60, math.ceil(waves * max(self._hold_avg, 0.5))))
+
+    def _reject(self, reason: str) -> Overloaded:
+        if reason == "queue_full":
+            self.rejected += 1
+        else:
+            self.timed_out += 1
+        return Overloaded(self.name, reason, self._retry_after())
+
+    def _admit(self, waited: float) -> Ticket:
+        self.admitted += 1
+        if waited:
+            self.queued += 1
+            wait_ms = waited * 1000
+            self._wait_total += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.last_wait_ms = round(wait_ms, 3)
+        return Ticket(self)
+
+    async def acquire(self) -> Ticket:
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return self._admit(0.0)
+            if len(self._waiters) >= self.max_queue:
+                raise self._reject("queue_full")
+            loop = asyncio.get_running_loop()
+            waiter: "asyncio.Future[None]" = loop.create_future()
+            self._waiters.append((loop, waiter))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, waiter))
+                except ValueError:
+                    pass  # a slot was handed over concurrently; _wake passes it on
+                raise self._reject("timeout") from None
+        with self._lock:
+            return self._admit(time.perf_counter() - started)
+
+    def release(self, held: float) -> None:
+        with self._lock:
+            self._hold_avg += _HOLD_EWMA_ALPHA * (held - self._hold_avg)
+            if self._waiters:
+                # Hand the slot straight to the oldest waiter; ``active`` is unchanged.
+                loop, waiter = self._waiters.popleft()
+                loop.call_soon_threadsafe(self._wake, waiter)
+                return
+            self._active -= 1
+
+    def _wake(self, waiter: "asyncio.Future[None]") -> None:
+        if waiter.done():
+            self.release(0.0)  # the waiter gave up meanwhile; pass its slot on
+        else:
+            waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waited = self.queued
+            return {
+                "limit": self.limit,
+                "active": self._active,
+                "queue_depth": len(self._waiters),
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "queued": waited,
+                "avg_wait_ms": round(self._wait_total / waited, 3) if waited else None,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "last_wait_ms": self.last_wait_ms,
+            }
+
+
+class AdmissionController:
+    """Per-endpoint concurrency limits for the LLM- and cross-encoder-heavy routes.
+
+    Requests over an endpoint's limit wait in a bounded FIFO for up to
+    ``ADMISSION_QUEUE_TIMEOUT_SECONDS``; when the queue is full or the wait times
+    out the request fails fast with 503 and a Retry-After estimated from the
+    observed service time.
+    """
+
+    def __init__(self) -> None:
+        self._gates: Dict[str, _Gate] = {}
+        self._lock = threading.Lock()
+
+    def gate(self, endpoint: str) -> _Gate:
+        with self._lock:
+            gate = self._gates.get(endpoint)
+            if gate is None:
+                gate = self._gates[endpoint] = _Gate(
+                    endpoint,
+                    int(getattr(settings, _LIMIT_SETTINGS[endpoint])),
+                    settings.ADMISSION_QUEUE_SIZE,
+                    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                )
+            return gate
+
+    async def admit(self, endpoint: str) -> Optional[Ticket]:
+        """Wait for a slot; raises ``HTTPException(503)`` on overload, ``None`` when disabled."""
+        if not settings.ADMISSION_CONTROL_ENABLED:
+            return None
+        try:
+            return await self.gate(endpoint).acquire()
+        except Overloaded as exc:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server busy ({exc.reason}); retry shortly.",
+                headers={"Retry-After": str(exc.retry_after)},
+            ) from exc
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            gates = dict(self._gates)
+        return {
+            "enabled": settings.ADMISSION_CONTROL_ENABLED,
+            "endpoints": {name: gate.stats() for name, gate in gates.items()},
+        }
+
+
+_controller = AdmissionController()
+
+
+def get_admission_controller() -> AdmissionController:
+    return _controller
+
+
+def reset_admission_controller() -> None:
+    """Drop all gates so limits are re-read from settings (primarily for tests)."""
+    global _controller
+    _controller = AdmissionController()
+
+
+async def admit(endpoint: str) -> Optional[Ticket]:
+    return await _controller.admit(endpoint)
+
+
+class _ReleasingStream:
+    """Iterator over ``stream`` that releases ``ticket`` once, however it ends.
+
+    A generator's ``finally`` only runs once iteration has started, so a response
+    dropped before its first chunk would leak the slot. This releases on
+    exhaustion, on an error, on ``close`` and, as a last resort, when collected.
+    """
+
+    def __init__(self, ticket: Optional[Ticket], stream: Iterable[str]) -> None:
+        self._ticket = ticket
+        self._stream = stream
+        self._iterator: Optional[Iterator[str]] = None
+
+    def __iter__(self) -> "_ReleasingStream":
+        return self
+
+    def __next__(self) -> str:
+        if self._iterator is None:
+            self._iterator = iter(self._stream)
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        try:
+            close = getattr(self._iterator or self._stream, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        ticket, self._ticket = self._ticket, None
+        if ticket is not None:
+            ticket.release()
+
+    def __del__(self) -> None:
+        self._release()
+
+
+def release_after(ticket: Optional[Ticket], stream: Iterable[str]) -> Iterator[str]:
+    """Hold ``ticket`` until ``stream`` is exhausted or closed (client disconnect)."""
+    return _ReleasingStream(ticket, stream)
@@ -3,9 +3,11 @@ from __future__ import annotations
 import json
 import logging
 import time
+import uuid
 from dataclasses import dataclass
 from typing import Any, Dict, List, Tuple
-import uuid
+
+import numpy as np
 
 from ..config import settings
 from ..schemas import (
@@ -21,11 +23,21 @@ from ..schemas import (
 )
 from .embed import embed_texts
 from .generate import run_chat_completion
-from .graph import GraphStore, match_entities, plan_subqueries, traverse_graph
+from .graph import (
+    GraphStore,
+    GraphTraversal,
+    expand_cooccurrence,
+    expand_graph,
+    match_entities,
+    plan_subqueries,
+    rank_graph_sections,
+)
+from .graph_build import ensure_session_graph
+from .graph_sqlite import SqliteGraphStore
 from .observability import record_advanced_query
-from .runtime_config import get_runtime_config
 from .pipeline import _apply_rerank
-from .retrieve import RetrievalHit, hybrid_retrieve, _l2_normalize
+from .retrieve import RetrievalHit, _l2_normalize, hybrid_retrieve, score_candidates
+from .runtime_config import get_runtime_config
 from .session import ensure_session, get_session_index
 
 logger = logging.getLogger(__name__)
@@ -39,7 +51,9 @@ def _short_snippet(text: str, limit: int = 200) -> str:
     return snippet[: limit - 1].rstrip() + "…"
 
 
-def _map_verification_to_trace(summary: VerificationSummary | None) -> GraphRagTraceVerificationResult | None:
+def _map_verification_to_trace(
+    summary: VerificationSummary | None,
+) -> GraphRagTraceVerificationResult | None:
     if not summary:
         return None
     verdict = summary.verdict.lower()
@@ -62,28 +76,74 @@ class SubQueryDiagnostics:
     rerank_latency_ms: float
 
 
-def _to_hits_from_indexes(indexes: List[int]) -> List[RetrievalHit]:
+def _rrf_placement(pool: Dict[int, float], indexes: List[int], scores: np.ndarray) -> np.ndarray:
+    """Reciprocal-rank term each candidate would get in a retriever's ranked pool.
+
+    Candidates scoring below the whole pool would not have been in it and get 0;
+    candidates already in the pool keep their pool score, landing on their own rank.
+    """
+    ordered = np.sort(np.fromiter(pool.values(), dtype=np.float64, count=len(pool)))
+    placed = np.array(
+        [pool.get(idx, score) for idx, score in zip(indexes, scores.tolist(), strict=True)],
+        dtype=np.float64,
+    )
+    ranks = len(ordered) - np.searchsorted(ordered, placed, side="right")
+    return np.where(ranks < len(ordered), 1.0 / (settings.FUSION_RRF_K + ranks + 1.0), 0.0)
+
+
+def _score_graph_hits(
+    sidx: Any,
+    q_vec: np.ndarray,
+    query: str,
+    indexes: List[int],
+    hybrid_meta: Dict[str, Any],
+    *,
+    ranked: bool = False,
+) -> List[RetrievalHit]:
+    """Graph candidates as hits scored on the hybrid retriever's scale.
+
+    Dense and BM25 scores for all candidates come from one gathered pass over
+    the stored embeddings and postings. A candidate the hybrid retriever did not
+    return gets the reciprocal-rank terms its scores would have earned in the
+    hybrid dense and lexical rankings; ranked (PPR) candidates add a term for
+    their graph rank. Candidates already retrieved only add the graph term, as
+    ``_merge_hits`` sums fused scores.
+    """
+    if not indexes:
+        return []
+    lexical_on = settings.RETRIEVER_STRATEGY != "dense"
+    dense, lexical = score_candidates(sidx, q_vec, query, indexes, lexical=lexical_on)
+    placed = _rrf_placement(hybrid_meta.get("dense_scores") or {}, indexes, dense)
+    if lexical_on:
+        placed += _rrf_placement(hybrid_meta.get("lexical_scores") or {}, indexes, lexical)
+    retrieved = set(hybrid_meta.get("selected") or ())
     hits: List[RetrievalHit] = []
-    for idx in indexes:
+    for rank, idx in enumerate(indexes):
+        fused = 1.0 / (settings.FUSION_RRF_K + rank + 1.0) if ranked else 0.0
+        if idx not in retrieved:
+            fused += float(placed[rank])
         hits.append(
             RetrievalHit(
                 idx=idx,
-                dense_score=0.0,
-                lexical_score=0.0,
-                fused_score=0.0,
+                dense_score=float(dense[rank]),
+                lexical_score=float(lexical[rank]),
+                fused_score=fused,
             )
         )
     return hits
 
 
-def _merge_hits(graph_hits: List[RetrievalHit], hybrid_hits: List[RetrievalHit], limit: int) -> List[RetrievalHit]:
+def _merge_hits(
+    graph_hits: List[RetrievalHit], hybrid_hits: List[RetrievalHit], limit: int
+) -> List[RetrievalHit]:
     merged: Dict[int, RetrievalHit] = {}
     for hit in graph_hits + hybrid_hits:
         if hit.idx in merged:
             base = merged[hit.idx]
             base.dense_score = max(base.dense_score, hit.dense_score)
             base.lexical_score = max(base.lexical_score, hit.lexical_score)
-            base.fused_score = max(base.fused_score, hit.fused_score)
+            # Fused scores are reciprocal-rank terms from different rankers: add them.
+            base.fused_score = base.fused_score + hit.fused_score
         else:
             merged[hit.idx] = hit
     ordered = list(merged.values())
@@ -91,36 +151,57 @@ def _merge_hits(graph_hits: List[RetrievalHit], hybrid_hits: List[RetrievalHit],
     return ordered[:limit]
 
 
-def _graph_candidates(store: GraphStore | None, query: str, max_hops: int) -> Tuple[List[int], List[Dict[str, Any]], SubQueryDiagnostics]:
+def _graph_candidates(
+    store: GraphStore | SqliteGraphStore | None, query: str, max_hops: int, traversal_mode: str
+) -> Tuple[List[int], GraphTraversal | None, SubQueryDiagnostics]:
     if not store:
         diagnostics = SubQueryDiagnostics([], 0, 0, 0, 0, 0.0)
-        return [], [], diagnostics
+        return [], None, diagnostics
     seeds = match_entities(store, query)
-    indexes, paths, hops_used, seed_count = traverse_graph(store, seeds, max_hops)
+    if traversal_mode == "cooccurrence":
+        traversal = expand_cooccurrence(store, seeds, max_hops, limit=settings.GRAPH_MAX_CANDIDATES)
+    elif traversal_mode == "ppr":
+        traversal = rank_graph_sections(
+            store,
+            seeds,
+            max_hops,
+            limit=settings.GRAPH_MAX_CANDIDATES,
+            alpha=settings.GRAPH_PPR_ALPHA,
+            max_iter=settings.GRAPH_PPR_MAX_ITER,
+        )
+    else:
+        traversal = expand_graph(store, seeds, max_hops, limit=settings.GRAPH_MAX_CANDIDATES)
+    indexes = traversal.sections
+    # Paths are described later, only for the graph hits that survive ranking.
     diagnostics = SubQueryDiagnostics(
-        graph_paths=paths,
-        hops_used=hops_used,
-        seed_count=seed_count,
+        graph_paths=[],
+        hops_used=traversal.hops_used,
+        seed_count=traversal.seed_count,
         graph_candidates=len(indexes),
         hybrid_candidates=0,
         rerank_latency_ms=0.0,
     )
-    return indexes, paths, diagnostics
+    return indexes, traversal, diagnostics
 
 
-def _prepare_retrieval(session_id: str, query: str, *, max_hops: int, answer_top_k: int) -> Tuple[List[RetrievalHit], List[Dict[str, Any]], SubQueryDiagnostics]:
+def _prepare_retrieval(
+    session_id: str, query: str, *, max_hops: int, answer_top_k: int, traversal_mode: str
+) -> Tuple[List[RetrievalHit], GraphTraversal | None, SubQueryDiagnostics]:
     sess = ensure_session(session_id)
     sidx = get_session_index(session_id)
     if not sidx or not sidx.faiss_index:
         raise ValueError("Advanced retrieval requires a built index.")
 
-    graph_hits_indexes, graph_paths, diagnostics = _graph_candidates(sidx.graph, query, max_hops)
+    graph = sidx.graph if sidx.graph is not None else ensure_session_graph(session_id)
+    graph_hits_indexes, traversal, diagnostics = _graph_candidates(
+        graph, query, max_hops, traversal_mode
+    )
 
     embed_model = sess["index"]["embed_model"]
     qv = embed_texts([query], model=embed_model).astype("float32")
     q_vec = _l2_normalize(qv)[0]
 
-    hits_hybrid, _meta = hybrid_retrieve(
+    hits_hybrid, hybrid_meta = hybrid_retrieve(
         sidx,
         q_vec,
         query,
@@ -134,9 +215,13 @@ def _prepare_retrieval(session_id: str, query: str, *, max_hops: int, answer_top
     )
 
     diagnostics.hybrid_candidates = len(hits_hybrid)
-    graph_hits = _to_hits_from_indexes(graph_hits_indexes)
+    graph_hits = _score_graph_hits(
+        sidx, q_vec, query, graph_hits_indexes, hybrid_meta, ranked=traversal_mode != "bfs"
+    )
     merged_hits = _merge_hits(graph_hits, hits_hybrid, max(answer_top_k, settings.MAX_RETRIEVED))
-    return merged_hits, graph_paths, diagnostics
+    return merged_hits, traversal, diagnostics
+
+
 #
 # Summarization helpers
 #
@@ -161,7 +246,9 @@ def _build_citations(retrieved_meta: List[Dict[str, Any]]) -> List[Dict[str, Any
     return citations
 
 
-def _prepare_snippets(retrieved_meta: List[Dict[str, Any]], citations: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+def _prepare_snippets(
+    retrieved_meta: List[Dict[str, Any]], citations: List[Dict[str, Any]]
+) -> List[Dict[str, str]]:
     snippets: List[Dict[str, str]] = []
     for meta, cite in zip(retrieved_meta, citations):
         snippets.append(
@@ -173,7 +260,9 @@ def _prepare_snippets(retrieved_meta: List[Dict[str, Any]], citations: List[Dict
     return snippets
 
 
-def _summarize_subquery_fallback(sub_query: str, retrieved_meta: List[Dict[str, Any]], citations: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+def _summarize_subquery_fallback(
+    sub_query: str, retrieved_meta: List[Dict[str, Any]], citations: List[Dict[str, Any]]
+) -> Tuple[str, List[Dict[str, Any]]]:
     if not retrieved_meta:
         return f"No supporting evidence was found for {sub_query}.", []
     lines: List[str] = []
@@ -229,7 +318,9 @@ def _summarize_subquery(
     snippets = _prepare_snippets(retrieved_meta, citations)
     if _llm_capable():
         try:
-            summary = _summarize_subquery_llm(sub_query, snippets, model=model, temperature=temperature)
+            summary = _summarize_subquery_llm(
+                sub_query, snippets, model=model, temperature=temperature
+            )
             return summary, citations
         except Exception as exc:  # pragma: no cover - defensive log
             logger.warning("Advanced sub-query summary LLM failed; falling back. err=%s", exc)
@@ -244,7 +335,9 @@ def _collect_citations(subqueries: List[AdvancedSubQuery]) -> List[Dict[str, Any
     return list(dedup.values())
 
 
-def _fallback_aggregate_answer(subqueries: List[AdvancedSubQuery]) -> Tuple[str, List[Dict[str, Any]]]:
+def _fallback_aggregate_answer(
+    subqueries: List[AdvancedSubQuery],
+) -> Tuple[str, List[Dict[str, Any]]]:
     if not subqueries:
         return "No answer could be generated.", []
     parts: List[str] = []
@@ -297,7 +390,9 @@ def _aggregate_answer(
         return "No answer could be generated.", []
     if _llm_capable():
         try:
-            return _synthesize_answer_llm(question, subqueries, model=model, temperature=temperature)
+            return _synthesize_answer_llm(
+                question, subqueries, model=model, temperature=temperature
+            )
         except Exception as exc:  # pragma: no cover - defensive log
             logger.warning("Advanced synthesis LLM failed; using fallback. err=%s", exc)
     return _fallback_aggregate_answer(subqueries)
@@ -372,6 +467,7 @@ def run_advanced_query(req: AdvancedQueryRequest) -> AdvancedQueryResponse:
         raise ValueError("LLM fact-checking is disabled.")
 
     max_hops = req.max_hops or graph_cfg.max_graph_hops
+    traversal_mode = req.traversal or settings.GRAPH_SCORER
     answer_top_k = max(1, min(req.k or graph_cfg.advanced_default_k, settings.MAX_RETRIEVED))
     temperature = req.temperature or graph_cfg.advanced_default_temperature
     max_subqueries = req.max_subqueries or graph_cfg.advanced_max_subqueries
@@ -385,7 +481,8 @@ def run_advanced_query(req: AdvancedQueryRequest) -> AdvancedQueryResponse:
         subqueries = [query]
     subqueries = subqueries[:max_subqueries]
     trace_planner_steps = [
-        GraphRagTracePlannerStep(subquery=text, hop=idx, notes=None) for idx, text in enumerate(subqueries)
+        GraphRagTracePlannerStep(subquery=text, hop=idx, notes=None)
+        for idx, text in enumerate(subqueries)
     ]
 
     sidx = get_session_index(session_id)
@@ -398,7 +495,13 @@ def run_advanced_query(req: AdvancedQueryRequest) -> AdvancedQueryResponse:
     trace_synthesis_notes: List[GraphRagTraceSynthesisNote] = []
 
     for sub_query in subqueries:
-        hits, graph_paths, diagnostics = _prepare_retrieval(session_id, sub_query, max_hops=max_hops, answer_top_k=answer_top_k)
+        hits, traversal, diagnostics = _prepare_retrieval(
+            session_id,
+            sub_query,
+            max_hops=max_hops,
+            answer_top_k=answer_top_k,
+            traversal_mode=traversal_mode,
+        )
         rerank_scores: List[float] = []
 
         chunk_map = sidx.chunk_map
@@ -406,7 +509,9 @@ def run_advanced_query(req: AdvancedQueryRequest) -> AdvancedQueryResponse:
 
         if hits:
             rerank_start = time.perf_counter()
-            rerank_result = _apply_rerank(sub_query, hits, sidx.texts or [], strategy_override=rerank_mode)
+            rerank_result = _apply_rerank(
+                sub_query, hits, sidx.texts or [], strategy_override=rerank_mode
+            )
             diagnostics.rerank_latency_ms = (time.perf_counter() - rerank_start) * 1000.0
             rerank_scores = rerank_result["scores"]
 
@@ -429,7 +534,13 @@ def run_advanced_query(req: AdvancedQueryRequest) -> AdvancedQueryResponse:
                 }
             )
 
-        summary, citations = _summarize_subquery(sub_query, retrieved_meta, model=model, temperature=summary_temperature)
+        if traversal:
+            diagnostics.graph_paths = traversal.paths(
+                meta["chunk_index"] for meta in retrieved_meta
+            )
+        summary, citations = _summarize_subquery(
+            sub_query, retrieved_meta, model=model, temperature=summary_temperature
+        )
 
         if retrieved_meta:
             if len(trace_retrieval_hits) < TRACE_MAX_HITS:
@@ -451,7 +562,7 @@ def run_advanced_query(req: AdvancedQueryRequest) -> AdvancedQueryResponse:
             AdvancedSubQuery(
                 query=sub_query,
                 retrieved_meta=retrieved_meta,
-                graph_paths=graph_paths,
+                graph_paths=diagnostics.graph_paths,
                 rerank_scores=rerank_scores,
                 metrics={
                     "hops_used": diagnostics.hops_used,
@@ -464,13 +575,23 @@ def run_advanced_query(req: AdvancedQueryRequest) -> AdvancedQueryResponse:
             )
         )
 
-    final_answer, final_citations = _aggregate_answer(query, response_subqueries, model=model, temperature=temperature)
+    final_answer, final_citations = _aggregate_answer(
+        query, response_subqueries, model=model, temperature=temperature
+    )
     verification = _compute_verification(verification_mode, response_subqueries)
 
-    total_hops_used = max((sub.metrics.get("hops_used", 0) for sub in response_subqueries), default=0)
-    total_graph_candidates = sum(sub.metrics.get("graph_candidates", 0) for sub in response_subqueries)
-    total_hybrid_candidates = sum(sub.metrics.get("hybrid_candidates", 0) for sub in response_subqueries)
-    total_rerank_latency = sum(sub.metrics.get("rerank_latency_ms", 0.0) for sub in response_subqueries)
+    total_hops_used = max(
+        (sub.metrics.get("hops_used", 0) for sub in response_subqueries), default=0
+    )
+    total_graph_candidates = sum(
+        sub.metrics.get("graph_candidates", 0) for sub in response_subqueries
+    )
+    total_hybrid_candidates = sum(
+        sub.metrics.get("hybrid_candidates", 0) for sub in response_subqueries
+    )
+    total_rerank_latency = sum(
+        sub.metrics.get("rerank_latency_ms", 0.0) for sub in response_subqueries
+    )
 
     record_advanced_query(
         hops_used=total_hops_used,
@@ -495,6 +616,7 @@ def run_advanced_query(req: AdvancedQueryRequest) -> AdvancedQueryResponse:
             "verification_mode": verification_mode,
             "verification_verdict": getattr(verification, "verdict", None),
             "max_hops": max_hops,
+            "traversal": traversal_mode,
             "hops_used": total_hops_used,
             "graph_candidates": total_graph_candidates,
             "hybrid_candidates": total_hybrid_candidates,
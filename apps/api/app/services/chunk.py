@@ -1,6 +1,15 @@
 from __future__ import annotations
 
-from typing import List, Tuple
+import re
+from typing import Iterator, List, Optional, Tuple
+
+from .tokenizer import get_encoding
+
+# Sentence ends (., !, ? followed by whitespace) and paragraph breaks (blank lines).
+_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+# Close a chunk early at a paragraph break once it is this full.
+_PARAGRAPH_SNAP_RATIO = 0.75
 
 
 def chunk_text(text: str, chunk_size: int = 800, overlap: int = 120) -> List[Tuple[int, int, str]]:
@@ -20,3 +29,103 @@ def chunk_text(text: str, chunk_size: int = 800, overlap: int = 120) -> List[Tup
         start += step
 
     return chunks
+
+
+def estimate_chunk_count(n_chars: int, chunk_size: int = 800, overlap: int = 120) -> int:
+    """Number of chunks ``chunk_text`` produces for a text of ``n_chars`` characters."""
+    if chunk_size <= 0 or n_chars <= 0:
+        return 0
+    step = max(1, chunk_size - overlap)
+    if n_chars <= chunk_size:
+        return 1
+    return 1 + -(-(n_chars - chunk_size) // step)
+
+
+def _iter_segments(text: str) -> Iterator[Tuple[int, int, bool]]:
+    """Yield ``(start, end, starts_paragraph)`` spans split at sentence/paragraph boundaries."""
+    start = 0
+    paragraph = True
+    for match in _BOUNDARY_RE.finditer(text):
+        if match.start() > start:
+            yield start, match.start(), paragraph
+        paragraph = bool(_PARAGRAPH_RE.search(match.group()))
+        start = match.end()
+    if start < len(text):
+        yield start, len(text), paragraph
+
+
+def _split_oversized(
+    encoding, text: str, start: int, end: int, max_tokens: int
+) -> Iterator[Tuple[int, int, int]]:
+    """Hard-split a single segment longer than the budget at token boundaries."""
+    tokens = encoding.encode(text[start:end])
+    _decoded, offsets = encoding.decode_with_offsets(tokens)
+    for pos in range(0, len(tokens), max_tokens):
+        piece_start = start + offsets[pos]
+        piece_end = start + offsets[pos + max_tokens] if pos + max_tokens < len(tokens) else end
+        yield piece_start, piece_end, min(max_tokens, len(tokens) - pos)
+
+
+def iter_token_chunks(
+    text: str,
+    max_tokens: int = 256,
+    overlap_tokens: int = 32,
+    *,
+    model: Optional[str] = None,
+) -> Iterator[Tuple[int, int, str]]:
+    """Lazily yield ``(start, end, text)`` chunks of at most ``max_tokens`` tokens.
+
+    Chunks end on sentence or paragraph boundaries; only a single sentence longer
+    than the budget is cut mid-sentence. Overlap is carried as whole trailing
+    sentences totalling at most ``overlap_tokens``. Each segment is counted
+    together with the whitespace separating it from the previous one, since that
+    separator is part of the chunk text.
+    """
+    if max_tokens <= 0 or not text:
+        return
+    encoding = get_encoding(model)
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens - 1))
+
+    window: List[Tuple[int, int, int]] = []  # (start, end, tokens) of segments in the open chunk
+    window_tokens = 0
+
+    def flush() -> Tuple[int, int, str]:
+        chunk_start, chunk_end = window[0][0], window[-1][1]
+        return chunk_start, chunk_end, text[chunk_start:chunk_end]
+
+    def carry_overlap() -> None:
+        nonlocal window, window_tokens
+        kept: List[Tuple[int, int, int]] = []
+        kept_tokens = 0
+        for seg in reversed(window):
+            if kept_tokens + seg[2] > overlap_tokens:
+                break
+            kept.insert(0, seg)
+            kept_tokens += seg[2]
+        window, window_tokens = kept, kept_tokens
+
+    previous_end = 0
+    for seg_start, seg_end, starts_paragraph in _iter_segments(text):
+        # Counting from the previous segment's end includes the separator; a chunk
+        # that starts with this segment is overcounted by at most that separator.
+        seg_tokens = len(encoding.encode(text[previous_end:seg_end]))
+        previous_end = seg_end
+        pieces = (
+            list(_split_oversized(encoding, text, seg_start, seg_end, max_tokens))
+            if seg_tokens > max_tokens
+            else [(seg_start, seg_end, seg_tokens)]
+        )
+        for piece in pieces:
+            paragraph_snap = (
+                starts_paragraph and window_tokens >= max_tokens * _PARAGRAPH_SNAP_RATIO
+            )
+            if window and (window_tokens + piece[2] > max_tokens or paragraph_snap):
+                yield flush()
+                carry_overlap()
+                if window_tokens + piece[2] > max_tokens:
+                    window, window_tokens = [], 0
+            window.append(piece)
+            window_tokens += piece[2]
+            starts_paragraph = False
+    if window:
+        yield flush()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, List
+
+
+class RWLock:
+    """Readers-writer lock with writer preference.
+
+    Any number of readers may hold the lock together; a writer waits for them to
+    drain and blocks new readers while it waits. The writing thread may re-enter
+    ``write`` or take ``read`` while it holds the write lock. Readers must not
+    nest ``read`` calls (a queued writer would deadlock them).
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: int | None = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                nested = True
+            else:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+                nested = False
+        try:
+            yield
+        finally:
+            with self._cond:
+                if nested:
+                    self._writer_depth -= 1
+                else:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+            else:
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = me
+                self._writer_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+class StripedLocks:
+    """A fixed pool of re-entrant locks; a key always maps to the same stripe.
+
+    Operations on different keys rarely contend, without allocating (or ever
+    freeing) one lock per key.
+    """
+
+    def __init__(self, stripes: int = 64) -> None:
+        self._locks: List[threading.RLock] = [threading.RLock() for _ in range(max(1, stripes))]
+
+    def for_key(self, key: str) -> threading.RLock:
+        return self._locks[zlib.crc32(key.encode("utf-8")) % len(self._locks)]
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import uuid
+from collections import Counter
+from typing import Dict, List, Literal, Tuple
+
+_DOC_NAMESPACE = uuid.UUID("6f1c4f0e-2a7d-4d8e-9a4b-5d3c2b1a0f9e")
+_WORD_RE = re.compile(r"\w+")
+_SIMHASH_BITS = 64
+_SHINGLE_SIZE = 3
+_MIN_NEAR_DUP_TOKENS = 8
+
+DuplicateKind = Literal["exact", "near"]
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def doc_id_for_hash(digest: str) -> str:
+    """Stable doc id derived from the content hash so identical uploads share an id."""
+    return str(uuid.uuid5(_DOC_NAMESPACE, digest))
+
+
+def chunk_fingerprint(text: str) -> str:
+    normalized = " ".join(text.split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _stable_hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash64(text: str) -> Tuple[int, int]:
+    """Return (simhash, token_count) over word shingles of ``text``."""
+    tokens = _WORD_RE.findall(text.lower())
+    if not tokens:
+        return 0, 0
+    if len(tokens) < _SHINGLE_SIZE:
+        shingles = Counter([" ".join(tokens)])
+    else:
+        shingles = Counter(
+            " ".join(tokens[i : i + _SHINGLE_SIZE]) for i in range(len(tokens) - _SHINGLE_SIZE + 1)
+        )
+    weights = [0] * _SIMHASH_BITS
+    for shingle, count in shingles.items():
+        h = _stable_hash64(shingle)
+        for bit in range(_SIMHASH_BITS):
+            if h >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return value, len(tokens)
+
+
+class ChunkDeduper:
+    """Tracks unique chunks for one index build.
+
+    Exact duplicates are detected by a whitespace-normalized fingerprint. When
+    ``near_max_distance`` is set, chunks whose SimHash lies within that Hamming
+    distance of an already kept chunk are collapsed as well. Candidate lookup uses
+    ``near_max_distance + 1`` disjoint bit bands so, by pigeonhole, any match shares
+    at least one band exactly.
+    """
+
+    def __init__(self, near_max_distance: int | None = None) -> None:
+        self._exact: Dict[str, int] = {}
+        self._simhashes: List[int] = []
+        self.near_max_distance = near_max_distance
+        self._band_count = 0
+        self._band_bits = 0
+        self._bands: List[Dict[int, List[int]]] = []
+        if near_max_distance is not None and near_max_distance >= 0:
+            self._band_count = min(near_max_distance + 1, 16)
+            self._band_bits = _SIMHASH_BITS // self._band_count
+            self._bands = [{} for _ in range(self._band_count)]
+        self.exact_skipped = 0
+        self.near_skipped = 0
+
+    def _band_keys(self, value: int) -> List[int]:
+        mask = (1 << self._band_bits) - 1
+        return [(value >> (band * self._band_bits)) & mask for band in range(self._band_count)]
+
+    def _find_near(self, value: int) -> int | None:
+        assert self.near_max_distance is not None
+        seen: set[int] = set()
+        for band, key in enumerate(self._band_keys(value)):
+            for candidate in self._bands[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if (self._simhashes[candidate] ^ value).bit_count() <= self.near_max_distance:
+                    return candidate
+        return None
+
+    def check(self, text: str) -> Tuple[int, DuplicateKind] | None:
+        """``(canonical_idx, kind)`` for a duplicate; otherwise register ``text`` as a new chunk."""
+        fingerprint = chunk_fingerprint(text)
+        existing = self._exact.get(fingerprint)
+        if existing is not None:
+            self.exact_skipped += 1
+            return existing, "exact"
+
+        simhash = 0
+        if self._bands:
+            simhash, token_count = simhash64(text)
+            if token_count >= _MIN_NEAR_DUP_TOKENS:
+                candidate = self._find_near(simhash)
+                if candidate is not None:
+                    self.near_skipped += 1
+                    return candidate, "near"
+            else:
+                simhash = -1  # too short to compare reliably; never indexed in bands
+
+        next_idx = len(self._simhashes)
+        self._exact[fingerprint] = next_idx
+        self._simhashes.append(simhash)
+        if self._bands and simhash >= 0:
+            for band, key in enumerate(self._band_keys(simhash)):
+                self._bands[band].setdefault(key, []).append(next_idx)
+        return None
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Collection, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_evict_lock = threading.Lock()
+
+
+def touch(path: Path) -> None:
+    """Mark a cache entry as used; eviction goes by modification time."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_lru(directory: Path, pattern: str, max_bytes: int, *, keep: Collection[Path] = ()) -> int:
+    """Delete the least recently used ``pattern`` files until ``directory`` fits ``max_bytes``.
+
+    Entries are ordered by mtime (written or ``touch``-ed); files in ``keep`` are
+    still in use and never removed. ``max_bytes <= 0`` disables the cap. Returns
+    the number of files removed.
+    """
+    if max_bytes <= 0:
+        return 0
+    with _evict_lock:
+        entries: List[Tuple[float, int, Path]] = []
+        for path in directory.glob(pattern):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _mtime, size, _path in entries)
+        removed = 0
+        for _mtime, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= max_bytes:
+                break
+            if path in keep:
+                continue
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                logger.warning("Failed to evict cache entry %s: %s", path, exc)
+                continue
+            total -= size
+            removed += 1
+        return removed
@@ -3,6 +3,7 @@ from __future__ import annotations
 import hashlib
 import logging
 import os
+from typing import Iterable
 
 import numpy as np
 from openai import OpenAI
@@ -48,3 +49,27 @@ def embed_texts(texts: list[str], model: str = "text-embedding-3-large") -> np.n
     response = client.embeddings.create(model=model, input=texts)
     vectors = [np.array(item.embedding, dtype=np.float32) for item in response.data]
     return np.vstack(vectors)
+
+
+def embed_stream(
+    texts: Iterable[str],
+    model: str = "text-embedding-3-large",
+    batch_size: int | None = None,
+) -> np.ndarray:
+    """Embed an iterable of texts in fixed-size batches without materializing it first.
+
+    Provider requests are bounded by the batch size and a lazy chunk generator can
+    feed this directly, but the embeddings of every batch are kept and stacked
+    into the returned matrix, so memory still grows with the corpus.
+    """
+    size = max(1, batch_size or settings.EMBED_BATCH_SIZE)
+    blocks: list[np.ndarray] = []
+    batch: list[str] = []
+    for text in texts:
+        batch.append(text)
+        if len(batch) >= size:
+            blocks.append(embed_texts(batch, model=model))
+            batch = []
+    if batch or not blocks:
+        blocks.append(embed_texts(batch, model=model))
+    return np.vstack(blocks)
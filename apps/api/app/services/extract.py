@@ -1,9 +1,50 @@
 from __future__ import annotations
 
-from typing import List
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
 
 import fitz  # type: ignore[attr-defined]
 
+_DIGITS_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+# A line is boilerplate when the same (position, content) key shows up on at least
+# this many pages *and* on at least this fraction of the document's pages.
+BOILERPLATE_MIN_PAGES = 3
+BOILERPLATE_MIN_PAGE_RATIO = 0.5
+# Vertical resolution used to match line positions across pages (fraction of page height).
+_POSITION_BUCKET = 0.02
+
+PdfSource = Union[bytes, str, Path]
+
+
+@dataclass
+class ExtractedText:
+    text: str
+    page_offsets: List[int] = field(default_factory=lambda: [0])
+    boilerplate_lines_removed: int = 0
+    boilerplate_chars_removed: int = 0
+    boilerplate_bytes_removed: int = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pages": len(self.page_offsets),
+            "boilerplate_lines_removed": self.boilerplate_lines_removed,
+            "boilerplate_chars_removed": self.boilerplate_chars_removed,
+            "boilerplate_bytes_removed": self.boilerplate_bytes_removed,
+        }
+
+
+def open_pdf(source: PdfSource) -> Any:
+    """Open a PDF from in-memory bytes or from a file path (used for streamed downloads)."""
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(str(source))
+
 
 def extract_text_from_pdf_bytes(data: bytes) -> str:
     with fitz.open(stream=data, filetype="pdf") as doc:
@@ -13,6 +54,83 @@ def extract_text_from_pdf_bytes(data: bytes) -> str:
     return "\n".join(texts)
 
 
+def _boilerplate_key(
+    text: str, y_center: float, page_height: float, margin: float
+) -> Tuple[str, int] | None:
+    if page_height <= 0:
+        return None
+    rel = y_center / page_height
+    if margin < rel < 1.0 - margin:
+        return None
+    normalized = _SPACE_RE.sub(" ", _DIGITS_RE.sub("#", text.strip().lower()))
+    if not normalized:
+        return None
+    return normalized, int(rel / _POSITION_BUCKET)
+
+
+def _page_lines(page: Any, margin: float) -> List[Tuple[str, Tuple[str, int] | None]]:
+    height = float(page.rect.height)
+    lines: List[Tuple[str, Tuple[str, int] | None]] = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            text = "".join(span.get("text", "") for span in line.get("spans", []))
+            _x0, y0, _x1, y1 = line.get("bbox", (0.0, 0.0, 0.0, 0.0))
+            lines.append((text, _boilerplate_key(text, (y0 + y1) / 2.0, height, margin)))
+    return lines
+
+
+def extract_pdf(
+    source: PdfSource, *, strip_boilerplate: bool = True, margin: float = 0.12
+) -> ExtractedText:
+    """Extract PDF text page by page, optionally dropping running headers/footers.
+
+    Lines in the top/bottom ``margin`` of a page are keyed by their vertical position
+    and digit-normalized content; keys repeated across enough pages (page numbers,
+    running titles, legal footers) are removed before the text reaches the chunker.
+    """
+    if not strip_boilerplate:
+        with open_pdf(source) as doc:
+            pages = [page.get_text() for page in doc]
+        return _join_pages(pages)
+
+    with open_pdf(source) as doc:
+        page_lines = [_page_lines(page, margin) for page in doc]
+
+    key_pages: Counter[Tuple[str, int]] = Counter()
+    for lines in page_lines:
+        key_pages.update({key for _text, key in lines if key is not None})
+    threshold = max(BOILERPLATE_MIN_PAGES, math.ceil(len(page_lines) * BOILERPLATE_MIN_PAGE_RATIO))
+    repeated = {key for key, count in key_pages.items() if count >= threshold}
+
+    pages: List[str] = []
+    removed_lines = removed_chars = removed_bytes = 0
+    for lines in page_lines:
+        kept: List[str] = []
+        for text, key in lines:
+            if key is not None and key in repeated:
+                removed_lines += 1
+                removed_chars += len(text) + 1
+                removed_bytes += len(text.encode("utf-8")) + 1
+                continue
+            kept.append(text)
+        pages.append("".join(f"{line}\n" for line in kept))
+
+    extracted = _join_pages(pages)
+    extracted.boilerplate_lines_removed = removed_lines
+    extracted.boilerplate_chars_removed = removed_chars
+    extracted.boilerplate_bytes_removed = removed_bytes
+    return extracted
+
+
+def _join_pages(pages: List[str]) -> ExtractedText:
+    offsets: List[int] = []
+    cursor = 0
+    for idx, page_text in enumerate(pages):
+        offsets.append(cursor)
+        cursor += len(page_text) + (1 if idx < len(pages) - 1 else 0)
+    return ExtractedText(text="\n".join(pages), page_offsets=offsets or [0])
+
+
 def extract_text_from_txt_bytes(data: bytes, encoding: str = "utf-8") -> str:
     try:
         return data.decode(encoding, errors="ignore")
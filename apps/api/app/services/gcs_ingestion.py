@@ -1,21 +1,46 @@
 from __future__ import annotations
 
+import logging
 import re
-from typing import Optional
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
 from google.cloud import storage
 from pydantic import BaseModel
 
 from ..config import settings
 
+logger = logging.getLogger(__name__)
+
 _SAFE_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 class GcsIngestionConfig(BaseModel):
     enabled: bool
     bucket: Optional[str]
     prefix: str
     ttl_days: int
+    backend: str = "gcs"
+    local_root: Optional[str] = None
 
 
 def get_gcs_ingestion_config() -> GcsIngestionConfig:
@@ -24,9 +49,189 @@ def get_gcs_ingestion_config() -> GcsIngestionConfig:
         bucket=settings.GCS_INGESTION_BUCKET,
         prefix=settings.GCS_INGESTION_PREFIX,
         ttl_days=settings.GCS_INGESTION_TTL_DAYS,
+        backend=settings.GCS_INGESTION_BACKEND,
+        local_root=settings.GCS_INGESTION_LOCAL_ROOT,
     )
 
 
+class ObjectStore(Protocol):
+    """Minimal blob interface shared by the GCS bucket and the local filesystem stand-in."""
+
+    def upload_bytes(self, path: str, data: bytes) -> None: ...
+
+    def download_bytes(self, path: str) -> bytes: ...
+
+    def download_to_file(self, path: str, fileobj: BinaryIO, *, chunk_size: int) -> int: ...
+
+    def exists(self, path: str) -> bool: ...
+
+
+_client_lock = threading.Lock()
+_shared_client: Any = None
+_shared_client_factory: Any = None
+
+
+def get_storage_client() -> Any:
+    """Return the process-wide storage client, creating it on first use.
+
+    The client owns an authorized HTTP session with its own connection pool, so
+    sharing it avoids a credential lookup and TLS handshake per transfer. It is
+    rebuilt if ``storage.Client`` is swapped (tests patch the module attribute).
+    """
+    global _shared_client, _shared_client_factory
+    factory = storage.Client
+    with _client_lock:
+        if _shared_client is None or _shared_client_factory is not factory:
+            _shared_client = factory()
+            _shared_client_factory = factory
+        return _shared_client
+
+
+class GcsObjectStore:
+    def __init__(self, bucket_name: str) -> None:
+        self.bucket_name = bucket_name
+
+    def _blob(self, path: str) -> Any:
+        return get_storage_client().bucket(self.bucket_name).blob(path)
+
+    def upload_bytes(self, path: str, data: bytes) -> None:
+        self._blob(path).upload_from_string(data)
+
+    def download_bytes(self, path: str) -> bytes:
+        return self._blob(path).download_as_bytes()
+
+    def download_to_file(self, path: str, fileobj: BinaryIO, *, chunk_size: int) -> int:
+        """Stream the object into ``fileobj`` using ranged reads of ``chunk_size`` bytes.
+
+        Reads are bounded by the object's size, so none starts past the end (GCS
+        answers such a range with 416).
+        """
+        blob = self._blob(path)
+        blob.reload()
+        size = int(blob.size or 0)
+        written = 0
+        while written < size:
+            end = min(written + chunk_size, size) - 1
+            piece = blob.download_as_bytes(start=written, end=end)
+            if not piece:
+                break
+            fileobj.write(piece)
+            written += len(piece)
+        return written
+
+    def exists(self, path: str) -> bool:
+        return bool(self._blob(path).exists())
+
+
+class LocalObjectStore:
+    """Filesystem-backed object store for local development and tests."""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def _path(self, path: str) -> Path:
+        target = (self.root / path).resolve()
+        if self.root.resolve() not in target.parents:
+            raise RuntimeError(f"Object path escapes the local store: {path}")
+        return target
+
+    def upload_bytes(self, path: str, data: bytes) -> None:
+        target = self._path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+
+    def download_bytes(self, path: str) -> bytes:
+        return self._path(path).read_bytes()
+
+    def download_to_file(self, path: str, fileobj: BinaryIO, *, chunk_size: int) -> int:
+        written = 0
+        with self._path(path).open("rb") as src:
+            while piece := src.read(chunk_size):
+                fileobj.write(piece)
+                written += len(piece)
+        return written
+
+    def exists(self, path: str) -> bool:
+        return self._path(path).is_file()
+
+
+_store_override: ObjectStore | None = None
+
+
+def set_object_store(store: ObjectStore | None) -> None:
+    """Install a custom object store (``None`` restores the configured backend)."""
+    global _store_override
+    _store_override = store
+
+
+def get_object_store() -> ObjectStore:
+    if _store_override is not None:
+        return _store_override
+    config = get_gcs_ingestion_config()
+    if not config.enabled:
+        raise RuntimeError("GCS ingestion is disabled.")
+    if config.backend == "local":
+        if not config.local_root:
+            raise RuntimeError("GCS_INGESTION_LOCAL_ROOT is required for the local object store.")
+        return LocalObjectStore(config.local_root)
+    if not config.bucket:
+        raise RuntimeError("GCS ingestion bucket is not configured.")
+    return GcsObjectStore(config.bucket)
+
+
+_pool_lock = threading.Lock()
+_transfer_pool: ThreadPoolExecutor | None = None
+
+
+def _get_transfer_pool() -> ThreadPoolExecutor:
+    global _transfer_pool
+    with _pool_lock:
+        if _transfer_pool is None:
+            _transfer_pool = ThreadPoolExecutor(
+                max_workers=max(1, settings.GCS_INGESTION_MAX_WORKERS),
+                thread_name_prefix="gcs-transfer",
+            )
+        return _transfer_pool
+
+
+def map_bounded(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    *,
+    window: int | None = None,
+    discard: Callable[[R], None] | None = None,
+) -> Iterator[R]:
+    """Run ``fn`` over ``items`` on the transfer pool, yielding results in input order.
+
+    At most ``window`` calls are in flight, so a slow consumer bounds how many
+    downloaded payloads are held in memory at once. If iteration stops early
+    (the consumer raised or closed the generator, or a call failed), calls that
+    have not started are cancelled and the results of the others are passed to
+    ``discard`` (e.g. to delete temp files nobody will read).
+    """
+    limit = max(1, window or settings.GCS_INGESTION_MAX_WORKERS)
+    pool = _get_transfer_pool()
+    pending: deque[Future[R]] = deque()
+    try:
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= limit:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            if future.cancel() or discard is None:
+                continue
+            try:
+                result = future.result()
+            except Exception:
+                # Nobody will read this result; the consumer already stopped for its own reason.
+                logger.warning("Skipping a prefetched object that failed to load", exc_info=True)
+                continue
+            discard(result)
+
+
 def _sanitize_slug(value: str, fallback: str) -> str:
     cleaned = value.strip().lower()
     cleaned = cleaned.replace(" ", "-")
@@ -50,26 +255,32 @@ def build_blob_path(session_id: str, doc_id: str, filename: str) -> str:
 
 
 def upload_file_for_session(session_id: str, doc_id: str, filename: str, data: bytes) -> str:
-    config = get_gcs_ingestion_config()
-    if not config.enabled:
-        raise RuntimeError("GCS ingestion is disabled.")
-    if not config.bucket:
-        raise RuntimeError("GCS ingestion bucket is not configured.")
     blob_path = build_blob_path(session_id, doc_id, filename or "upload")
-    client = storage.Client()
-    bucket = client.bucket(config.bucket)
-    blob = bucket.blob(blob_path)
-    blob.upload_from_string(data)
+    get_object_store().upload_bytes(blob_path, data)
     return blob_path
 
 
+def upload_files_for_session(session_id: str, items: Sequence[Tuple[str, str, bytes]]) -> List[str]:
+    """Upload ``(doc_id, filename, data)`` items concurrently; returns object paths in order."""
+    return list(
+        map_bounded(
+            lambda item: upload_file_for_session(session_id, item[0], item[1], item[2]), items
+        )
+    )
+
+
 def download_blob_bytes(object_path: str) -> bytes:
-    config = get_gcs_ingestion_config()
-    if not config.enabled:
-        raise RuntimeError("GCS ingestion is disabled.")
-    if not config.bucket:
-        raise RuntimeError("GCS ingestion bucket is not configured.")
-    client = storage.Client()
-    bucket = client.bucket(config.bucket)
-    blob = bucket.blob(object_path)
-    return blob.download_as_bytes()
+    return get_object_store().download_bytes(object_path)
+
+
+def download_blob_to_tempfile(object_path: str, suffix: str = "") -> Path:
+    """Stream a (large) object to a temp file in ranged chunks; the caller deletes it."""
+    chunk_size = max(1, settings.GCS_INGESTION_CHUNK_MB) * 1024 * 1024
+    store = get_object_store()
+    with tempfile.NamedTemporaryFile(prefix="rag-ingest-", suffix=suffix, delete=False) as handle:
+        try:
+            store.download_to_file(object_path, handle, chunk_size=chunk_size)
+        except Exception:
+            Path(handle.name).unlink(missing_ok=True)
+            raise
+    return Path(handle.name)
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import logging
+import threading
+import uuid
+import weakref
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from ..config import settings
+from .concurrency import RWLock
+
+logger = logging.getLogger(__name__)
+
+# IVF needs roughly this many training points per list before k-means is meaningful.
+_IVF_POINTS_PER_LIST = 39
+
+
+def global_index_enabled() -> bool:
+    return settings.VECTOR_STORE_MODE == "global"
+
+
+class GlobalIndexView:
+    """faiss-like handle (``search``, ``ntotal``, ``d``) over one owner's id range.
+
+    Holding the view keeps the owner's vectors in the global index; when the last
+    reference goes away (session expired, shared index released or spilled) they
+    are removed. ``embeddings`` is the session index's own matrix, not a copy.
+    """
+
+    def __init__(self, store: "GlobalVectorStore", owner: str, embeddings: np.ndarray) -> None:
+        self.store = store
+        self.owner = owner
+        self.embeddings = embeddings
+        self.ntotal = int(embeddings.shape[0])
+        self.d = int(embeddings.shape[1])
+        weakref.finalize(self, store.release, owner)
+
+    @property
+    def resident_bytes(self) -> int:
+        """The global index's float32 copy of this owner's vectors, charged to the session index."""
+        return self.ntotal * self.d * 4
+
+    def search(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.store.search(self.owner, q, k, exact_vectors=self.embeddings)
+
+    def to_faiss(self) -> Any:
+        """Standalone flat index over this owner's vectors (used when saving to disk)."""
+        flat = faiss.IndexFlatIP(self.d)
+        flat.add(np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        return flat
+
+
+class GlobalVectorStore:
+    """One ANN index over every session's chunks, searched per owner with an id-range selector.
+
+    Each owner (a built session index) gets a contiguous id range, so the
+    id -> (owner, chunk) mapping is just ``chunk = id - start`` and filtering is an
+    ``IDSelectorRange``. Deleted ranges are removed where the index type allows it
+    and otherwise left as tombstones; ``compact`` rebuilds from live owners and
+    renumbers their ranges (and trains IVF once enough vectors exist).
+
+    Searches share the read side of a readers-writer lock; adds, removals and
+    compaction take the write side. Owners released by garbage collection are
+    queued and removed by the next writer, since a finalizer may run on a thread
+    that is in the middle of a search.
+    """
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+        self._lock = RWLock()
+        self._released: "deque[str]" = deque()
+        self._ranges: Dict[str, Tuple[int, int]] = {}
+        self._views: Dict[str, "weakref.ref[GlobalIndexView]"] = {}
+        self._next_id = 0
+        self._dead = 0
+        self.compactions = 0
+        self._index = self._new_index(None)
+
+    @property
+    def kind(self) -> str:
+        if isinstance(self._index, faiss.IndexIVF):
+            return "ivf"
+        base = (
+            faiss.downcast_index(self._index.index)
+            if isinstance(self._index, faiss.IndexIDMap)
+            else None
+        )
+        return "hnsw" if isinstance(base, faiss.IndexHNSW) else "flat"
+
+    def _new_index(self, train: Optional[np.ndarray]) -> Any:
+        kind = settings.GLOBAL_INDEX_TYPE
+        if kind == "hnsw":
+            base = faiss.IndexHNSWFlat(
+                self.dim, settings.GLOBAL_INDEX_HNSW_M, faiss.METRIC_INNER_PRODUCT
+            )
+            return faiss.IndexIDMap(base)
+        if kind == "ivf" and train is not None and len(train) >= _IVF_POINTS_PER_LIST:
+            nlist = max(1, min(settings.GLOBAL_INDEX_IVF_NLIST, len(train) // _IVF_POINTS_PER_LIST))
+            # IVF takes ids natively; wrapping it in IndexIDMap breaks range removal.
+            ivf = faiss.IndexIVFFlat(
+                faiss.IndexFlatIP(self.dim), self.dim, nlist, faiss.METRIC_INNER_PRODUCT
+            )
+            ivf.train(train)
+            return ivf
+        # Flat until an IVF can be trained on real data.
+        return faiss.IndexIDMap(faiss.IndexFlatIP(self.dim))
+
+    def _params(self, start: int, end: int) -> Any:
+        selector = faiss.IDSelectorRange(start, end)
+        kind = self.kind
+        if kind == "hnsw":
+            return faiss.SearchParametersHNSW(
+                sel=selector, efSearch=settings.GLOBAL_INDEX_HNSW_EF_SEARCH
+            )
+        if kind == "ivf":
+            return faiss.SearchParametersIVF(sel=selector, nprobe=settings.GLOBAL_INDEX_IVF_NPROBE)
+        return faiss.SearchParameters(sel=selector)
+
+    def add(self, owner: str, vectors: np.ndarray) -> GlobalIndexView:
+        xb = np.ascontiguousarray(vectors, dtype=np.float32)
+        if xb.ndim != 2 or xb.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}")
+        with self._lock.write():
+            self._drain_released()
+            if owner in self._ranges:
+                raise ValueError(f"Owner {owner} already has vectors in the global index")
+            start = self._next_id
+            self._index.add_with_ids(xb, np.arange(start, start + len(xb), dtype=np.int64))
+            self._next_id = start + len(xb)
+            self._ranges[owner] = (start, self._next_id)
+            view = GlobalIndexView(self, owner, vectors)
+            self._views[owner] = weakref.ref(view)
+            return view
+
+    def release(self, owner: str) -> None:
+        """Queue ``owner`` for removal without taking the lock (safe from finalizers)."""
+        self._released.append(owner)
+
+    def remove(self, owner: str) -> None:
+        with self._lock.write():
+            self._drain_released()
+            self._remove(owner)
+
+    def _drain_released(self) -> None:
+        while self._released:
+            self._remove(self._released.popleft())
+
+    def _remove(self, owner: str) -> None:
+        span = self._ranges.pop(owner, None)
+        self._views.pop(owner, None)
+        if span is None:
+            return
+        start, end = span
+        try:
+            self._index.remove_ids(faiss.IDSelectorRange(start, end))
+        except RuntimeError:
+            # HNSW cannot delete; the range is unreachable (no owner) until compaction.
+            self._dead += end - start
+
+    def locate(self, vector_id: int) -> Optional[Tuple[str, int]]:
+        with self._lock.read():
+            for owner, (start, end) in self._ranges.items():
+                if start <= vector_id < end:
+                    return owner, vector_id - start
+        return None
+
+    def search(
+        self, owner: str, q: np.ndarray, k: int, *, exact_vectors: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        xq = np.ascontiguousarray(q, dtype=np.float32)
+        with self._lock.read():
+            start, end = self._ranges[owner]
+            k_eff = max(1, min(k, end - start))
+            scores, ids = self._index.search(xq, k_eff, params=self._params(start, end))
+        local = np.where(ids >= 0, ids - start, -1)
+        if exact_vectors is not None and (local < 0).any():
+            # Filtered ANN search can come back short for small ranges; the owner's own
+            # matrix is at hand, so answer exactly instead.
+            sims = xq @ np.asarray(exact_vectors, dtype=np.float32).T
+            local = np.argsort(-sims, axis=1)[:, :k_eff]
+            scores = np.take_along_axis(sims, local, axis=1)
+        if k_eff < k:
+            pad = ((0, 0), (0, k - k_eff))
+            scores = np.pad(scores, pad, constant_values=-np.inf)
+            local = np.pad(local, pad, constant_values=-1)
+        return scores.astype(np.float32), local.astype(np.int64)
+
+    def needs_compaction(self) -> bool:
+        with self._lock.write():
+            self._drain_released()
+            live = sum(end - start for start, end in self._ranges.values())
+            if self._dead and self._dead >= settings.GLOBAL_INDEX_COMPACT_RATIO * (
+                live + self._dead
+            ):
+                return True
+            return (
+                settings.GLOBAL_INDEX_TYPE == "ivf"
+                and self.kind != "ivf"
+                and live >= _IVF_POINTS_PER_LIST * settings.GLOBAL_INDEX_IVF_NLIST
+            )
+
+    def compact(self) -> None:
+        """Rebuild from live owners with dense, renumbered ranges."""
+        with self._lock.write():
+            self._drain_released()
+            owners = []
+            for owner, ref in list(self._views.items()):
+                view = ref()
+                if view is not None:
+                    owners.append((owner, np.ascontiguousarray(view.embeddings, dtype=np.float32)))
+            train = np.vstack([vectors for _owner, vectors in owners]) if owners else None
+            index = self._new_index(train)
+            ranges: Dict[str, Tuple[int, int]] = {}
+            cursor = 0
+            for owner, vectors in owners:
+                index.add_with_ids(
+                    vectors, np.arange(cursor, cursor + len(vectors), dtype=np.int64)
+                )
+                ranges[owner] = (cursor, cursor + len(vectors))
+                cursor += len(vectors)
+            self._index, self._ranges, self._next_id, self._dead = index, ranges, cursor, 0
+            self.compactions += 1
+            logger.info(
+                "[GLOBAL_INDEX] compacted dim=%d owners=%d vectors=%d kind=%s",
+                self.dim,
+                len(ranges),
+                cursor,
+                self.kind,
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock.write():
+            self._drain_released()
+            return {
+                "dim": self.dim,
+                "kind": self.kind,
+                "owners": len(self._ranges),
+                "vectors": int(self._index.ntotal),
+                "tombstoned": self._dead,
+                "compactions": self.compactions,
+            }
+
+
+_stores_lock = threading.Lock()
+_stores: Dict[int, GlobalVectorStore] = {}
+
+
+def get_global_store(dim: int) -> GlobalVectorStore:
+    with _stores_lock:
+        store = _stores.get(dim)
+        if store is None:
+            store = _stores[dim] = GlobalVectorStore(dim)
+        return store
+
+
+def add_session_vectors(owner: str, embeddings: np.ndarray) -> GlobalIndexView:
+    return get_global_store(int(embeddings.shape[1])).add(owner, embeddings)
+
+
+def readd_session_vectors(owner: str, embeddings: np.ndarray) -> GlobalIndexView:
+    """Add a reloaded index's vectors back to the global index.
+
+    A reader may still hold the view the index had before it was spilled, keeping
+    ``owner``'s range alive; the reloaded copy then gets a range of its own.
+    """
+    store = get_global_store(int(embeddings.shape[1]))
+    try:
+        return store.add(owner, embeddings)
+    except ValueError:
+        return store.add(f"{owner}@{uuid.uuid4().hex[:8]}", embeddings)
+
+
+def compact_global_indexes() -> int:
+    """Compact every store that has accumulated enough tombstones; returns how many ran."""
+    with _stores_lock:
+        stores = list(_stores.values())
+    compacted = 0
+    for store in stores:
+        if store.needs_compaction():
+            store.compact()
+            compacted += 1
+    return compacted
+
+
+def global_index_stats() -> list[Dict[str, Any]]:
+    with _stores_lock:
+        stores = list(_stores.values())
+    return [store.stats() for store in stores]
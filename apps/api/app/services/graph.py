@@ -1,10 +1,23 @@
 from __future__ import annotations
 
-import math
+import hashlib
+import logging
+import multiprocessing
 import re
-from collections import Counter, deque
-from dataclasses import dataclass, field
-from typing import Dict, Iterable, List, Sequence, Tuple
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 STOPWORDS = {
     "the",
@@ -30,49 +43,301 @@ STOPWORDS = {
 }
 
 ENTITY_PATTERN = re.compile(r"\b([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)\b")
+# Words of entity keys and queries: entity names are built from these characters.
+_WORD_PATTERN = re.compile(r"[\w\-]+")
+# Shortest query word used for prefix matching in the fallback lookup.
+_MIN_PREFIX = 3
+# Sections a single traversal may return.
+MAX_GRAPH_SECTIONS = 20
+# Personalized PageRank defaults: restart probability, iteration cap, L1 tolerance.
+PPR_ALPHA = 0.15
+PPR_MAX_ITER = 30
+PPR_TOL = 1e-6
 
 
-@dataclass
-class GraphDoc:
-    id: str
-    title: str | None = None
-
-
-@dataclass
-class GraphSection:
-    id: str
-    doc_id: str
-    chunk_index: int
-    text: str
-
+NODE_DOC = 0
+NODE_SECTION = 1
+NODE_ENTITY = 2
+NODE_TYPES = ("doc", "section", "entity")
 
-@dataclass
-class GraphEntity:
-    id: str
-    name: str
-    frequency: int = 0
+EDGE_SUPPORTS = 0
+EDGE_MENTIONS = 1
+EDGE_REFERS_TO = 2
+EDGE_KINDS = ("SUPPORTS", "MENTIONS", "REFERS_TO")
 
 
 @dataclass
-class GraphEdge:
-    source: str
-    target: str
-    kind: str
+class EntityIndex:
+    """Lookup structures for ``match_entities``, built once per graph.
+
+    ``names`` maps an entity key (its lower-cased, space-separated name) to its
+    node, so matching a query is a dictionary probe per word n-gram up to
+    ``max_words`` long. ``postings`` maps each word of an entity key to the
+    entities containing it (node order), ``vocab`` holds those words sorted for
+    prefix search, and ``rank`` orders entities by descending frequency.
+    """
+
+    names: Dict[str, int]
+    postings: Dict[str, List[int]]
+    vocab: List[str]
+    rank: Dict[int, int]
+    max_words: int
+
+    @classmethod
+    def build(
+        cls, keys: Sequence[str], entity_nodes: Sequence[int], frequency: np.ndarray
+    ) -> "EntityIndex":
+        names: Dict[str, int] = {}
+        postings: Dict[str, List[int]] = {}
+        max_words = 0
+        for node in entity_nodes:
+            key = keys[node]
+            names[key] = node
+            words = key.split(" ")
+            max_words = max(max_words, len(words))
+            for word in dict.fromkeys(words):
+                postings.setdefault(word, []).append(node)
+        order = sorted(entity_nodes, key=lambda node: frequency[node], reverse=True)
+        return cls(
+            names=names,
+            postings=postings,
+            vocab=sorted(postings),
+            rank={node: position for position, node in enumerate(order)},
+            max_words=max_words,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        postings = sum(sys.getsizeof(nodes) for nodes in self.postings.values())
+        maps = sys.getsizeof(self.names) + sys.getsizeof(self.postings) + sys.getsizeof(self.rank)
+        return maps + postings + sys.getsizeof(self.vocab)
 
 
 @dataclass
+class CooccurrenceIndex:
+    """Entity x entity co-occurrence, precomputed from the ``MENTIONS`` edges.
+
+    A sparse matrix in CSR form with one row per node (only entity rows are
+    non-empty): the entities sharing a section with ``e`` are
+    ``partners[indptr[e]:indptr[e + 1]]`` (sorted) and ``weight`` counts the
+    shared sections. Entry ``j``'s supporting sections are
+    ``support[support_ptr[j]:support_ptr[j + 1]]`` (section node ids, sorted).
+    """
+
+    indptr: np.ndarray  # int64 (n + 1,)
+    partners: np.ndarray  # int32 (nnz,)
+    weight: np.ndarray  # int32 (nnz,)
+    support_ptr: np.ndarray  # int64 (nnz + 1,)
+    support: np.ndarray  # int32 (sum of weight,)
+
+    @classmethod
+    def build(cls, store: "GraphStore") -> "CooccurrenceIndex":
+        n = store.num_nodes
+        rows, cols = store.edge_rows, store.indices
+        mentions = (store.node_type[rows] == NODE_SECTION) & (store.node_type[cols] == NODE_ENTITY)
+        sections, entities = rows[mentions], cols[mentions]  # grouped by section (CSR row order)
+        # Every ordered pair of distinct entities within a section, with that section.
+        _, starts, counts = np.unique(sections, return_index=True, return_counts=True)
+        group = np.repeat(counts, counts)
+        left = np.repeat(np.arange(len(entities)), group)
+        offsets = np.arange(int(group.sum())) - np.repeat(np.cumsum(group) - group, group)
+        right = np.repeat(np.repeat(starts, counts), group) + offsets
+        distinct = left != right
+        src, dst, via = (
+            entities[left[distinct]],
+            entities[right[distinct]],
+            sections[left[distinct]],
+        )
+        order = np.lexsort((via, dst, src))
+        src, dst, via = src[order], dst[order], via[order]
+        pair = src.astype(np.int64) * max(n, 1) + dst
+        first = (
+            np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]])
+            if len(pair)
+            else np.empty(0, dtype=np.int64)
+        )
+        support_ptr = np.r_[first, len(pair)].astype(np.int64)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src[first], minlength=n), out=indptr[1:])
+        return cls(
+            indptr=indptr,
+            partners=dst[first].astype(np.int32),
+            weight=np.diff(support_ptr).astype(np.int32),
+            support_ptr=support_ptr,
+            support=via.astype(np.int32),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.indptr, self.partners, self.weight, self.support_ptr, self.support)
+        return sum(int(array.nbytes) for array in arrays)
+
+
+@dataclass(eq=False)
 class GraphStore:
-    docs: Dict[str, GraphDoc] = field(default_factory=dict)
-    sections: Dict[str, GraphSection] = field(default_factory=dict)
-    entities: Dict[str, GraphEntity] = field(default_factory=dict)
-    edges: List[GraphEdge] = field(default_factory=list)
-    adjacency: Dict[str, set[str]] = field(default_factory=dict)
-
-    def add_edge(self, source: str, target: str, kind: str) -> None:
-        edge = GraphEdge(source=source, target=target, kind=kind)
-        self.edges.append(edge)
-        self.adjacency.setdefault(source, set()).add(target)
-        self.adjacency.setdefault(target, set()).add(source)
+    """Doc/section/entity graph with nodes interned to int32 ids.
+
+    ``keys[i]`` is node ``i``'s string id (``doc_id``, ``"{doc_id}:{chunk}"`` or the
+    lower-cased entity name) and ``node_type[i]`` its ``NODE_*`` tag. Edges are
+    undirected and stored once per direction in CSR form: the neighbours of ``i``
+    are ``indices[indptr[i]:indptr[i + 1]]`` (sorted) with kinds in ``edge_kind``.
+    Build with ``GraphBuilder``; the arrays are shared read-only once built.
+    """
+
+    keys: List[str]
+    labels: List[Optional[str]]  # doc title or entity display name
+    node_type: np.ndarray  # int8 (n,)
+    frequency: np.ndarray  # int32 (n,): chunks mentioning an entity, 0 otherwise
+    section_chunk: np.ndarray  # int32 (n,): chunk index of a section, -1 otherwise
+    section_doc: np.ndarray  # int32 (n,): doc node of a section, -1 otherwise
+    indptr: np.ndarray  # int64 (n + 1,)
+    indices: np.ndarray  # int32 (nnz,)
+    edge_kind: np.ndarray  # int8 (nnz,)
+
+    @cached_property
+    def _ids(self) -> Dict[str, int]:
+        return {key: idx for idx, key in enumerate(self.keys)}
+
+    @cached_property
+    def edge_rows(self) -> np.ndarray:
+        """Source node of every CSR entry (the row index expanded per neighbour)."""
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.indptr))
+
+    @cached_property
+    def entity_index(self) -> EntityIndex:
+        return EntityIndex.build(
+            self.keys, self.nodes_of_type(NODE_ENTITY).tolist(), self.frequency
+        )
+
+    @cached_property
+    def cooccurrence(self) -> CooccurrenceIndex:
+        return CooccurrenceIndex.build(self)
+
+    def warm(self) -> None:
+        """Build the entity and co-occurrence indexes now rather than on the first query."""
+        _ = self.entity_index, self.cooccurrence
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.keys)
+
+    @property
+    def num_edges(self) -> int:
+        return int(self.indices.shape[0]) // 2
+
+    @property
+    def section_count(self) -> int:
+        return int(np.count_nonzero(self.node_type == NODE_SECTION))
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (
+            self.node_type,
+            self.frequency,
+            self.section_chunk,
+            self.section_doc,
+            self.indptr,
+            self.indices,
+            self.edge_kind,
+        )
+        strings = sum(sys.getsizeof(key) for key in self.keys)
+        strings += sum(sys.getsizeof(label) for label in self.labels if label is not None)
+        if "entity_index" in self.__dict__:
+            strings += self.entity_index.nbytes
+        if "cooccurrence" in self.__dict__:
+            strings += self.cooccurrence.nbytes
+        return strings + sum(int(array.nbytes) for array in arrays)
+
+    def node_id(self, key: str) -> Optional[int]:
+        return self._ids.get(key)
+
+    def nodes_of_type(self, node_type: int) -> np.ndarray:
+        return np.flatnonzero(self.node_type == node_type)
+
+    def neighbors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node] : self.indptr[node + 1]]
+
+    def describe(self, node: int) -> Dict[str, str]:
+        key = self.keys[node]
+        node_type = int(self.node_type[node])
+        if node_type == NODE_SECTION:
+            return {"id": key, "type": "section", "doc_id": self.keys[int(self.section_doc[node])]}
+        if node_type == NODE_DOC:
+            return {"id": key, "type": "doc", "title": self.labels[node] or ""}
+        return {"id": key, "type": "entity", "name": self.labels[node] or key}
+
+
+class GraphBuilder:
+    """Accumulates nodes and edges in flat buffers; ``build`` freezes them into CSR."""
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._labels: List[Optional[str]] = []
+        self._types = array("b")
+        self._frequency = array("i")
+        self._chunk = array("i")
+        self._doc = array("i")
+        self._src = array("i")
+        self._dst = array("i")
+        self._kind = array("b")
+
+    def add_node(
+        self,
+        key: str,
+        node_type: int,
+        *,
+        label: Optional[str] = None,
+        chunk_index: int = -1,
+        doc: int = -1,
+        frequency: int = 0,
+    ) -> int:
+        """Intern ``key``; an existing node keeps its type and attributes."""
+        idx = self._ids.get(key)
+        if idx is None:
+            idx = self._ids[key] = len(self._keys)
+            self._keys.append(key)
+            self._labels.append(label)
+            self._types.append(node_type)
+            self._frequency.append(frequency)
+            self._chunk.append(chunk_index)
+            self._doc.append(doc)
+        return idx
+
+    def mention(self, node: int) -> None:
+        self._frequency[node] += 1
+
+    def add_edge(self, source: int, target: int, kind: int) -> None:
+        self._src.append(source)
+        self._dst.append(target)
+        self._kind.append(kind)
+
+    def build(self, *, index_entities: bool = True) -> GraphStore:
+        n = len(self._keys)
+        src = np.array(self._src, dtype=np.int32)
+        dst = np.array(self._dst, dtype=np.int32)
+        kind = np.array(self._kind, dtype=np.int8)
+        both_src = np.concatenate([src, dst])
+        both_dst = np.concatenate([dst, src])
+        # One entry per (source, neighbour) pair; unique() also sorts rows for CSR.
+        _, first = np.unique(both_src.astype(np.int64) * max(n, 1) + both_dst, return_index=True)
+        rows = both_src[first]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        store = GraphStore(
+            keys=list(self._keys),
+            labels=list(self._labels),
+            node_type=np.array(self._types, dtype=np.int8),
+            frequency=np.array(self._frequency, dtype=np.int32),
+            section_chunk=np.array(self._chunk, dtype=np.int32),
+            section_doc=np.array(self._doc, dtype=np.int32),
+            indptr=indptr,
+            indices=np.ascontiguousarray(both_dst[first]),
+            edge_kind=np.concatenate([kind, kind])[first],
+        )
+        if index_entities:
+            store.warm()
+        return store
 
 
 def normalize_entity_name(name: str) -> str:
@@ -106,26 +371,188 @@ def extract_candidate_entities(text: str, limit: int = 5) -> List[str]:
     return result
 
 
-def build_graph_store(documents: Dict[str, Dict[str, str]], chunk_map: Sequence[Tuple[str, int, int, str]]) -> GraphStore:
-    store = GraphStore()
+def _extract_partial(texts: Sequence[str]) -> Tuple[List[str], List[List[int]]]:
+    """Entities of a batch of chunks: a batch-local name table plus each chunk's name ids.
+
+    Runs in the extraction pool; the compact result keeps pickling cheap.
+    """
+    names: List[str] = []
+    local_ids: Dict[str, int] = {}
+    mentions: List[List[int]] = []
+    for text in texts:
+        chunk_ids = []
+        for name in extract_candidate_entities(text):
+            key = name.lower()
+            idx = local_ids.get(key)
+            if idx is None:
+                idx = local_ids[key] = len(names)
+                names.append(name)
+            chunk_ids.append(idx)
+        mentions.append(chunk_ids)
+    return names, mentions
+
+
+_pool_lock = threading.Lock()
+_extract_pool: ProcessPoolExecutor | None = None
+_extract_pool_workers = 0
+
+
+def _get_extract_pool(workers: int) -> ProcessPoolExecutor:
+    global _extract_pool, _extract_pool_workers
+    with _pool_lock:
+        if _extract_pool is None or _extract_pool_workers != workers:
+            if _extract_pool is not None:
+                _extract_pool.shutdown(wait=False, cancel_futures=True)
+            # spawn: forking a threaded server process is unsafe.
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _extract_pool_workers = workers
+        return _extract_pool
+
+
+def shutdown_extract_pool() -> None:
+    global _extract_pool
+    with _pool_lock:
+        if _extract_pool is not None:
+            _extract_pool.shutdown(wait=False, cancel_futures=True)
+            _extract_pool = None
+
+
+def _extract_partials(
+    texts: List[str], *, workers: int, batch_size: int, min_parallel_chunks: int
+) -> Iterable[Tuple[List[str], List[List[int]]]]:
+    if workers <= 1 or len(texts) < max(min_parallel_chunks, 2):
+        return [_extract_partial(texts)]
+    size = max(1, batch_size)
+    batches = [texts[i : i + size] for i in range(0, len(texts), size)]
+    try:
+        return list(_get_extract_pool(workers).map(_extract_partial, batches))
+    except (BrokenProcessPool, OSError) as exc:
+        logger.warning("[GRAPH] extraction pool failed (%s); extracting serially", exc)
+        shutdown_extract_pool()
+        return [_extract_partial(texts)]
+
+
+def chunk_digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class EntityCache:
+    """Bounded LRU of per-chunk entity names, keyed by ``chunk_digest`` of the text.
+
+    Extraction is a pure function of the chunk text, so a re-index (new chunk
+    size, an added document) only extracts chunks whose text was not seen yet.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[bytes, Tuple[str, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, digests: Sequence[bytes]) -> List[Optional[Tuple[str, ...]]]:
+        found: List[Optional[Tuple[str, ...]]] = []
+        with self._lock:
+            for digest in digests:
+                names = self._entries.get(digest)
+                if names is not None:
+                    self._entries.move_to_end(digest)
+                found.append(names)
+            hits = sum(names is not None for names in found)
+            self.hits += hits
+            self.misses += len(found) - hits
+        return found
+
+    def put_many(self, items: Iterable[Tuple[bytes, Tuple[str, ...]]]) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            for digest, names in items:
+                self._entries[digest] = names
+                self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def _chunk_entities(
+    texts: List[str],
+    *,
+    cache: Optional[EntityCache],
+    workers: int,
+    batch_size: int,
+    min_parallel_chunks: int,
+) -> List[Sequence[str]]:
+    """Entity names of every chunk, extracting only the ones ``cache`` does not hold."""
+    digests = [chunk_digest(text) for text in texts] if cache is not None else []
+    entities = cache.get_many(digests) if cache is not None else [None] * len(texts)
+    missing = [idx for idx, names in enumerate(entities) if names is None]
+    if missing:
+        partials = _extract_partials(
+            [texts[idx] for idx in missing],
+            workers=workers,
+            batch_size=batch_size,
+            min_parallel_chunks=min_parallel_chunks,
+        )
+        fresh = [
+            tuple(names[local] for local in chunk_ids)
+            for names, mentions in partials
+            for chunk_ids in mentions
+        ]
+        for idx, names in zip(missing, fresh, strict=True):
+            entities[idx] = names
+        if cache is not None:
+            cache.put_many((digests[idx], names) for idx, names in zip(missing, fresh, strict=True))
+    return [names or () for names in entities]
+
+
+def build_graph_store(
+    documents: Dict[str, Dict[str, str]],
+    chunk_map: Sequence[Tuple[str, int, int, str]],
+    *,
+    workers: int = 1,
+    batch_size: int = 256,
+    min_parallel_chunks: int = 1024,
+    builder: Optional[GraphBuilder] = None,
+    entity_cache: Optional[EntityCache] = None,
+) -> GraphStore:
+    """Build the doc/section/entity graph for ``chunk_map``.
+
+    With ``workers > 1`` and at least ``min_parallel_chunks`` chunks, entity
+    extraction runs in a process pool over batches of ``batch_size`` chunks; the
+    per-batch partial results are merged in chunk order, so the graph is the
+    same as a serial build. Chunks found in ``entity_cache`` are not extracted
+    again. ``builder`` defaults to an in-memory ``GraphBuilder``; pass a
+    ``graph_sqlite.SqliteGraphBuilder`` to write the graph to disk instead.
+    """
+    builder = builder if builder is not None else GraphBuilder()
     for doc_id, doc in documents.items():
-        store.docs[doc_id] = GraphDoc(id=doc_id, title=doc.get("name"))
-
-    for idx, (doc_id, _start, _end, text) in enumerate(chunk_map):
-        section_id = f"{doc_id}:{idx}"
-        store.sections[section_id] = GraphSection(id=section_id, doc_id=doc_id, chunk_index=idx, text=text)
-        store.add_edge(doc_id, section_id, "SUPPORTS")
-
-        for entity_name in extract_candidate_entities(text):
-            entity_key = entity_name.lower()
-            if entity_key not in store.entities:
-                store.entities[entity_key] = GraphEntity(id=entity_key, name=entity_name, frequency=1)
-            else:
-                store.entities[entity_key].frequency += 1
-            store.add_edge(section_id, entity_key, "MENTIONS")
-            store.add_edge(entity_key, doc_id, "REFERS_TO")
-
-    return store
+        builder.add_node(doc_id, NODE_DOC, label=doc.get("name"))
+
+    chunk_entities = _chunk_entities(
+        [entry[3] for entry in chunk_map],
+        cache=entity_cache,
+        workers=workers,
+        batch_size=batch_size,
+        min_parallel_chunks=min_parallel_chunks,
+    )
+    for idx, names in enumerate(chunk_entities):
+        doc_id = chunk_map[idx][0]
+        doc_node = builder.add_node(doc_id, NODE_DOC)
+        section = builder.add_node(f"{doc_id}:{idx}", NODE_SECTION, chunk_index=idx, doc=doc_node)
+        builder.add_edge(doc_node, section, EDGE_SUPPORTS)
+        for name in names:
+            entity = builder.add_node(name.lower(), NODE_ENTITY, label=name)
+            builder.mention(entity)
+            builder.add_edge(section, entity, EDGE_MENTIONS)
+            builder.add_edge(entity, doc_node, EDGE_REFERS_TO)
+
+    return builder.build()
 
 
 def plan_subqueries(query: str, max_subqueries: int = 3) -> List[str]:
@@ -146,75 +573,283 @@ def plan_subqueries(query: str, max_subqueries: int = 3) -> List[str]:
 
 
 def match_entities(store: GraphStore, query: str) -> List[str]:
-    if not store.entities:
+    """Entity keys for ``query``, in node order.
+
+    An entity matches when its full name appears as consecutive query words, or
+    when a query word (other than a stopword) is one of its words. Failing that,
+    entities with a word starting with a query word are returned, most frequent
+    first (at most five). Cost is linear in the query length plus the matches.
+    """
+    if not isinstance(store, GraphStore):
+        return store.match_entities(query)
+    index = store.entity_index
+    if not index.names:
         return []
-    lowered = query.lower()
-    matches = []
-    for key, entity in store.entities.items():
-        if entity.name.lower() in lowered or any(token in key for token in lowered.split()):
-            matches.append(key)
+    words = _WORD_PATTERN.findall(query.lower())
+    matches = set()
+    for start, word in enumerate(words):
+        for end in range(start + 1, min(start + index.max_words, len(words)) + 1):
+            node = index.names.get(" ".join(words[start:end]))
+            if node is not None:
+                matches.add(node)
+        if word not in STOPWORDS:
+            matches.update(index.postings.get(word, ()))
     if matches:
-        return matches
-    tokens = [tok for tok in re.findall(r"\w+", lowered) if tok not in STOPWORDS]
-    for key, entity in sorted(store.entities.items(), key=lambda item: item[1].frequency, reverse=True):
-        if any(token in key for token in tokens):
-            matches.append(key)
-        if len(matches) >= 5:
-            break
-    return matches
+        return [store.keys[node] for node in sorted(matches)]
+
+    candidates = set()
+    vocab = index.vocab
+    for word in words:
+        if word in STOPWORDS or len(word) < _MIN_PREFIX:
+            continue
+        pos = bisect_left(vocab, word)
+        while pos < len(vocab) and vocab[pos].startswith(word):
+            candidates.update(index.postings[vocab[pos]])
+            pos += 1
+    ranked = sorted(candidates, key=index.rank.__getitem__)
+    return [store.keys[node] for node in ranked[:5]]
 
 
-def traverse_graph(store: GraphStore, seeds: List[str], max_hops: int) -> Tuple[List[int], List[Dict[str, List[Dict[str, str]]]], int, int]:
-    if not store.sections:
-        return [], [], 0, 0
+@dataclass
+class GraphTraversal:
+    """Sections reached by ``expand_graph`` plus the BFS tree that reached them.
+
+    Paths are not materialised during the walk: ``parent`` records each node's
+    predecessor and ``paths`` rebuilds descriptions only for the sections asked for.
+    """
+
+    store: GraphStore
+    section_nodes: np.ndarray  # int32 section node ids in discovery (or score) order
+    parent: np.ndarray  # int32 (n,): BFS predecessor, -1 for start nodes and unreached nodes
+    hops_used: int
+    seed_count: int
+    scores: Optional[np.ndarray] = None  # float (len(section_nodes),) when ranked
+
+    @property
+    def sections(self) -> List[int]:
+        return self.store.section_chunk[self.section_nodes].tolist()
+
+    def path(self, node: int) -> Dict[str, List[Dict[str, str]]]:
+        chain = []
+        while node >= 0:
+            chain.append(node)
+            node = int(self.parent[node])
+        return {"nodes": [self.store.describe(nid) for nid in reversed(chain)]}
+
+    def paths(
+        self, chunk_indices: Optional[Iterable[int]] = None
+    ) -> List[Dict[str, List[Dict[str, str]]]]:
+        """Paths to every discovered section, or only to those for ``chunk_indices``."""
+        nodes = self.section_nodes.tolist()
+        if chunk_indices is not None:
+            wanted = set(chunk_indices)
+            nodes = [node for node in nodes if int(self.store.section_chunk[node]) in wanted]
+        return [self.path(node) for node in nodes]
+
+
+def _row_entries(indptr: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Entry positions of CSR ``rows`` (concatenated in row order) and the row each belongs to."""
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    total = int(counts.sum())
+    offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets, np.repeat(rows, counts)
+
+
+def _expand_frontier(store: GraphStore, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Neighbours of every frontier node and the frontier node each came from.
+
+    This is the CSR product of the adjacency with the frontier indicator vector,
+    keeping the row order so the first occurrence of a neighbour is its BFS parent.
+    """
+    positions, owners = _row_entries(store.indptr, frontier)
+    return store.indices[positions], owners
+
+
+def _start_nodes(store: GraphStore, seeds: List[str]) -> np.ndarray:
+    """Seed entity nodes, or the first two documents when no seed is an entity."""
+    seed_nodes = [store.node_id(seed) for seed in seeds]
+    start = np.array(
+        list(
+            dict.fromkeys(
+                node
+                for node in seed_nodes
+                if node is not None and store.node_type[node] == NODE_ENTITY
+            )
+        ),
+        dtype=np.int32,
+    )
+    if not start.size:
+        start = store.nodes_of_type(NODE_DOC)[:2].astype(np.int32)
+    return start
+
+
+def expand_graph(
+    store: GraphStore, seeds: List[str], max_hops: int, *, limit: Optional[int] = MAX_GRAPH_SECTIONS
+) -> GraphTraversal:
+    """Breadth-first expansion from the seed entities, one frontier per hop.
+
+    Without any seed entity the walk starts from the first two documents. Stops
+    after ``max_hops`` hops or once ``limit`` sections have been reached
+    (``None`` walks every hop). Out-of-core stores are walked over their
+    ``max_hops`` neighbourhood of the seeds.
+    """
+    if not isinstance(store, GraphStore):
+        store = store.subgraph(seeds, max_hops)
+    parent = np.full(store.num_nodes, -1, dtype=np.int32)
+    if not store.section_count:
+        return GraphTraversal(store, np.empty(0, dtype=np.int32), parent, 0, 0)
     max_hops = max(1, max_hops)
-    visited = set()
-    queue = deque()
-    for seed in seeds:
-        if seed in store.entities:
-            queue.append((seed, [seed], 0))
-            visited.add(seed)
-    if not queue:
-        for doc_id in list(store.docs.keys())[:2]:
-            queue.append((doc_id, [doc_id], 0))
-            visited.add(doc_id)
-
-    discovered_sections: List[int] = []
-    paths: List[Dict[str, List[Dict[str, str]]]] = []
+    limit = store.num_nodes if limit is None else limit
+    frontier = _start_nodes(store, seeds)
+    visited = np.zeros(store.num_nodes, dtype=bool)
+    visited[frontier] = True
+
+    found: List[np.ndarray] = []
+    found_count = 0
     hops_used = 0
-    while queue and len(discovered_sections) < 20:
-        node_id, path, depth = queue.popleft()
-        hops_used = max(hops_used, depth)
-        neighbors = store.adjacency.get(node_id, set())
-        for neighbor in neighbors:
-            if neighbor in visited:
-                continue
-            visited.add(neighbor)
-            next_path = path + [neighbor]
-            if neighbor in store.sections:
-                section = store.sections[neighbor]
-                discovered_sections.append(section.chunk_index)
-                paths.append(
-                    {
-                        "nodes": [
-                            _describe_node(store, nid)
-                            for nid in next_path
-                        ]
-                    }
-                )
-            if depth + 1 < max_hops:
-                queue.append((neighbor, next_path, depth + 1))
-    return discovered_sections, paths, hops_used, len(seeds)
-
-
-def _describe_node(store: GraphStore, node_id: str) -> Dict[str, str]:
-    if node_id in store.sections:
-        section = store.sections[node_id]
-        return {"id": node_id, "type": "section", "doc_id": section.doc_id}
-    if node_id in store.docs:
-        doc = store.docs[node_id]
-        return {"id": node_id, "type": "doc", "title": doc.title or ""}
-    if node_id in store.entities:
-        entity = store.entities[node_id]
-        return {"id": node_id, "type": "entity", "name": entity.name}
-    return {"id": node_id, "type": "unknown"}
+    for depth in range(max_hops):
+        if not frontier.size or found_count >= limit:
+            break
+        hops_used = depth
+        neighbors, parents = _expand_frontier(store, frontier)
+        fresh = ~visited[neighbors]
+        neighbors, parents = neighbors[fresh], parents[fresh]
+        _, first = np.unique(neighbors, return_index=True)
+        first.sort()
+        frontier = neighbors[first]
+        parent[frontier] = parents[first]
+        visited[frontier] = True
+        sections = frontier[store.node_type[frontier] == NODE_SECTION][: limit - found_count]
+        found.append(sections)
+        found_count += len(sections)
+    section_nodes = np.concatenate(found) if found else np.empty(0, dtype=np.int32)
+    return GraphTraversal(store, section_nodes, parent, hops_used, len(seeds))
+
+
+def expand_cooccurrence(
+    store: GraphStore, seeds: List[str], max_hops: int, *, limit: Optional[int] = MAX_GRAPH_SECTIONS
+) -> GraphTraversal:
+    """Entity -> section -> entity expansion read from ``store.cooccurrence``.
+
+    Sections mentioning a seed entity come first (node order); with
+    ``max_hops >= 2`` they are followed by sections of the entities co-occurring
+    with the seeds, most shared sections first. Finding those entities is one
+    sparse-row read per seed instead of a walk over every seed section's
+    neighbours. Parents follow seed -> shared section -> entity -> section, so
+    ``paths`` read like BFS paths. Without a seed entity this is ``expand_graph``.
+    """
+    if not isinstance(store, GraphStore):
+        store = store.subgraph(seeds, max(3, max_hops))
+    start = _start_nodes(store, seeds)
+    if not store.section_count or not start.size or store.node_type[start[0]] != NODE_ENTITY:
+        return expand_graph(store, seeds, max_hops, limit=limit)
+    limit = store.num_nodes if limit is None else limit
+    parent = np.full(store.num_nodes, -1, dtype=np.int32)
+    found = np.zeros(store.num_nodes, dtype=bool)
+    found[start] = True
+
+    neighbors, owners = _expand_frontier(store, start)
+    mentions = store.node_type[neighbors] == NODE_SECTION
+    direct, first = np.unique(neighbors[mentions], return_index=True)
+    parent[direct] = owners[mentions][first]
+    found[direct] = True
+    section_nodes = [direct[:limit].astype(np.int32)]
+    # Counted like ``expand_graph``: direct sections take one hop once a second is allowed.
+    hops_used = 1 if max_hops >= 2 and direct.size else 0
+
+    co = store.cooccurrence
+    positions, _ = _row_entries(co.indptr, start)
+    positions = positions[~found[co.partners[positions]]]
+    if max_hops >= 2 and positions.size and len(direct) < limit:
+        partners, inverse = np.unique(co.partners[positions], return_inverse=True)
+        totals = np.bincount(inverse, weights=co.weight[positions])
+        _, first_entry = np.unique(inverse, return_index=True)
+        order = np.argsort(-totals, kind="stable")
+        ranked = partners[order].astype(np.int32)
+        # Each entity is reached through the first section it shares with a seed.
+        parent[ranked] = co.support[co.support_ptr[positions[first_entry[order]]]]
+        found[ranked] = True
+        neighbors, owners = _expand_frontier(store, ranked)
+        fresh = (store.node_type[neighbors] == NODE_SECTION) & ~found[neighbors]
+        neighbors, owners = neighbors[fresh], owners[fresh]
+        _, first = np.unique(neighbors, return_index=True)
+        first.sort()
+        bridged = neighbors[first]
+        parent[bridged] = owners[first]
+        section_nodes.append(bridged[: limit - len(section_nodes[0])])
+        if bridged.size:
+            hops_used = 2
+    return GraphTraversal(store, np.concatenate(section_nodes), parent, hops_used, len(seeds))
+
+
+def personalized_pagerank(
+    store: GraphStore,
+    start: np.ndarray,
+    *,
+    alpha: float = PPR_ALPHA,
+    max_iter: int = PPR_MAX_ITER,
+    tol: float = PPR_TOL,
+) -> np.ndarray:
+    """Personalized PageRank over the undirected graph, restarting at ``start``.
+
+    Power iteration ``p = alpha * s + (1 - alpha) * A D^-1 p`` on the CSR arrays;
+    mass on isolated nodes returns to the restart distribution. Stops after
+    ``max_iter`` iterations or once the L1 change drops below ``tol``.
+    """
+    n = store.num_nodes
+    restart = np.zeros(n, dtype=np.float64)
+    if not n or not len(start):
+        return restart
+    restart[start] = 1.0 / len(start)
+    degree = np.diff(store.indptr).astype(np.float64)
+    dangling = degree == 0
+    inv_degree = np.divide(1.0, degree, out=np.zeros(n), where=~dangling)
+    rows = store.edge_rows
+    scores = restart.copy()
+    for _ in range(max(1, max_iter)):
+        spread = np.bincount(rows, weights=(scores * inv_degree)[store.indices], minlength=n)
+        updated = (1.0 - alpha) * spread + (
+            alpha + (1.0 - alpha) * scores[dangling].sum()
+        ) * restart
+        delta = float(np.abs(updated - scores).sum())
+        scores = updated
+        if delta < tol:
+            break
+    return scores
+
+
+def rank_graph_sections(
+    store: GraphStore,
+    seeds: List[str],
+    max_hops: int,
+    *,
+    limit: int = MAX_GRAPH_SECTIONS,
+    alpha: float = PPR_ALPHA,
+    max_iter: int = PPR_MAX_ITER,
+) -> GraphTraversal:
+    """Sections within ``max_hops`` of the seeds, best ``limit`` by personalized PageRank.
+
+    The BFS tree from ``expand_graph`` bounds the candidates and provides their
+    paths; ``scores`` holds each returned section's PageRank mass. For
+    out-of-core stores PageRank runs on the ``max_hops`` neighbourhood.
+    """
+    if not isinstance(store, GraphStore):
+        store = store.subgraph(seeds, max_hops)
+    traversal = expand_graph(store, seeds, max_hops, limit=None)
+    if not traversal.section_nodes.size:
+        return traversal
+    ranks = personalized_pagerank(store, _start_nodes(store, seeds), alpha=alpha, max_iter=max_iter)
+    candidate_scores = ranks[traversal.section_nodes]
+    # Stable sort keeps BFS discovery order between equal scores.
+    order = np.argsort(-candidate_scores, kind="stable")[: max(0, limit)]
+    traversal.section_nodes = traversal.section_nodes[order]
+    traversal.scores = candidate_scores[order]
+    return traversal
+
+
+def traverse_graph(
+    store: GraphStore, seeds: List[str], max_hops: int
+) -> Tuple[List[int], List[Dict[str, List[Dict[str, str]]]], int, int]:
+    traversal = expand_graph(store, seeds, max_hops)
+    return traversal.sections, traversal.paths(), traversal.hops_used, traversal.seed_count
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import settings
+from . import disk_cache
+from .concurrency import StripedLocks
+from .graph import EntityCache, GraphStore, build_graph_store, chunk_digest
+from .graph_sqlite import (
+    SqliteGraphBuilder,
+    SqliteGraphStore,
+    live_graph_paths,
+    temporary_graph_path,
+)
+from .index_format import load_graph_file, save_graph_file
+from .session import get_session, get_session_index, set_session_graph
+
+logger = logging.getLogger(__name__)
+
+# Single-flight per index build: concurrent callers for the same corpus wait on one build.
+_BUILD_LOCKS = StripedLocks()
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "builds": 0,
+    "joined": 0,
+    "scheduled": 0,
+    "failed": 0,
+    "cache_hits": 0,
+    "cache_misses": 0,
+    "build_ms_total": 0.0,
+    "last_build_ms": None,
+}
+
+_pool_lock = threading.Lock()
+_build_pool: ThreadPoolExecutor | None = None
+
+
+# Bump when the graph produced for the same chunks changes (extraction, node model).
+_GRAPH_CACHE_FORMAT = 1
+
+_entity_cache_lock = threading.Lock()
+_entity_cache: EntityCache | None = None
+
+
+def get_entity_cache() -> EntityCache:
+    global _entity_cache
+    with _entity_cache_lock:
+        if _entity_cache is None:
+            _entity_cache = EntityCache(settings.GRAPH_ENTITY_CACHE_CHUNKS)
+        return _entity_cache
+
+
+def graph_cache_key(docs: Dict[str, Dict[str, Any]], chunk_map: list) -> str:
+    """Key a graph by what it is built from: document ids and titles plus every chunk's text hash.
+
+    Doc ids are content hashes and the chunk map follows from the documents and
+    the chunking parameters, so equal keys mean the same documents chunked the
+    same way.
+    """
+    digest = hashlib.sha256(f"graph-v{_GRAPH_CACHE_FORMAT}".encode("utf-8"))
+    for doc_id, doc in docs.items():
+        digest.update(json.dumps([doc_id, doc.get("name")], ensure_ascii=False).encode("utf-8"))
+    for entry in chunk_map:
+        digest.update(entry[0].encode("utf-8"))
+        digest.update(chunk_digest(entry[3]))
+    return f"graph-{digest.hexdigest()[:40]}"
+
+
+def _graph_cache_dir() -> Path:
+    if settings.GRAPH_CACHE_DIR:
+        return Path(settings.GRAPH_CACHE_DIR)
+    return Path(tempfile.gettempdir()) / "rag-graph-cache"
+
+
+def _sqlite_graph_dir() -> Optional[Path]:
+    """Directory for persistent graph databases (``None``: temporary, per-process files)."""
+    if settings.GRAPH_SQLITE_DIR:
+        return Path(settings.GRAPH_SQLITE_DIR)
+    if settings.SESSION_PERSIST_DIR:
+        return Path(settings.SESSION_PERSIST_DIR) / "graphs"
+    return None
+
+
+def _build(docs: Dict[str, Dict[str, Any]], chunk_map: list, builder: Any = None) -> Any:
+    return build_graph_store(
+        docs,
+        chunk_map,
+        workers=settings.GRAPH_BUILD_WORKERS,
+        batch_size=settings.GRAPH_BUILD_BATCH_CHUNKS,
+        min_parallel_chunks=settings.GRAPH_BUILD_PARALLEL_MIN_CHUNKS,
+        builder=builder,
+        entity_cache=get_entity_cache(),
+    )
+
+
+def _record_cache(hit: bool) -> None:
+    with _stats_lock:
+        _stats["cache_hits" if hit else "cache_misses"] += 1
+
+
+def _load_cached(path: Path) -> Optional[GraphStore]:
+    if not settings.GRAPH_CACHE_ENABLED or not path.is_file():
+        return None
+    try:
+        graph = load_graph_file(path)
+    except Exception as exc:
+        logger.warning("Discarding unreadable graph cache entry %s: %s", path, exc)
+        path.unlink(missing_ok=True)
+        return None
+    disk_cache.touch(path)
+    # Built eagerly, as after a fresh build.
+    graph.warm()
+    return graph
+
+
+def _store_cached(path: Path, graph: GraphStore) -> None:
+    if not settings.GRAPH_CACHE_ENABLED:
+        return
+    staging = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_graph_file(graph, staging)
+        os.replace(staging, path)
+    except OSError as exc:
+        staging.unlink(missing_ok=True)
+        logger.warning("Failed to write graph cache entry %s: %s", path, exc)
+        return
+    disk_cache.evict_lru(path.parent, "*.npz", settings.GRAPH_CACHE_MAX_MB * 1024 * 1024)
+
+
+def _build_memory(docs: Dict[str, Dict[str, Any]], chunk_map: list, key: str) -> GraphStore:
+    path = _graph_cache_dir() / f"{key}.npz"
+    graph = _load_cached(path)
+    _record_cache(graph is not None)
+    if graph is None:
+        graph = _build(docs, chunk_map)
+        _store_cached(path, graph)
+    return graph
+
+
+def _build_sqlite(docs: Dict[str, Dict[str, Any]], chunk_map: list, key: str) -> SqliteGraphStore:
+    root = _sqlite_graph_dir()
+    if root is None:
+        # Nothing to persist to: the file lives as long as the graph object.
+        return _build(docs, chunk_map, SqliteGraphBuilder(temporary_graph_path(), owned=True))
+    path = root / f"{key}.sqlite3"
+    _record_cache(path.is_file())
+    if path.is_file():
+        # Same documents and chunking as an earlier build, possibly by an earlier process.
+        disk_cache.touch(path)
+        return SqliteGraphStore(path)
+    staging = root / f".{key}.{uuid.uuid4().hex}.tmp"
+    _build(docs, chunk_map, SqliteGraphBuilder(staging))
+    os.replace(staging, path)
+    graph = SqliteGraphStore(path)
+    # Databases still open here are kept; saved indexes referencing an evicted one rebuild it.
+    max_bytes = settings.GRAPH_SQLITE_MAX_MB * 1024 * 1024
+    disk_cache.evict_lru(root, "*.sqlite3", max_bytes, keep=live_graph_paths())
+    return graph
+
+
+def build_session_graph(
+    docs: Dict[str, Dict[str, Any]], chunk_map: list
+) -> GraphStore | SqliteGraphStore:
+    """Build the graph for an index with the configured ``GRAPH_BACKEND``.
+
+    Graphs are cached by ``graph_cache_key`` (in-memory graphs as compact .npz
+    files in ``GRAPH_CACHE_DIR``, SQLite graphs in their persistent directory),
+    so re-indexing unchanged documents with the same chunking skips the build;
+    otherwise only chunks missing from the entity cache are extracted.
+    """
+    key = graph_cache_key(docs, chunk_map)
+    if settings.GRAPH_BACKEND == "sqlite":
+        return _build_sqlite(docs, chunk_map, key)
+    return _build_memory(docs, chunk_map, key)
+
+
+def ensure_session_graph(sid: str) -> GraphStore | SqliteGraphStore | None:
+    """The graph for ``sid``'s index, building it on first use.
+
+    Builds are single-flight per index: sessions sharing an index and concurrent
+    advanced queries wait for the one build in progress and then reuse it.
+    Returns ``None`` when the session has no index.
+    """
+    index = get_session_index(sid)
+    if index is None:
+        return None
+    if index.graph is not None:
+        return index.graph
+    with _BUILD_LOCKS.for_key(index.index_id or sid):
+        current = get_session_index(sid)
+        if current is None:
+            return None
+        if current.graph is not None:
+            with _stats_lock:
+                _stats["joined"] += 1
+            return current.graph
+        session = get_session(sid)
+        if session is None:
+            return None
+        started = time.perf_counter()
+        graph = build_session_graph(session["docs"], current.chunk_map)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        set_session_graph(sid, current.index_id, graph)
+    with _stats_lock:
+        _stats["builds"] += 1
+        _stats["build_ms_total"] += elapsed_ms
+        _stats["last_build_ms"] = round(elapsed_ms, 3)
+    logger.info("[GRAPH] built graph for index=%s in %.1f ms", current.index_id, elapsed_ms)
+    return graph
+
+
+def _get_build_pool() -> ThreadPoolExecutor:
+    global _build_pool
+    with _pool_lock:
+        if _build_pool is None:
+            _build_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="graph-build")
+        return _build_pool
+
+
+def _build_in_background(sid: str) -> None:
+    try:
+        ensure_session_graph(sid)
+    except Exception:
+        with _stats_lock:
+            _stats["failed"] += 1
+        logger.exception("[GRAPH] background graph build failed for session=%s", sid)
+
+
+def schedule_session_graph(sid: str) -> Future:
+    """Build ``sid``'s graph off the request path (a no-op once it exists)."""
+    with _stats_lock:
+        _stats["scheduled"] += 1
+    return _get_build_pool().submit(_build_in_background, sid)
+
+
+def shutdown_graph_builds() -> None:
+    global _build_pool
+    with _pool_lock:
+        if _build_pool is not None:
+            _build_pool.shutdown(wait=False, cancel_futures=True)
+            _build_pool = None
+
+
+def graph_build_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        builds = _stats["builds"]
+        return {
+            "mode": settings.GRAPH_BUILD_MODE,
+            "builds": builds,
+            "joined": _stats["joined"],
+            "scheduled": _stats["scheduled"],
+            "failed": _stats["failed"],
+            "cache_hits": _stats["cache_hits"],
+            "cache_misses": _stats["cache_misses"],
+            "entity_cache": get_entity_cache().stats(),
+            "last_build_ms": _stats["last_build_ms"],
+            "avg_build_ms": round(_stats["build_ms_total"] / builds, 3) if builds else None,
+        }
@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import uuid
+import weakref
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from .graph import (
+    _MIN_PREFIX,
+    _WORD_PATTERN,
+    NODE_DOC,
+    NODE_ENTITY,
+    NODE_SECTION,
+    STOPWORDS,
+    GraphBuilder,
+    GraphStore,
+)
+
+_SCHEMA = """
+CREATE TABLE nodes (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    type INTEGER NOT NULL,
+    label TEXT,
+    frequency INTEGER NOT NULL DEFAULT 0,
+    chunk INTEGER NOT NULL DEFAULT -1,
+    doc INTEGER NOT NULL DEFAULT -1
+);
+CREATE TABLE edges (
+    src INTEGER NOT NULL,
+    dst INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    PRIMARY KEY (src, dst)
+) WITHOUT ROWID;
+CREATE TABLE entity_words (
+    word TEXT NOT NULL,
+    node INTEGER NOT NULL,
+    PRIMARY KEY (word, node)
+) WITHOUT ROWID;
+CREATE TABLE meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+_INDEXES = """
+CREATE INDEX nodes_by_type ON nodes (type, id);
+"""
+# Rows buffered by the builder before an executemany round trip.
+_FLUSH_ROWS = 10_000
+
+# Nodes within ``max_hops`` of the start nodes. UNION (not UNION ALL) drops repeated
+# (node, depth) pairs so each node is expanded at most once per depth.
+_REACH_SQL = """
+WITH RECURSIVE reach(node, depth) AS (
+    SELECT id, 0 FROM nodes WHERE id IN ({marks})
+    UNION
+    SELECT e.dst, r.depth + 1 FROM reach AS r JOIN edges AS e ON e.src = r.node WHERE r.depth < ?
+)
+INSERT INTO temp.reached (id) SELECT DISTINCT node FROM reach
+"""
+
+
+def _placeholders(count: int) -> str:
+    """``?,?,...`` for an ``IN`` list: values are always bound, never interpolated."""
+    return ",".join("?" * count)
+
+
+# Stores opened on persistent databases, so cache eviction can skip files in use.
+_live_lock = threading.Lock()
+_live_stores: "weakref.WeakSet[SqliteGraphStore]" = weakref.WeakSet()
+
+
+def live_graph_paths() -> Set[Path]:
+    """Persistent graph databases currently open in this process."""
+    with _live_lock:
+        return {store.path for store in list(_live_stores)}
+
+
+def temporary_graph_path() -> Path:
+    """A fresh path for a per-process graph database (pair it with ``owned=True``)."""
+    return Path(tempfile.gettempdir()) / "rag-graphs" / f"{uuid.uuid4().hex}.sqlite3"
+
+
+def open_graph_copy(source: str | Path) -> SqliteGraphStore:
+    """Open a private copy of the database at ``source``, removed with the returned store.
+
+    For databases inside directories that may be deleted while the graph is in use
+    (spills, unpacked snapshots): connections are opened lazily, per thread.
+    """
+    path = temporary_graph_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(source, path)
+    return SqliteGraphStore(path, owned=True)
+
+
+def _remove_database(path: str) -> None:
+    for suffix in ("", "-journal", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+class SqliteGraphStore:
+    """Doc/section/entity graph kept in an embedded SQLite file instead of RAM.
+
+    Same node model as ``GraphStore`` (the builder assigns the same ids), with
+    ``nodes``/``edges``/``entity_words`` tables indexed for key lookups, word
+    postings and adjacency scans. ``match_entities`` runs as indexed queries and
+    traversals materialise only the ``max_hops`` neighbourhood of the seeds (a
+    recursive CTE) as a small in-memory ``GraphStore``, so resident memory does
+    not grow with the corpus. Connections are read-only, one per thread.
+
+    An ``owned`` store deletes its file once the last reference to it is gone.
+    """
+
+    def __init__(self, path: str | Path, *, owned: bool = False) -> None:
+        self.path = Path(path)
+        self.owned = owned
+        self._local = threading.local()
+        self._meta: Optional[Dict[str, int]] = None
+        if owned:
+            weakref.finalize(self, _remove_database, str(self.path))
+        else:
+            with _live_lock:
+                _live_stores.add(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+            conn.execute("CREATE TEMP TABLE reached (id INTEGER PRIMARY KEY)")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def meta(self) -> Dict[str, int]:
+        if self._meta is None:
+            self._meta = dict(self._connect().execute("SELECT name, value FROM meta"))
+        return self._meta
+
+    @property
+    def num_nodes(self) -> int:
+        return self.meta["nodes"]
+
+    @property
+    def num_edges(self) -> int:
+        return self.meta["edges"]
+
+    @property
+    def section_count(self) -> int:
+        return self.meta["sections"]
+
+    @property
+    def nbytes(self) -> int:
+        # Out of core: only SQLite's per-connection page cache is resident.
+        return 0
+
+    def node_id(self, key: str) -> Optional[int]:
+        row = self._connect().execute("SELECT id FROM nodes WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def save(self, target: str | Path) -> None:
+        """Copy the database to ``target`` (consistent even while it is being read)."""
+        dest = sqlite3.connect(str(target))
+        try:
+            self._connect().backup(dest)
+        finally:
+            dest.close()
+
+    def match_entities(self, query: str) -> List[str]:
+        """``graph.match_entities`` semantics, answered from the indexed tables."""
+        words = _WORD_PATTERN.findall(query.lower())
+        max_words = self.meta["max_words"]
+        if not words or not max_words:
+            return []
+        names = {
+            " ".join(words[start:end])
+            for start in range(len(words))
+            for end in range(start + 1, min(start + max_words, len(words)) + 1)
+        }
+        terms = sorted({word for word in words if word not in STOPWORDS})
+        conn = self._connect()
+        # Only placeholders are interpolated into the SQL below; every value is bound.
+        by_name = f"key IN ({_placeholders(len(names))})"  # noqa: S608
+        words_in = f"SELECT node FROM entity_words WHERE word IN ({_placeholders(len(terms))})"  # noqa: S608
+        by_word = f"id IN ({words_in})"
+        rows = conn.execute(
+            f"SELECT key FROM nodes WHERE type = ? AND ({by_name} OR {by_word}) ORDER BY id",  # noqa: S608
+            (NODE_ENTITY, *names, *terms),
+        ).fetchall()
+        if rows:
+            return [key for (key,) in rows]
+
+        prefixes = [word for word in terms if len(word) >= _MIN_PREFIX]
+        if not prefixes:
+            return []
+        ranges = " OR ".join("(word >= ? AND word < ?)" for _ in prefixes)
+        bounds = [bound for word in prefixes for bound in (word, word + "\U0010ffff")]
+        query = (
+            f"SELECT key FROM nodes WHERE id IN (SELECT node FROM entity_words WHERE {ranges})"  # noqa: S608
+            " ORDER BY frequency DESC, id LIMIT 5"
+        )
+        rows = conn.execute(query, bounds).fetchall()
+        return [key for (key,) in rows]
+
+    def _start_ids(self, conn: sqlite3.Connection, seeds: Sequence[str]) -> List[int]:
+        ids: List[int] = []
+        if seeds:
+            marks = _placeholders(len(seeds))
+            query = f"SELECT id FROM nodes WHERE type = ? AND key IN ({marks})"  # noqa: S608
+            rows = conn.execute(query, (NODE_ENTITY, *seeds))
+            ids = [node for (node,) in rows]
+        if not ids:
+            rows = conn.execute(
+                "SELECT id FROM nodes WHERE type = ? ORDER BY id LIMIT 2", (NODE_DOC,)
+            )
+            ids = [node for (node,) in rows]
+        return ids
+
+    def subgraph(self, seeds: Sequence[str], max_hops: int) -> GraphStore:
+        """In-memory ``GraphStore`` of everything within ``max_hops`` of the seeds.
+
+        Start nodes are chosen as in ``graph._start_nodes`` and node order is
+        preserved, so BFS over the subgraph visits the same sections in the same
+        order as over the full graph. Documents of reached sections are included
+        so their paths can be described.
+        """
+        conn = self._connect()
+        start = self._start_ids(conn, seeds)
+        conn.execute("DELETE FROM temp.reached")
+        if start:
+            conn.execute(
+                _REACH_SQL.format(marks=_placeholders(len(start))), (*start, max(1, max_hops))
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO temp.reached (id) "
+                "SELECT n.doc FROM nodes AS n JOIN temp.reached AS r ON r.id = n.id"
+                " WHERE n.type = ?",
+                (NODE_SECTION,),
+            )
+        builder = GraphBuilder()
+        local: Dict[int, int] = {}
+        nodes = conn.execute(
+            "SELECT n.id, n.key, n.type, n.label, n.frequency, n.chunk, n.doc "
+            "FROM nodes AS n JOIN temp.reached AS r ON r.id = n.id ORDER BY n.id"
+        )
+        for node, key, node_type, label, frequency, chunk, doc in nodes:
+            local[node] = builder.add_node(
+                key,
+                node_type,
+                label=label,
+                chunk_index=chunk,
+                doc=local.get(doc, -1),
+                frequency=frequency,
+            )
+        edges = conn.execute(
+            "SELECT e.src, e.dst, e.kind FROM temp.reached AS a JOIN edges AS e ON e.src = a.id "
+            "JOIN temp.reached AS b ON b.id = e.dst WHERE e.src < e.dst"
+        )
+        for src, dst, kind in edges:
+            builder.add_edge(local[src], local[dst], kind)
+        return builder.build(index_entities=False)
+
+
+class SqliteGraphBuilder:
+    """``GraphBuilder`` counterpart that streams nodes and edges into a SQLite file.
+
+    Only the key -> id map and per-node frequencies stay in memory while
+    building; ``build`` adds the indexes and returns a ``SqliteGraphStore``.
+    """
+
+    def __init__(self, path: str | Path, *, owned: bool = False) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        _remove_database(str(self.path))
+        self._owned = owned
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.executescript(_SCHEMA)
+        self._ids: Dict[str, int] = {}
+        self._types = array("b")
+        self._frequency = array("i")
+        self._nodes: List[Tuple[int, str, int, Optional[str], int, int, int]] = []
+        self._words: List[Tuple[str, int]] = []
+        self._edges: List[Tuple[int, int, int]] = []
+        self._max_words = 0
+
+    def add_node(
+        self,
+        key: str,
+        node_type: int,
+        *,
+        label: Optional[str] = None,
+        chunk_index: int = -1,
+        doc: int = -1,
+        frequency: int = 0,
+    ) -> int:
+        """Intern ``key``; an existing node keeps its type and attributes."""
+        idx = self._ids.get(key)
+        if idx is None:
+            idx = self._ids[key] = len(self._types)
+            self._types.append(node_type)
+            self._frequency.append(frequency)
+            self._nodes.append((idx, key, node_type, label, frequency, chunk_index, doc))
+            if node_type == NODE_ENTITY:
+                words = key.split(" ")
+                self._max_words = max(self._max_words, len(words))
+                self._words.extend((word, idx) for word in dict.fromkeys(words))
+            self._maybe_flush()
+        return idx
+
+    def mention(self, node: int) -> None:
+        self._frequency[node] += 1
+
+    def add_edge(self, source: int, target: int, kind: int) -> None:
+        self._edges.append((source, target, kind))
+        self._edges.append((target, source, kind))
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self._nodes) + len(self._edges) >= _FLUSH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._conn.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?)", self._nodes)
+        self._conn.executemany("INSERT OR IGNORE INTO entity_words VALUES (?, ?)", self._words)
+        self._conn.executemany("INSERT OR IGNORE INTO edges VALUES (?, ?, ?)", self._edges)
+        self._nodes, self._words, self._edges = [], [], []
+
+    def build(self) -> SqliteGraphStore:
+        try:
+            self._flush()
+            self._conn.executemany(
+                "UPDATE nodes SET frequency = ? WHERE id = ?",
+                ((count, node) for node, count in enumerate(self._frequency) if count),
+            )
+            self._conn.executescript(_INDEXES)
+            (edges,) = self._conn.execute("SELECT COUNT(*) FROM edges").fetchone()
+            meta = {
+                "nodes": len(self._types),
+                "edges": edges // 2,
+                "sections": self._types.tolist().count(NODE_SECTION),
+                "max_words": self._max_words,
+            }
+            self._conn.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+            self._conn.commit()
+        except BaseException:
+            self._conn.close()
+            _remove_database(str(self.path))
+            raise
+        self._conn.close()
+        return SqliteGraphStore(self.path, owned=self._owned)
@@ -3,6 +3,8 @@ from __future__ import annotations
 import faiss
 import numpy as np
 
+from .global_index import add_session_vectors, global_index_enabled
+
 
 def build_faiss_index(embeddings: np.ndarray, metric: str = "cosine"):
     xb = embeddings.astype(np.float32)
@@ -18,6 +20,16 @@ def build_faiss_index(embeddings: np.ndarray, metric: str = "cosine"):
     return index
 
 
+def build_session_vector_index(embeddings: np.ndarray, owner: str):
+    """Per-session flat index, or a view onto the shared global index when enabled.
+
+    ``embeddings`` must already be L2-normalized.
+    """
+    if global_index_enabled():
+        return add_session_vectors(owner, embeddings)
+    return build_faiss_index(embeddings, metric="cosine")
+
+
 def search_index(index, query_vec: np.ndarray, k: int = 4, metric: str = "cosine"):
     q = query_vec.astype(np.float32)
     if metric == "cosine":
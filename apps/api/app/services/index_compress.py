@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+import uuid
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib keeps the idle tier working without it
+    zstandard = None
+
+if TYPE_CHECKING:
+    from .session import SessionIndex
+
+EMBEDDING_MODES = ("float16", "int8", "disk", "keep")
+_ZSTD_LEVEL = 3
+_ZLIB_LEVEL = 6
+
+
+def _pack(payload: Any) -> Tuple[str, bytes]:
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, _ZLIB_LEVEL)
+
+
+def _unpack(codec: str, blob: bytes) -> Any:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this compressed index")
+        data = zstandard.ZstdDecompressor().decompress(blob)
+    else:
+        data = zlib.decompress(blob)
+    return json.loads(data.decode("utf-8"))
+
+
+@dataclass
+class CompressedIndex:
+    """A ``SessionIndex`` with its texts, postings and vectors packed for an idle session.
+
+    ``base`` keeps the fields that stay as-is (graph, aliases, ids, and the vector
+    index when it is not a plain flat index that can be rebuilt from the embeddings).
+    """
+
+    base: "SessionIndex"
+    chunk_meta: List[Tuple[Any, int, int]]
+    codec: str
+    texts_blob: bytes
+    has_texts: bool
+    tokens_blob: Optional[bytes]
+    has_bm25: bool
+    embeddings_mode: str
+    embeddings: Optional[np.ndarray] = None
+    scales: Optional[np.ndarray] = None
+    embeddings_path: Optional[Path] = None
+    faiss_metric: Optional[int] = None
+
+    @property
+    def nbytes(self) -> int:
+        total = len(self.texts_blob) + len(self.tokens_blob or b"")
+        for array in (self.embeddings, self.scales):
+            if array is not None and not isinstance(array, np.memmap):
+                total += int(array.nbytes)
+        return total + 64 * len(self.chunk_meta)
+
+    def discard(self) -> None:
+        """Remove the on-disk embeddings of a compressed index that will not be hydrated."""
+        if self.embeddings_path is not None:
+            self.embeddings_path.unlink(missing_ok=True)
+
+
+def _quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    scales = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales).astype(np.int8), scales.astype(np.float32)
+
+
+def compress_index(
+    index: "SessionIndex", *, embeddings_mode: str, disk_dir: Path
+) -> CompressedIndex:
+    """Pack ``index`` for the idle tier; ``hydrate_index`` restores an equivalent index.
+
+    Texts and BM25 tokens are zstd-compressed (zlib without ``zstandard``). The
+    embeddings are cast to float16, quantized to int8 with per-row scales, or
+    written to ``disk_dir``; a flat FAISS index is dropped and rebuilt on hydration
+    since it holds a second copy of the vectors. Memory-mapped embeddings are
+    already off-heap and left alone.
+    """
+    texts = index.texts if index.texts is not None else [entry[3] for entry in index.chunk_map]
+    codec, texts_blob = _pack(texts)
+    tokens_blob = _pack(index.bm25_tokens)[1] if index.bm25_tokens else None
+    embeddings = index.embeddings
+    faiss_index = index.faiss_index
+    mode = (
+        embeddings_mode
+        if embeddings is not None and not isinstance(embeddings, np.memmap)
+        else "keep"
+    )
+    compressed = CompressedIndex(
+        base=index,
+        chunk_meta=[(entry[0], entry[1], entry[2]) for entry in index.chunk_map],
+        codec=codec,
+        texts_blob=texts_blob,
+        has_texts=index.texts is not None,
+        tokens_blob=tokens_blob,
+        has_bm25=index.bm25 is not None,
+        embeddings_mode=mode,
+    )
+    rebuild_flat = (
+        mode != "keep"
+        and isinstance(faiss_index, faiss.IndexFlat)
+        and int(faiss_index.ntotal) == len(embeddings)
+    )
+    if not rebuild_flat:
+        # Global views and non-flat indexes keep their own copy of (or a reference to)
+        # the vectors, so shrinking ours would reclaim little.
+        compressed.embeddings_mode = "keep"
+        compressed.embeddings = embeddings
+    elif mode == "float16":
+        compressed.embeddings = embeddings.astype(np.float16)
+    elif mode == "int8":
+        compressed.embeddings, compressed.scales = _quantize_int8(
+            np.asarray(embeddings, dtype=np.float32)
+        )
+    else:
+        disk_dir.mkdir(parents=True, exist_ok=True)
+        path = disk_dir / f"{uuid.uuid4().hex}.npy"
+        np.save(path, np.asarray(embeddings, dtype=np.float32))
+        compressed.embeddings_path = path
+    if rebuild_flat:
+        compressed.faiss_metric = int(faiss_index.metric_type)
+    compressed.base = dataclasses.replace(
+        index,
+        faiss_index=None if compressed.faiss_metric is not None else faiss_index,
+        chunk_map=[],
+        embeddings=None,
+        texts=None,
+        bm25=None,
+        bm25_tokens=None,
+    )
+    return compressed
+
+
+def hydrate_index(compressed: CompressedIndex, *, keep_files: bool = False) -> "SessionIndex":
+    """Rebuild the ``SessionIndex``; on-disk embeddings are removed unless ``keep_files``."""
+    texts = _unpack(compressed.codec, compressed.texts_blob)
+    chunk_map = [
+        (doc_id, start, end, text)
+        for (doc_id, start, end), text in zip(compressed.chunk_meta, texts, strict=True)
+    ]
+    tokens = _unpack(compressed.codec, compressed.tokens_blob) if compressed.tokens_blob else None
+    mode = compressed.embeddings_mode
+    embeddings = compressed.embeddings
+    if mode == "float16":
+        embeddings = embeddings.astype(np.float32)
+    elif mode == "int8":
+        embeddings = embeddings.astype(np.float32) * compressed.scales
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-8
+    elif mode == "disk":
+        embeddings = np.load(compressed.embeddings_path)
+        if not keep_files:
+            compressed.discard()
+    faiss_index = compressed.base.faiss_index
+    if compressed.faiss_metric is not None:
+        faiss_index = faiss.IndexFlat(int(embeddings.shape[1]), compressed.faiss_metric)
+        faiss_index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+    return dataclasses.replace(
+        compressed.base,
+        faiss_index=faiss_index,
+        chunk_map=chunk_map,
+        embeddings=embeddings,
+        texts=texts if compressed.has_texts else None,
+        bm25=BM25Okapi(tokens) if tokens and compressed.has_bm25 else None,
+        bm25_tokens=tokens,
+    )
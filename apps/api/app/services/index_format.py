@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+import faiss
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from .global_index import GlobalIndexView, global_index_enabled, readd_session_vectors
+from .graph import EDGE_KINDS, NODE_DOC, NODE_ENTITY, NODE_SECTION, GraphBuilder, GraphStore
+from .graph_sqlite import SqliteGraphStore, open_graph_copy
+
+if TYPE_CHECKING:
+    from .session import SessionIndex
+
+FORMAT_VERSION = 3
+# Version 1 stored the graph as a string table plus an (e, 3) edge list; version 2
+# as JSON node keys plus a CSR .npz.
+READABLE_FORMAT_VERSIONS = (1, 2, 3)
+
+MANIFEST_FILE = "manifest.json"
+_FAISS_FILE = "faiss.index"
+_EMBEDDINGS_FILE = "embeddings.npy"
+_CHUNKS_FILE = "chunks.json"
+_POSTINGS_FILE = "postings.json"
+_GRAPH_FILE = "graph.npz"
+_GRAPH_SQLITE_FILE = "graph.sqlite3"
+
+
+class IndexFormatError(ValueError):
+    """Raised when a saved index is missing, incomplete or from an unknown format version."""
+
+
+def _write_json(path: Path, payload: Any) -> None:
+    path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+
+def _read_json(path: Path) -> Any:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+_GRAPH_ARRAYS = (
+    "node_type",
+    "frequency",
+    "section_chunk",
+    "section_doc",
+    "indptr",
+    "indices",
+    "edge_kind",
+)
+
+
+def _string_table(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 bytes of ``strings`` back to back plus their (n + 1) byte offsets."""
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _read_string_table(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    blob = data.tobytes()
+    bounds = offsets.tolist()
+    return [
+        blob[start:end].decode("utf-8") for start, end in zip(bounds[:-1], bounds[1:], strict=True)
+    ]
+
+
+def save_graph_file(graph: GraphStore, path: str | Path) -> None:
+    """Write ``graph`` as one uncompressed .npz: CSR arrays plus key and label string tables."""
+    key_data, key_offsets = _string_table(graph.keys)
+    label_data, label_offsets = _string_table([label or "" for label in graph.labels])
+    with open(path, "wb") as handle:
+        np.savez(
+            handle,
+            key_data=key_data,
+            key_offsets=key_offsets,
+            label_data=label_data,
+            label_offsets=label_offsets,
+            has_label=np.array([label is not None for label in graph.labels], dtype=bool),
+            **{name: getattr(graph, name) for name in _GRAPH_ARRAYS},
+        )
+
+
+def load_graph_file(path: str | Path) -> GraphStore:
+    with np.load(path) as arrays:
+        labels = _read_string_table(arrays["label_data"], arrays["label_offsets"])
+        return GraphStore(
+            keys=_read_string_table(arrays["key_data"], arrays["key_offsets"]),
+            labels=[
+                label if present else None
+                for label, present in zip(labels, arrays["has_label"].tolist(), strict=True)
+            ],
+            **{name: arrays[name] for name in _GRAPH_ARRAYS},
+        )
+
+
+def _save_graph(
+    graph: GraphStore | SqliteGraphStore, directory: Path, portable: bool
+) -> Dict[str, str]:
+    if isinstance(graph, SqliteGraphStore):
+        if not graph.owned and not portable:
+            # A persistent graph database outlives the saves that point at it.
+            return {"graph_sqlite_ref": str(graph.path.resolve())}
+        graph.save(directory / _GRAPH_SQLITE_FILE)
+        return {"graph_sqlite": _GRAPH_SQLITE_FILE}
+    save_graph_file(graph, directory / _GRAPH_FILE)
+    return {"graph": _GRAPH_FILE}
+
+
+def _load_graph(root: Path, files: Dict[str, str]) -> GraphStore | SqliteGraphStore | None:
+    if "graph" in files:
+        return load_graph_file(root / files["graph"])
+    if "graph_sqlite" in files:
+        # Spill and snapshot directories are removed once loaded: read from a private copy.
+        return open_graph_copy(root / files["graph_sqlite"])
+    if "graph_sqlite_ref" in files:
+        path = Path(files["graph_sqlite_ref"])
+        # Gone (evicted, or saved on another machine): the graph is rebuilt on first use.
+        return SqliteGraphStore(path) if path.is_file() else None
+    if "graph_nodes" not in files:
+        return None
+    nodes = _read_json(root / files["graph_nodes"])
+    if "graph_arrays" not in files:
+        return _graph_from_v1(nodes, np.load(root / files["graph_edges"]))
+    with np.load(root / files["graph_arrays"]) as arrays:
+        return GraphStore(
+            keys=nodes["keys"],
+            labels=nodes["labels"],
+            **{name: arrays[name] for name in _GRAPH_ARRAYS},
+        )
+
+
+def _graph_from_v1(payload: Dict[str, Any], rows: np.ndarray) -> GraphStore:
+    """Rebuild a graph saved by format version 1 (string table plus an edge list)."""
+    builder = GraphBuilder()
+    for doc_id, title in payload["docs"]:
+        builder.add_node(doc_id, NODE_DOC, label=title)
+    for section_id, doc_id, chunk_index in payload["sections"]:
+        doc = builder.add_node(doc_id, NODE_DOC)
+        builder.add_node(section_id, NODE_SECTION, chunk_index=int(chunk_index), doc=doc)
+    for entity_id, name, frequency in payload["entities"]:
+        builder.add_node(entity_id, NODE_ENTITY, label=name, frequency=int(frequency))
+    nodes = [builder.add_node(name, NODE_ENTITY) for name in payload["nodes"]]
+    kinds = [EDGE_KINDS.index(kind) for kind in payload["kinds"]]
+    for source, target, kind in rows.tolist():
+        builder.add_edge(nodes[source], nodes[target], kinds[kind])
+    return builder.build()
+
+
+def save_session_index(
+    index: "SessionIndex", directory: str | Path, *, portable: bool = False
+) -> Path:
+    """Write ``index`` to ``directory`` atomically, replacing any previous save.
+
+    A SQLite graph kept in its persistent directory is recorded by path rather
+    than copied, unless ``portable`` (the save may be restored on another machine).
+
+    Layout::
+
+        manifest.json     format version, embed model, shapes and file names (written last)
+        faiss.index       faiss.write_index output (a flat copy for global index views)
+        embeddings.npy    float32 (n, d) matrix, loaded with mmap_mode="r"
+        chunks.json       chunk map and duplicate aliases
+        postings.json     BM25 token lists (the BM25 object is rebuilt on load)
+        graph.npz         graph CSR arrays plus key/label string tables (optional)
+        graph.sqlite3     the graph database instead, for the sqlite graph backend (optional;
+                          persistent databases are referenced by path in the manifest)
+    """
+    target = Path(directory)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = target.parent / f".{target.name}.{uuid.uuid4().hex}.tmp"
+    staging.mkdir()
+    try:
+        # Views onto the global index are saved as standalone flat indexes.
+        to_faiss = getattr(index.faiss_index, "to_faiss", None)
+        faiss.write_index(to_faiss() if to_faiss else index.faiss_index, str(staging / _FAISS_FILE))
+        files = {"faiss": _FAISS_FILE, "chunks": _CHUNKS_FILE}
+        dim = int(index.faiss_index.d)
+        if index.embeddings is not None:
+            np.save(
+                staging / _EMBEDDINGS_FILE, np.ascontiguousarray(index.embeddings, dtype=np.float32)
+            )
+            files["embeddings"] = _EMBEDDINGS_FILE
+        _write_json(
+            staging / _CHUNKS_FILE,
+            {
+                "chunk_map": index.chunk_map,
+                "chunk_aliases": {str(k): v for k, v in (index.chunk_aliases or {}).items()},
+                "has_texts": index.texts is not None,
+            },
+        )
+        if index.bm25_tokens is not None:
+            _write_json(staging / _POSTINGS_FILE, index.bm25_tokens)
+            files["postings"] = _POSTINGS_FILE
+        if index.graph is not None:
+            files.update(_save_graph(index.graph, staging, portable))
+        _write_json(
+            staging / MANIFEST_FILE,
+            {
+                "format_version": FORMAT_VERSION,
+                "created": time.time(),
+                "embed_model": index.embed_model,
+                "index_id": index.index_id,
+                "chunks": len(index.chunk_map),
+                "dim": dim,
+                "vector_store": "global"
+                if isinstance(index.faiss_index, GlobalIndexView)
+                else "session",
+                "files": files,
+            },
+        )
+        if target.exists():
+            retired = target.parent / f".{target.name}.{uuid.uuid4().hex}.old"
+            os.replace(target, retired)
+            os.replace(staging, target)
+            shutil.rmtree(retired, ignore_errors=True)
+        else:
+            os.replace(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+
+def read_manifest(directory: str | Path) -> Dict[str, Any]:
+    path = Path(directory) / MANIFEST_FILE
+    if not path.is_file():
+        raise IndexFormatError(f"No saved index at {directory}")
+    manifest = _read_json(path)
+    version = manifest.get("format_version")
+    if version not in READABLE_FORMAT_VERSIONS:
+        raise IndexFormatError(
+            f"Unsupported index format version {version!r} (expected {FORMAT_VERSION})"
+        )
+    return manifest
+
+
+def _read_faiss(path: Path, mmap: bool) -> Any:
+    if mmap:
+        try:
+            return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            # Not every index type supports mmap; fall back to a regular read.
+            pass
+    return faiss.read_index(str(path))
+
+
+def load_session_index(directory: str | Path, *, mmap: bool = True) -> "SessionIndex":
+    """Load a saved index; with ``mmap`` the vectors are mapped read-only instead of copied."""
+    from .session import SessionIndex
+
+    root = Path(directory)
+    manifest = read_manifest(root)
+    files = manifest["files"]
+    chunks = _read_json(root / files["chunks"])
+    chunk_map = [tuple(entry) for entry in chunks["chunk_map"]]
+    embeddings = None
+    if "embeddings" in files:
+        embeddings = np.load(root / files["embeddings"], mmap_mode="r" if mmap else None)
+    tokens = _read_json(root / files["postings"]) if "postings" in files else None
+    graph = _load_graph(root, files)
+    aliases = {
+        int(k): [tuple(alias) for alias in v]
+        for k, v in (chunks.get("chunk_aliases") or {}).items()
+    }
+    if (
+        manifest.get("vector_store") == "global"
+        and embeddings is not None
+        and global_index_enabled()
+    ):
+        # Saved from a global index view (spilled, persisted or snapshotted): rejoin it.
+        faiss_index = readd_session_vectors(manifest.get("index_id") or root.name, embeddings)
+    else:
+        faiss_index = _read_faiss(root / files["faiss"], mmap)
+    return SessionIndex(
+        faiss_index=faiss_index,
+        chunk_map=chunk_map,
+        embeddings=embeddings,
+        texts=[entry[3] for entry in chunk_map] if chunks.get("has_texts") else None,
+        bm25=BM25Okapi(tokens) if tokens else None,
+        bm25_tokens=tokens,
+        embed_model=manifest.get("embed_model"),
+        graph=graph,
+        chunk_aliases=aliases or None,
+        index_id=manifest.get("index_id"),
+    )
@@ -0,0 +1,563 @@
+from __future__ import annotations
+
+import dataclasses
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import numpy as np
+
+from ..config import settings
+from .concurrency import RWLock, StripedLocks
+from .index_compress import CompressedIndex, compress_index, hydrate_index
+from .index_format import load_session_index, save_session_index
+
+if TYPE_CHECKING:
+    from .session import SessionIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _spill_root() -> Path:
+    if settings.SESSION_INDEX_SPILL_DIR:
+        return Path(settings.SESSION_INDEX_SPILL_DIR)
+    return Path(tempfile.gettempdir()) / "rag-index-spill"
+
+
+def _budget_bytes() -> int:
+    return max(0, int(settings.SESSION_INDEX_MEMORY_BUDGET_MB)) * 1024 * 1024
+
+
+def _array_bytes(value: Any) -> int:
+    # Memory-mapped arrays live in the page cache and can be dropped by the kernel.
+    if value is None or isinstance(value, np.memmap):
+        return 0
+    return int(getattr(value, "nbytes", 0))
+
+
+def estimate_index_bytes(index: "SessionIndex") -> int:
+    """Approximate resident size of a session index (vectors, texts, postings, graph)."""
+    total = _array_bytes(index.embeddings) + _vector_index_bytes(index.faiss_index)
+    texts = index.texts or [entry[3] for entry in index.chunk_map]
+    total += sum(sys.getsizeof(text) for text in texts)
+    if index.bm25_tokens:
+        # Tokens are stored twice: the raw lists and rank_bm25's per-doc frequency dicts.
+        total += 2 * sum(sum(sys.getsizeof(tok) for tok in doc) + 64 for doc in index.bm25_tokens)
+    return total + _graph_bytes(index.graph)
+
+
+def _vector_index_bytes(faiss_index: Any) -> int:
+    # Global index views report the share of the global index they keep alive.
+    if faiss_index is None:
+        return 0
+    return getattr(faiss_index, "resident_bytes", int(faiss_index.ntotal) * int(faiss_index.d) * 4)
+
+
+def _graph_bytes(graph: Any) -> int:
+    return graph.nbytes if graph is not None else 0
+
+
+def clone_index(index: "SessionIndex") -> "SessionIndex":
+    """Shallow copy for copy-on-write: arrays and postings stay shared and read-only.
+
+    Mutators must replace fields (``index.graph = ...``) rather than modify them in place.
+    """
+    return dataclasses.replace(index)
+
+
+def private_key(sid: str) -> str:
+    return f"session-{sid}"
+
+
+class SessionIndexStore:
+    """Session indexes under a global memory budget, shared copy-on-write.
+
+    Entries are keyed: a session either owns a private entry or holds a reference
+    to a shared one (identical corpora built with identical parameters), so N
+    sessions over the same documents cost one index. Entries are kept in LRU
+    order; when the resident total exceeds ``SESSION_INDEX_MEMORY_BUDGET_MB`` the
+    least recently used ones are written to ``SESSION_INDEX_SPILL_DIR`` and
+    dropped from RAM. ``get`` reloads a spilled entry transparently,
+    memory-mapping the embedding matrix. Entries with a persisted copy (see
+    ``attach``) are simply dropped and reloaded from it.
+
+    Independently of the budget, ``compress_idle`` moves entries nobody has read
+    for a while into a compressed tier (see ``index_compress``); ``get`` hydrates
+    them back on the next query. Compressed entries still count toward the budget
+    and are spilled like resident ones when they are the least recently used.
+
+    Lookups of resident entries only take the read side of a readers-writer lock,
+    so concurrent queries never serialize on each other; binding, swapping and
+    releasing entries take the write side. Reloads run outside the lock, one at a
+    time per key, and are installed only if the entry was not swapped meanwhile.
+    Spills likewise pick their victims under the lock but write them to disk
+    after releasing it (``_flush_spills``).
+    """
+
+    def __init__(self) -> None:
+        self._lock = RWLock()
+        self._loading = StripedLocks()
+        self._resident: Dict[str, tuple["SessionIndex", int]] = {}
+        self._compressed: Dict[str, tuple[CompressedIndex, int]] = {}
+        # Monotonic last-read times: LRU order and idle detection without reordering
+        # a shared structure under the read lock.
+        self._last_used: Dict[str, float] = {}
+        self._spilled: Dict[str, Path] = {}
+        # Durable saves owned by the session persistence layer; never deleted here.
+        self._backing: Dict[str, Path] = {}
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[str, str] = {}  # sid -> entry key
+        self._refs: Dict[str, int] = {}  # entry key -> number of sessions bound to it
+        # index_id of what is held for each session, so shared backends can detect rebuilds.
+        self._versions: Dict[str, Optional[str]] = {}
+        self._resident_bytes = 0
+        # Victims chosen by ``_enforce_budget`` that still have to be written out.
+        self._to_spill: Dict[str, tuple[Any, int]] = {}
+        self._to_spill_bytes = 0
+        self.spills = 0
+        self.reloads = 0
+        self.compressions = 0
+        self.hydrations = 0
+        self.bytes_reclaimed = 0
+        self.hydration_ms_total = 0.0
+        self.last_hydration_ms: Optional[float] = None
+
+    def put(
+        self,
+        sid: str,
+        index: "SessionIndex",
+        *,
+        key: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Bind ``sid`` to ``index``; a non-private ``key`` lets later sessions ``share`` it."""
+        with self._lock.write():
+            self._put(sid, index, key or private_key(sid), meta)
+        self._flush_spills()
+
+    def _put(
+        self, sid: str, index: "SessionIndex", key: str, meta: Optional[Dict[str, Any]]
+    ) -> None:
+        self._release(sid)
+        if self._has_entry(key):
+            if self._refs.get(key):
+                # Someone else still reads the old entry; keep theirs and register ours privately.
+                key = private_key(sid)
+                self._drop_entry(key)
+            else:
+                self._drop_entry(key)
+        self._admit(key, index)
+        if meta is not None:
+            self._meta[key] = meta
+        self._bind(sid, key, index.index_id)
+
+    def share(self, sid: str, key: str) -> Optional[Dict[str, Any]]:
+        """Bind ``sid`` to an existing entry; returns its metadata.
+
+        Returns ``None`` (binding nothing) if the entry is unknown or was attached
+        without its build metadata; callers then fall back to the persisted copy.
+        """
+        with self._lock.write():
+            meta = self._meta.get(key)
+            if not self._has_entry(key) or not meta:
+                return None
+            if self._keys.get(sid) != key:
+                self._release(sid)
+                self._bind(sid, key, meta.get("index_id"))
+            return meta
+
+    def attach(
+        self,
+        sid: str,
+        directory: Path,
+        index: Optional["SessionIndex"] = None,
+        *,
+        version: Optional[str] = None,
+        key: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Record a persisted copy backing ``sid``'s entry; without ``index`` it loads on ``get``.
+
+        ``meta`` is the build metadata of a shared entry, which ``share`` returns
+        to later sessions attaching to the same key.
+        """
+        with self._lock.write():
+            key = key or self._keys.get(sid) or private_key(sid)
+            stale = self._keys.get(sid) != key or self._versions.get(sid) != version
+            if self._keys.get(sid) != key:
+                self._release(sid)
+                self._bind(sid, key, version)
+            if index is None:
+                if stale or not self._has_entry(key):
+                    self._drop_entry(key, keep_meta=True)
+                    self._spilled[key] = directory
+            elif key not in self._resident:
+                self._drop_entry(key, keep_meta=True)
+                self._admit(key, index)
+            self._backing[key] = directory
+            self._versions[sid] = version
+            if meta is not None:
+                self._meta[key] = meta
+        self._flush_spills()
+
+    def version(self, sid: str) -> Optional[str]:
+        with self._lock.read():
+            return self._versions.get(sid)
+
+    def key(self, sid: str) -> Optional[str]:
+        with self._lock.read():
+            return self._keys.get(sid)
+
+    def meta(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock.read():
+            return self._meta.get(key)
+
+    def ref_count(self, key: str) -> int:
+        with self._lock.read():
+            return self._refs.get(key, 0)
+
+    def ids(self) -> list[str]:
+        with self._lock.read():
+            return list(self._keys)
+
+    def get(self, sid: str) -> Optional["SessionIndex"]:
+        with self._lock.read():
+            key = self._keys.get(sid)
+        return self._get_key(key) if key is not None else None
+
+    def make_private(self, sid: str) -> Optional["SessionIndex"]:
+        """Return an index ``sid`` may mutate, cloning a shared entry first (copy-on-write)."""
+        index = self.get(sid)
+        if index is None:
+            return None
+        with self._lock.write():
+            key = self._keys.get(sid)
+            if key is None:
+                return None
+            # The entry may have been swapped since ``get``; clone what is current.
+            entry = self._resident.get(key)
+            index = entry[0] if entry is not None else index
+            if key == private_key(sid):
+                return index
+            clone = clone_index(index)
+            self._put(sid, clone, private_key(sid), None)
+        self._flush_spills()
+        return clone
+
+    def set_graph(self, sid: str, index_id: Optional[str], graph: Any) -> bool:
+        """Install a graph built after the fact on ``sid``'s entry (shared by all its readers).
+
+        The entry is replaced, not mutated, so readers holding the previous object
+        are unaffected. Returns ``False`` if the entry is no longer the ``index_id``
+        build or is not in memory (spilled entries pick the graph up on the next build).
+        """
+        installed = self._set_graph(sid, index_id, graph)
+        self._flush_spills()
+        return installed
+
+    def _set_graph(self, sid: str, index_id: Optional[str], graph: Any) -> bool:
+        with self._lock.write():
+            key = self._keys.get(sid)
+            if key is None:
+                return False
+            entry = self._resident.get(key)
+            if entry is not None:
+                index, size = entry
+                if index.index_id != index_id:
+                    return False
+                updated = dataclasses.replace(index, graph=graph)
+                new_size = estimate_index_bytes(updated)
+                self._unplan_spill(key)
+                self._resident[key] = (updated, new_size)
+                self._resident_bytes += new_size - size
+                self._enforce_budget(keep=key)
+                return True
+            packed = self._compressed.get(key)
+            if packed is not None and packed[0].base.index_id == index_id:
+                compressed, size = packed
+                self._unplan_spill(key)  # a save in flight would miss the graph
+                compressed.base = dataclasses.replace(compressed.base, graph=graph)
+                added = _graph_bytes(graph)
+                self._compressed[key] = (compressed, size + added)
+                self._resident_bytes += added
+                return True
+            return False
+
+    def pop(self, sid: str) -> None:
+        with self._lock.write():
+            self._release(sid)
+
+    def __contains__(self, sid: object) -> bool:
+        with self._lock.read():
+            return sid in self._keys
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock.read():
+            return {
+                "sessions": len(self._keys),
+                "resident": len(self._resident),
+                "compressed": len(self._compressed),
+                "spilled": len(self._spilled),
+                "shared": sum(1 for refs in self._refs.values() if refs > 1),
+                "resident_bytes": self._resident_bytes,
+                "budget_bytes": _budget_bytes(),
+                "spills": self.spills,
+                "reloads": self.reloads,
+                "compressions": self.compressions,
+                "hydrations": self.hydrations,
+                "bytes_reclaimed": self.bytes_reclaimed,
+                "last_hydration_ms": self.last_hydration_ms,
+                "avg_hydration_ms": (
+                    round(self.hydration_ms_total / self.hydrations, 3) if self.hydrations else None
+                ),
+            }
+
+    def compress_idle(self, idle_seconds: float, *, embeddings_mode: str = "float16") -> int:
+        """Compress resident entries not read for ``idle_seconds``; returns how many were."""
+        cutoff = time.monotonic() - idle_seconds
+        with self._lock.read():
+            idle = [
+                (key, entry[0])
+                for key, entry in self._resident.items()
+                if self._last_used.get(key, 0.0) <= cutoff
+            ]
+        compressed_count = 0
+        for key, index in idle:
+            with self._loading.for_key(key):
+                try:
+                    compressed = compress_index(
+                        index, embeddings_mode=embeddings_mode, disk_dir=_spill_root() / "idle"
+                    )
+                except Exception as exc:
+                    logger.warning("Failed to compress idle index %s: %s", key, exc)
+                    continue
+                with self._lock.write():
+                    entry = self._resident.get(key)
+                    if (
+                        entry is None
+                        or entry[0] is not index
+                        or self._last_used.get(key, 0.0) > cutoff
+                    ):
+                        compressed.discard()  # read, swapped or spilled meanwhile
+                        continue
+                    size = (
+                        compressed.nbytes
+                        + _graph_bytes(index.graph)
+                        + _vector_index_bytes(compressed.base.faiss_index)
+                    )
+                    self._unplan_spill(key)
+                    del self._resident[key]
+                    self._compressed[key] = (compressed, size)
+                    self._resident_bytes += size - entry[1]
+                    self.bytes_reclaimed += max(0, entry[1] - size)
+                    self.compressions += 1
+                    compressed_count += 1
+                logger.info(
+                    "[INDEX_STORE] compressed idle key=%s bytes=%d->%d", key, entry[1], size
+                )
+        return compressed_count
+
+    def _bind(self, sid: str, key: str, version: Optional[str]) -> None:
+        self._keys[sid] = key
+        self._refs[key] = self._refs.get(key, 0) + 1
+        self._versions[sid] = version
+
+    def _release(self, sid: str) -> None:
+        self._versions.pop(sid, None)
+        key = self._keys.pop(sid, None)
+        if key is None:
+            return
+        remaining = self._refs.get(key, 1) - 1
+        if remaining > 0:
+            self._refs[key] = remaining
+            return
+        self._refs.pop(key, None)
+        self._drop_entry(key)
+
+    def _get_key(self, key: str) -> Optional["SessionIndex"]:
+        with self._lock.read():
+            entry = self._resident.get(key)
+            if entry is not None:
+                self._last_used[key] = time.monotonic()
+                return entry[0]
+            packed = self._compressed.get(key)
+            path = self._spilled.get(key)
+        if packed is not None:
+            index = self._hydrate(key, packed[0])
+        elif path is not None:
+            index = self._reload(key, path)
+        else:
+            return None
+        # Admitting the loaded entry may have pushed others over the budget.
+        self._flush_spills()
+        return index
+
+    def _hydrate(self, key: str, compressed: CompressedIndex) -> Optional["SessionIndex"]:
+        with self._loading.for_key(key):
+            with self._lock.read():
+                current = self._compressed.get(key, (None, 0))[0]
+            if current is not compressed:
+                # Hydrated (or swapped) by another reader while we waited.
+                return self._get_key(key)
+            started = time.perf_counter()
+            try:
+                index = hydrate_index(compressed)
+            except Exception as exc:
+                with self._lock.read():
+                    current = self._compressed.get(key, (None, 0))[0]
+                if current is not compressed:
+                    # Spilled while we read it (which removes its files): load the spill.
+                    return self._get_key(key)
+                logger.warning("Failed to hydrate index %s: %s", key, exc)
+                return None
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock.write():
+                current, size = self._compressed.get(key, (None, 0))
+                if current is not compressed:
+                    return index
+                self._unplan_spill(key)  # a queued spill of the compressed form is now stale
+                del self._compressed[key]
+                self._resident_bytes -= size
+                self.hydrations += 1
+                self.hydration_ms_total += elapsed_ms
+                self.last_hydration_ms = round(elapsed_ms, 3)
+                self._admit(key, index)
+            return index
+
+    def _reload(self, key: str, path: Path) -> Optional["SessionIndex"]:
+        # Single-flight per key: concurrent readers of a spilled entry wait for one load.
+        with self._loading.for_key(key):
+            with self._lock.read():
+                entry = self._resident.get(key)
+                if entry is not None:
+                    self._last_used[key] = time.monotonic()
+                    return entry[0]
+                if self._spilled.get(key) != path:
+                    return None
+            try:
+                index = load_session_index(path, mmap=True)
+            except Exception as exc:
+                logger.warning("Failed to reload index %s from %s: %s", key, path, exc)
+                with self._lock.write():
+                    if self._spilled.get(key) == path:
+                        self._drop_entry(key, keep_meta=True)
+                return None
+            with self._lock.write():
+                if self._spilled.get(key) != path:
+                    # Swapped or released while loading: serve this read, install nothing.
+                    return index
+                del self._spilled[key]
+                if self._backing.get(key) != path:
+                    shutil.rmtree(path, ignore_errors=True)
+                self.reloads += 1
+                self._admit(key, index)
+                return index
+
+    def _admit(self, key: str, index: "SessionIndex") -> None:
+        size = estimate_index_bytes(index)
+        self._resident[key] = (index, size)
+        self._last_used[key] = time.monotonic()
+        self._resident_bytes += size
+        self._enforce_budget(keep=key)
+
+    def _has_entry(self, key: str) -> bool:
+        return key in self._resident or key in self._compressed or key in self._spilled
+
+    def _drop_entry(self, key: str, keep_meta: bool = False) -> None:
+        self._unplan_spill(key)
+        entry = self._resident.pop(key, None)
+        self._last_used.pop(key, None)
+        if entry is not None:
+            self._resident_bytes -= entry[1]
+        packed = self._compressed.pop(key, None)
+        if packed is not None:
+            self._resident_bytes -= packed[1]
+            packed[0].discard()
+        backing = self._backing.pop(key, None)
+        path = self._spilled.pop(key, None)
+        if path is not None and path != backing:
+            shutil.rmtree(path, ignore_errors=True)
+        if not keep_meta:
+            self._meta.pop(key, None)
+
+    def _enforce_budget(self, keep: str) -> None:
+        """Choose least recently used victims until the planned total fits the budget.
+
+        Compressed entries count toward the budget and are victims like resident
+        ones. Entries with a persisted copy are dropped at once; the others are
+        queued for ``_flush_spills``, which saves them after the write lock is released.
+        """
+        budget = _budget_bytes()
+        if budget <= 0:
+            return
+        while self._resident_bytes - self._to_spill_bytes > budget:
+            victims = [
+                key
+                for key in (*self._resident, *self._compressed)
+                if key != keep and key not in self._to_spill
+            ]
+            if not victims:
+                break
+            victim = min(victims, key=lambda key: self._last_used.get(key, 0))
+            path = self._backing.get(victim)
+            if path is not None:
+                self._spill(victim, path)
+            else:
+                entry, size = self._resident.get(victim) or self._compressed[victim]
+                self._to_spill[victim] = (entry, size)
+                self._to_spill_bytes += size
+
+    def _unplan_spill(self, key: str) -> None:
+        planned = self._to_spill.pop(key, None)
+        if planned is not None:
+            self._to_spill_bytes -= planned[1]
+
+    def _flush_spills(self) -> None:
+        """Write queued victims to disk; call without holding the write lock."""
+        while True:
+            with self._lock.write():
+                if not self._to_spill:
+                    return
+                key, (entry, _size) = next(iter(self._to_spill.items()))
+            path = _spill_root() / key
+            try:
+                if isinstance(entry, CompressedIndex):
+                    # A reader may hydrate it meanwhile, so leave its files in place.
+                    save_session_index(hydrate_index(entry, keep_files=True), path)
+                else:
+                    save_session_index(entry, path)
+            except Exception as exc:
+                # Keeping the index beats losing it; the budget is a soft limit.
+                logger.warning("Failed to spill index %s: %s", key, exc)
+                with self._lock.write():
+                    if self._to_spill.get(key, (None,))[0] is entry:
+                        self._unplan_spill(key)
+                continue
+            with self._lock.write():
+                current = (self._resident.get(key) or self._compressed.get(key) or (None,))[0]
+                planned = self._to_spill.get(key, (None,))[0]
+                if planned is not entry or current is not entry:
+                    # Dropped, swapped, compressed or hydrated while saving: the copy is stale.
+                    if planned is entry:
+                        self._unplan_spill(key)
+                    if key not in self._spilled:
+                        shutil.rmtree(path, ignore_errors=True)
+                    continue
+                self._unplan_spill(key)
+                self._spill(key, path)
+
+    def _spill(self, key: str, path: Path) -> None:
+        entry = self._resident.pop(key, None)
+        if entry is None:
+            entry = self._compressed.pop(key)
+            entry[0].discard()
+        size = entry[1]
+        self._last_used.pop(key, None)
+        self._resident_bytes -= size
+        self._spilled[key] = path
+        self.spills += 1
+        logger.info("[INDEX_STORE] spilled key=%s bytes=%d", key, size)
@@ -9,7 +9,6 @@ from ..services.cors import cors_config_summary
 from ..services.reranker import effective_strategy
 from ..services.runtime_config import get_runtime_config, get_runtime_config_metadata
 
-
 MetricsMode = Literal["grounded", "blended"]
 MetricsConfidence = Literal["high", "medium", "low"]
 
@@ -28,6 +27,9 @@ _metrics_state = {
     },
     "last_query_ts": None,
     "last_error_ts": None,
+    "sessions_evicted": 0,
+    "last_eviction_ts": None,
+    "snapshots": {"export": None, "import": None},
     "advanced_graph": {
         "total_queries": 0,
         "last_hops_used": 0,
@@ -58,6 +60,9 @@ def reset_metrics() -> None:
         _metrics_state["queries_by_confidence"][level] = 0
     _metrics_state["last_query_ts"] = None
     _metrics_state["last_error_ts"] = None
+    _metrics_state["sessions_evicted"] = 0
+    _metrics_state["last_eviction_ts"] = None
+    _metrics_state["snapshots"] = {"export": None, "import": None}
     _metrics_state["advanced_graph"] = {
         "total_queries": 0,
         "last_hops_used": 0,
@@ -75,6 +80,22 @@ def record_session_created() -> None:
     _metrics_state["total_sessions"] += 1
 
 
+def record_sessions_evicted(count: int) -> None:
+    _metrics_state["sessions_evicted"] += count
+    _metrics_state["last_eviction_ts"] = time.time()
+
+
+def record_snapshot(
+    kind: Literal["export", "import"], *, sessions: int, nbytes: int, ms: float
+) -> None:
+    _metrics_state["snapshots"][kind] = {
+        "sessions": sessions,
+        "bytes": nbytes,
+        "ms": ms,
+        "ts": time.time(),
+    }
+
+
 def record_index_built() -> None:
     _metrics_state["total_indices"] += 1
 
@@ -122,8 +143,25 @@ def get_metrics_summary() -> dict:
     features = runtime_cfg.features
     graph_conf = runtime_cfg.graph_rag
     cors_origins, cors_source = cors_config_summary(settings.ALLOW_ORIGINS)
+    # Local imports: session (and what it pulls in) records into this module.
+    from .admission import get_admission_controller
+    from .global_index import global_index_stats
+    from .graph_build import graph_build_stats
+    from .session import session_count, session_index_stats
+
     summary = {
         "total_sessions": _metrics_state["total_sessions"],
+        "active_sessions": session_count(),
+        "session_indexes": session_index_stats(),
+        "global_index": global_index_stats(),
+        "admission": get_admission_controller().stats(),
+        "graph_builds": graph_build_stats(),
+        "sessions_evicted": _metrics_state["sessions_evicted"],
+        "last_eviction_ts": _timestamp_to_iso(_metrics_state["last_eviction_ts"]),
+        "snapshots": {
+            kind: (dict(stats, ts=_timestamp_to_iso(stats["ts"])) if stats else None)
+            for kind, stats in _metrics_state["snapshots"].items()
+        },
         "total_indices": _metrics_state["total_indices"],
         "total_queries": _metrics_state["total_queries"],
         "queries_by_mode": dict(_metrics_state["queries_by_mode"]),
@@ -7,8 +7,8 @@ import numpy as np
 from ..config import settings
 from ..services.compose import citation_mapping, prepare_sources
 from ..services.embed import embed_texts
-from ..services.retrieve import RetrievalHit, _l2_normalize, hybrid_retrieve
 from ..services.reranker import effective_strategy, rerank_ce, rerank_llm_openai
+from ..services.retrieve import RetrievalHit, _l2_normalize, hybrid_retrieve
 from ..services.session import ensure_session, get_session_index
 
 AnswerMode = Literal["grounded", "blended"]
@@ -45,9 +45,11 @@ def compute_confidence(
     return "low"
 
 
-def _apply_rerank(query: str, hits: list[RetrievalHit], texts: list[str], *, strategy_override: str | None = None) -> Dict[str, Any]:
+def _apply_rerank(
+    query: str, hits: list[RetrievalHit], texts: list[str], *, strategy_override: str | None = None
+) -> Dict[str, Any]:
     configured_strategy = strategy_override or settings.RERANK_STRATEGY
-    rerank_strategy = (strategy_override or effective_strategy())
+    rerank_strategy = strategy_override or effective_strategy()
     rerank_scores: list[float] = []
 
     if rerank_strategy == "none" or not hits:
@@ -139,11 +141,7 @@ def prepare_answer_context(
     attempt = "primary"
     floor = settings.SIMILARITY_FLOOR
 
-    if not hits or (
-        similarity != "l2"
-        and top_similarity is not None
-        and top_similarity < floor
-    ):
+    if not hits or (similarity != "l2" and top_similarity is not None and top_similarity < floor):
         attempt = "fallback"
         hits, retrieval_meta = hybrid_retrieve(
             sidx,
@@ -166,6 +164,7 @@ def prepare_answer_context(
     sources, citation_lookup = prepare_sources(hits, chunk_map, settings.ANSWER_TOP_K)
     citations = citation_mapping(sources)
 
+    chunk_aliases = sidx.chunk_aliases or {}
     retrieved_meta = []
     for rank, hit in enumerate(hits, start=1):
         if hit.idx < 0 or hit.idx >= len(chunk_map):
@@ -185,15 +184,17 @@ def prepare_answer_context(
                 "fused_score": hit.fused_score,
                 "rerank_score": hit.rerank_score,
                 "citation_id": citation_id,
+                "also_in": [
+                    {"doc_id": alias_doc, "start": alias_start, "end": alias_end}
+                    for alias_doc, alias_start, alias_end in chunk_aliases.get(hit.idx, [])
+                ],
             }
         )
         if rank >= settings.MAX_RETRIEVED:
             break
 
     insufficient = not sources or (
-        similarity != "l2"
-        and top_similarity is not None
-        and top_similarity < floor
+        similarity != "l2" and top_similarity is not None and top_similarity < floor
     )
 
     confidence_value: Literal["high", "medium", "low"] | None = None
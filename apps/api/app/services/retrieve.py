@@ -8,7 +8,6 @@ from typing import Any, Dict, Iterable, List, Sequence, Tuple
 import numpy as np
 from rank_bm25 import BM25Okapi
 
-
 TOKEN_PATTERN = re.compile(r"\w+")
 
 
@@ -34,7 +33,9 @@ def build_bm25(doc_texts: Sequence[str]) -> Tuple[BM25Okapi, List[List[str]]]:
     return BM25Okapi(tokenized), tokenized
 
 
-def search_bm25(bm25: BM25Okapi | None, tokenized: Sequence[Sequence[str]] | None, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+def search_bm25(
+    bm25: BM25Okapi | None, tokenized: Sequence[Sequence[str]] | None, query: str, top_k: int
+) -> Tuple[np.ndarray, np.ndarray]:
     if bm25 is None or not tokenized:
         return np.zeros(0, dtype=np.float32), np.asarray([], dtype=int)
     if top_k <= 0:
@@ -47,7 +48,34 @@ def search_bm25(bm25: BM25Okapi | None, tokenized: Sequence[Sequence[str]] | Non
     return scores, order
 
 
-def rrf_fuse(dense_order: Sequence[int], lexical_order: Sequence[int], *, k_rrf: int, top_k: int) -> List[Tuple[int, float]]:
+def score_candidates(
+    session_index,
+    query_vec: np.ndarray,
+    query_text: str,
+    idxs: Sequence[int],
+    *,
+    lexical: bool = True,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Dense and BM25 scores of ``idxs`` only: one gathered mat-vec and one BM25 batch lookup."""
+    ids = np.asarray(idxs, dtype=np.int64)
+    dense = np.zeros(len(ids), dtype=np.float32)
+    lexical_scores = np.zeros(len(ids), dtype=np.float32)
+    if not len(ids):
+        return dense, lexical_scores
+    if session_index.embeddings is not None:
+        rows = np.asarray(session_index.embeddings[ids], dtype=np.float32)
+        dense = rows @ np.asarray(query_vec, dtype=np.float32).reshape(-1)
+    if lexical and session_index.bm25 is not None:
+        lexical_scores = np.asarray(
+            session_index.bm25.get_batch_scores(_tokenize(query_text), ids.tolist()),
+            dtype=np.float32,
+        )
+    return dense, lexical_scores
+
+
+def rrf_fuse(
+    dense_order: Sequence[int], lexical_order: Sequence[int], *, k_rrf: int, top_k: int
+) -> List[Tuple[int, float]]:
     ranks: Dict[int, float] = {}
     for r, idx in enumerate(dense_order):
         if idx < 0:
@@ -61,7 +89,14 @@ def rrf_fuse(dense_order: Sequence[int], lexical_order: Sequence[int], *, k_rrf:
     return fused[:top_k]
 
 
-def mmr_select(query_vec: np.ndarray, embeddings: np.ndarray | None, candidate_idxs: Sequence[int], *, lam: float, k: int) -> List[int]:
+def mmr_select(
+    query_vec: np.ndarray,
+    embeddings: np.ndarray | None,
+    candidate_idxs: Sequence[int],
+    *,
+    lam: float,
+    k: int,
+) -> List[int]:
     if not candidate_idxs:
         return []
     if embeddings is None:
@@ -119,17 +154,33 @@ def hybrid_retrieve(
 ) -> Tuple[List[RetrievalHit], Dict[str, Any]]:
     if dense_k <= 0:
         dense_k = answer_top_k
-    dense_scores, dense_idxs = search_dense(session_index.faiss_index, query_vec.reshape(1, -1), dense_k)
+    dense_scores, dense_idxs = search_dense(
+        session_index.faiss_index, query_vec.reshape(1, -1), dense_k
+    )
     dense_order = [int(idx) for idx in dense_idxs[0] if idx >= 0]
-    dense_map = {idx: float(dense_scores[0][pos]) for pos, idx in enumerate(dense_order) if idx >= 0 and pos < dense_scores.shape[1]}
+    dense_map = {
+        idx: float(dense_scores[0][pos])
+        for pos, idx in enumerate(dense_order)
+        if idx >= 0 and pos < dense_scores.shape[1]
+    }
 
-    lexical_scores = np.zeros(session_index.embeddings.shape[0], dtype=np.float32) if session_index.embeddings is not None else np.zeros(0, dtype=np.float32)
+    lexical_scores = (
+        np.zeros(session_index.embeddings.shape[0], dtype=np.float32)
+        if session_index.embeddings is not None
+        else np.zeros(0, dtype=np.float32)
+    )
     lexical_order: List[int] = []
     lexical_map: Dict[int, float] = {}
     if strategy != "dense":
-        lexical_scores, lex_idxs = search_bm25(session_index.bm25, session_index.bm25_tokens, query_text, lexical_k)
+        lexical_scores, lex_idxs = search_bm25(
+            session_index.bm25, session_index.bm25_tokens, query_text, lexical_k
+        )
         lexical_order = [int(idx) for idx in lex_idxs if idx >= 0]
-        lexical_map = {idx: float(lexical_scores[idx]) for idx in lexical_order if idx < lexical_scores.shape[0]}
+        lexical_map = {
+            idx: float(lexical_scores[idx])
+            for idx in lexical_order
+            if idx < lexical_scores.shape[0]
+        }
 
     fusion_top_k = max(answer_top_k, len(dense_order), len(lexical_order), 1)
     fused = rrf_fuse(dense_order, lexical_order, k_rrf=fusion_rrf_k, top_k=fusion_top_k)
@@ -138,7 +189,9 @@ def hybrid_retrieve(
 
     candidate_order = fused_order or dense_order
     if use_mmr and candidate_order:
-        selected = mmr_select(query_vec, session_index.embeddings, candidate_order, lam=mmr_lambda, k=answer_top_k)
+        selected = mmr_select(
+            query_vec, session_index.embeddings, candidate_order, lam=mmr_lambda, k=answer_top_k
+        )
     else:
         selected = candidate_order[:answer_top_k]
 
@@ -1,16 +1,41 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
 import time
 import uuid
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, TYPE_CHECKING
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
 from ..config import settings
-from .observability import record_session_created
+from .concurrency import StripedLocks
+from .global_index import compact_global_indexes
+from .index_format import MANIFEST_FILE, save_session_index
+from .index_store import SessionIndexStore, private_key
+from .observability import record_session_created, record_sessions_evicted
+from .session_backend import MemorySessionBackend, SessionBackend, SqliteSessionBackend
 
 if TYPE_CHECKING:
     from . import graph as graph_module
+    from . import graph_sqlite
 
-_SESSIONS: Dict[str, Dict[str, Any]] = {}
-_SESSION_INDEXES: Dict[str, "SessionIndex"] = {}
+logger = logging.getLogger(__name__)
+
+_SESSION_INDEXES = SessionIndexStore()
+# Serializes compound per-session operations (index install vs. eviction) across threads.
+_SESSION_LOCKS = StripedLocks(settings.SESSION_LOCK_STRIPES)
+# Guards shared index artifacts; always taken after (never before) a session lock.
+_SHARE_LOCKS = StripedLocks(settings.SESSION_LOCK_STRIPES)
+_reaper_running = False
+# Last ``last_access`` written to each persisted session record (memory backend only).
+_persisted_access: Dict[str, float] = {}
+_persisted_access_lock = threading.Lock()
+# Upper bound on how stale a persisted ``last_access`` may get between touches.
+_ACCESS_PERSIST_SECONDS = 60.0
 
 
 @dataclass
@@ -22,52 +47,424 @@ class SessionIndex:
     bm25: Any = None
     bm25_tokens: list[list[str]] | None = None
     embed_model: str | None = None
-    graph: "graph_module.GraphStore | None" = None
+    graph: "graph_module.GraphStore | graph_sqlite.SqliteGraphStore | None" = None
+    # canonical chunk idx -> (doc_id, start, end) of exact/near duplicates collapsed into it
+    chunk_aliases: dict[int, list[tuple[str, int, int]]] | None = None
+    index_id: str | None = None
+
+
+_backend_lock = threading.Lock()
+_backends: Dict[tuple[str, str], SessionBackend] = {}
+_backend_override: SessionBackend | None = None
+
+
+def _artifact_root() -> Path | None:
+    """Directory for durable index artifacts; always present for shared backends."""
+    if settings.SESSION_PERSIST_DIR:
+        return Path(settings.SESSION_PERSIST_DIR)
+    if settings.SESSION_BACKEND == "sqlite":
+        return Path(tempfile.gettempdir()) / "rag-session-store"
+    return None
+
+
+def set_session_backend(backend: SessionBackend | None) -> None:
+    """Install a custom session backend (``None`` restores the configured one)."""
+    global _backend_override
+    _backend_override = backend
+
+
+def get_session_backend() -> SessionBackend:
+    if _backend_override is not None:
+        return _backend_override
+    kind = settings.SESSION_BACKEND
+    path = ""
+    if kind == "sqlite":
+        root = _artifact_root()
+        path = settings.SESSION_SQLITE_PATH or str(root / "sessions.sqlite3")
+    with _backend_lock:
+        backend = _backends.get((kind, path))
+        if backend is None:
+            if kind == "sqlite":
+                backend = SqliteSessionBackend(path)
+            else:
+                backend = MemorySessionBackend(settings.SESSION_LOCK_STRIPES)
+            _backends[(kind, path)] = backend
+        return backend
+
+
+_SHARED_DIR = "shared"
+
+
+def _index_artifact(sid: str, share_key: str | None) -> str:
+    return f"{_SHARED_DIR}/{share_key}" if share_key else f"{sid}/index"
+
+
+def _key_for_artifact(sid: str, artifact: str | None) -> str:
+    if artifact and artifact.startswith(f"{_SHARED_DIR}/"):
+        return artifact.split("/", 1)[1]
+    return private_key(sid)
+
+
+def _read_build_meta(directory: Path) -> Dict[str, Any] | None:
+    """Build metadata saved next to a shared index artifact, if any."""
+    try:
+        return json.loads((directory / "build.json").read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable build metadata in %s: %s", directory, exc)
+        return None
 
 
-def set_session_index(sid: str, index: SessionIndex) -> None:
-    _SESSION_INDEXES[sid] = index
+def _shared_meta(sid: str, artifact: str | None, directory: Path) -> Dict[str, Any] | None:
+    return (
+        _read_build_meta(directory)
+        if _key_for_artifact(sid, artifact) != private_key(sid)
+        else None
+    )
+
+
+def session_lock(sid: str) -> threading.RLock:
+    """Lock for compound updates of one session (e.g. swap its index and save the record).
+
+    A thread lock: take it only on worker threads (``run_in_threadpool`` /
+    ``asyncio.to_thread``), never directly in a coroutine, where it neither
+    excludes other coroutines nor lets the event loop run while it waits.
+    """
+    return _SESSION_LOCKS.for_key(sid)
+
+
+def set_session_index(
+    sid: str,
+    index: SessionIndex,
+    *,
+    share_key: str | None = None,
+    meta: Dict[str, Any] | None = None,
+) -> str | None:
+    """Install ``sid``'s index; with ``share_key`` later identical builds can attach to it.
+
+    Returns the artifact path (relative to the persist dir) to record on the session,
+    or ``None`` when indexes are not persisted. Raises ``ValueError`` if the session
+    expired while the index was being built.
+    """
+    with session_lock(sid), _SHARE_LOCKS.for_key(share_key or sid):
+        if get_session_backend().load(sid) is None:
+            raise ValueError("Invalid session_id")
+        _SESSION_INDEXES.put(sid, index, key=share_key, meta=meta)
+        if share_key and _SESSION_INDEXES.key(sid) != share_key:
+            share_key = None  # a concurrent build claimed the key; this copy stays private
+        root = _artifact_root()
+        if root is None:
+            return None
+        artifact = _index_artifact(sid, share_key)
+        directory = root / artifact
+        save_session_index(index, directory)
+        if share_key and meta is not None:
+            (directory / "build.json").write_text(json.dumps(meta), encoding="utf-8")
+        _SESSION_INDEXES.attach(
+            sid, directory, index, version=index.index_id, key=share_key or private_key(sid)
+        )
+        return artifact
+
+
+def share_session_index(sid: str, share_key: str) -> Dict[str, Any] | None:
+    """Attach ``sid`` to an existing shared index built from an identical corpus.
+
+    Returns the build metadata recorded by ``set_session_index`` (plus ``artifact``),
+    or ``None`` when no such index exists in this process or under the persist dir.
+    """
+    with session_lock(sid), _SHARE_LOCKS.for_key(share_key):
+        meta = _SESSION_INDEXES.share(sid, share_key)
+        root = _artifact_root()
+        artifact = _index_artifact(sid, share_key) if root is not None else None
+        if meta is None and root is not None:
+            directory = root / artifact
+            meta = _read_build_meta(directory)
+            if meta is None or not (directory / MANIFEST_FILE).is_file():
+                return None
+            _SESSION_INDEXES.attach(
+                sid, directory, version=meta.get("index_id"), key=share_key, meta=meta
+            )
+    if meta is None:
+        return None
+    return {**meta, "artifact": artifact}
 
 
 def get_session_index(sid: str) -> Optional[SessionIndex]:
+    backend = get_session_backend()
+    if backend.shared:
+        # Another worker may have (re)built this session's index: follow the record.
+        ref = backend.index_ref(sid)
+        if ref is None:
+            _SESSION_INDEXES.pop(sid)
+            return None
+        current, artifact = ref
+        if _SESSION_INDEXES.version(sid) != current:
+            root = _artifact_root()
+            directory = (
+                root / (artifact or _index_artifact(sid, None)) if root is not None else None
+            )
+            if directory is None or not (directory / MANIFEST_FILE).is_file():
+                return None
+            _SESSION_INDEXES.attach(
+                sid,
+                directory,
+                version=current,
+                key=_key_for_artifact(sid, artifact),
+                meta=_shared_meta(sid, artifact, directory),
+            )
     return _SESSION_INDEXES.get(sid)
 
 
+def shared_index_info(sid: str) -> tuple[str, Dict[str, Any]] | None:
+    """Share key and build metadata when ``sid`` reads a shared index, else ``None``."""
+    key = _SESSION_INDEXES.key(sid)
+    if key is None or key == private_key(sid):
+        return None
+    return key, _SESSION_INDEXES.meta(key) or {}
+
+
+def session_index_for_update(sid: str) -> Optional[SessionIndex]:
+    """Index ``sid`` may modify: a shared index is cloned into a private copy first."""
+    return _SESSION_INDEXES.make_private(sid)
+
+
+def set_session_graph(
+    sid: str, index_id: str | None, graph: "graph_module.GraphStore | graph_sqlite.SqliteGraphStore"
+) -> bool:
+    """Attach a graph built after indexing to ``sid``'s index (and every session sharing it)."""
+    return _SESSION_INDEXES.set_graph(sid, index_id, graph)
+
+
+def session_index_stats() -> Dict[str, Any]:
+    return _SESSION_INDEXES.stats()
+
+
+def compress_idle_session_indexes() -> int:
+    """Move indexes unread for SESSION_IDLE_COMPRESS_MINUTES into the compressed tier."""
+    minutes = settings.SESSION_IDLE_COMPRESS_MINUTES
+    if minutes <= 0:
+        return 0
+    return _SESSION_INDEXES.compress_idle(
+        minutes * 60, embeddings_mode=settings.SESSION_IDLE_EMBEDDINGS
+    )
+
+
+def _ttl_seconds() -> float:
+    return settings.SESSION_TTL_MINUTES * 60
+
+
 def new_session() -> str:
     sid = str(uuid.uuid4())
-    _SESSIONS[sid] = {
-        "created": time.time(),
+    now = time.time()
+    session = {
+        "created": now,
+        "last_access": now,
         "docs": {},
         "index": None,
         "queries_used": 0,
         "last_query_ts": None,
     }
+    get_session_backend().create(sid, session, now + _ttl_seconds())
     record_session_created()
     return sid
 
 
 def get_session(sid: str) -> Dict[str, Any] | None:
-    return _SESSIONS.get(sid)
+    return get_session_backend().load(sid)
 
 
 def ensure_session(sid: str) -> Dict[str, Any]:
-    session = get_session(sid)
+    backend = get_session_backend()
+    session = backend.load(sid)
     if not session:
         raise ValueError("Invalid session_id")
+    now = time.time()
+    backend.touch(sid, now)
+    session["last_access"] = now
+    _persist_access(sid, now)
     return session
 
 
-def incr_query(sid: str) -> int:
-    session = ensure_session(sid)
-    session["queries_used"] = int(session.get("queries_used", 0)) + 1
-    session["last_query_ts"] = time.time()
-    return session["queries_used"]
+def _write_session_record(root: Path, sid: str, session: Dict[str, Any]) -> None:
+    directory = root / sid
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = directory / f"session.json.{threading.get_ident()}.tmp"
+    tmp.write_text(json.dumps(session, default=str), encoding="utf-8")
+    os.replace(tmp, directory / "session.json")
+    with _persisted_access_lock:
+        _persisted_access[sid] = float(session.get("last_access") or 0)
+
+
+def _persist_access(sid: str, now: float) -> None:
+    """Re-write ``sid``'s persisted record when its ``last_access`` is getting stale.
 
+    Restores compute deadlines from the persisted ``last_access``, so reads must
+    reach disk too, but at most every ``_ACCESS_PERSIST_SECONDS`` (or a tenth
+    of the TTL when that is shorter) per session.
+    """
+    backend = get_session_backend()
+    root = _artifact_root()
+    if backend.shared or root is None:
+        return
+    interval = min(_ACCESS_PERSIST_SECONDS, _ttl_seconds() / 10)
+    with _persisted_access_lock:
+        if now - _persisted_access.get(sid, 0.0) < interval:
+            return
+        _persisted_access[sid] = now  # claimed: concurrent touches skip the write
+    session = backend.load(sid)
+    if session is not None:
+        _write_session_record(root, sid, session)
 
-def cleanup_expired_sessions() -> None:
-    ttl = settings.SESSION_TTL_MINUTES * 60
+
+def save_session(sid: str, session: Dict[str, Any]) -> None:
+    """Write back a mutated session record.
+
+    Required after changing ``docs``/``index``: shared backends hand out copies.
+    With the memory backend and SESSION_PERSIST_DIR set, a JSON snapshot is also
+    written so the session can be restored after a restart; touches re-write it
+    (throttled) so the persisted ``last_access`` stays current.
+    """
+    backend = get_session_backend()
+    backend.save(sid, session)
+    root = _artifact_root()
+    if backend.shared or root is None:
+        return
+    _write_session_record(root, sid, session)
+
+
+def incr_query(sid: str) -> int:
     now = time.time()
-    for sid in list(_SESSIONS.keys()):
-        if now - _SESSIONS[sid]["created"] > ttl:
-            del _SESSIONS[sid]
-            _SESSION_INDEXES.pop(sid, None)
+    used = get_session_backend().incr_query(sid, now)
+    if used is None:
+        raise ValueError("Invalid session_id")
+    _persist_access(sid, now)
+    return used
+
+
+def _drop_artifacts(sid: str) -> None:
+    root = _artifact_root()
+    if root is not None:
+        shutil.rmtree(root / sid, ignore_errors=True)
+
+
+def _drop_shared_artifacts(key: str) -> None:
+    # Other workers may still reference shared artifacts when the backend is shared.
+    root = _artifact_root()
+    if root is None or get_session_backend().shared:
+        return
+    with _SHARE_LOCKS.for_key(key):
+        if not _SESSION_INDEXES.ref_count(key):
+            shutil.rmtree(root / _SHARED_DIR / key, ignore_errors=True)
+
+
+def cleanup_expired_sessions(now: float | None = None) -> int:
+    """Evict sessions idle for longer than the TTL; returns the number evicted."""
+    now = time.time() if now is None else now
+    evicted = get_session_backend().expire(now, _ttl_seconds())
+    for sid in evicted:
+        # The record is gone, so no new index can be installed; wait out one in flight.
+        with session_lock(sid):
+            key = _SESSION_INDEXES.key(sid)
+            _SESSION_INDEXES.pop(sid)
+            _drop_artifacts(sid)
+        with _persisted_access_lock:
+            _persisted_access.pop(sid, None)
+        if key and key != private_key(sid):
+            _drop_shared_artifacts(key)
+    if evicted:
+        record_sessions_evicted(len(evicted))
+    return len(evicted)
+
+
+def _prune_local_indexes() -> int:
+    """Drop indexes whose sessions another worker expired (shared backends only)."""
+    backend = get_session_backend()
+    if not backend.shared:
+        return 0
+    local = _SESSION_INDEXES.ids()
+    stale = set(local) - backend.existing(local)
+    for sid in stale:
+        _SESSION_INDEXES.pop(sid)
+    return len(stale)
+
+
+def restore_persisted_sessions(now: float | None = None) -> int:
+    """Re-register snapshots written by ``save_session``; indexes load lazily on first use.
+
+    Only needed for the memory backend; shared backends keep records durable already.
+    """
+    backend = get_session_backend()
+    root = _artifact_root()
+    if backend.shared or root is None or not root.is_dir():
+        return 0
+    now = time.time() if now is None else now
+    ttl = _ttl_seconds()
+    restored = 0
+    for directory in root.iterdir():
+        if directory.name == _SHARED_DIR:
+            continue
+        record = directory / "session.json"
+        if not record.is_file() or backend.load(directory.name) is not None:
+            continue
+        try:
+            session = json.loads(record.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            logger.warning("Skipping unreadable persisted session %s: %s", directory.name, exc)
+            continue
+        deadline = float(session.get("last_access") or session.get("created") or 0) + ttl
+        if deadline <= now:
+            shutil.rmtree(directory, ignore_errors=True)
+            continue
+        sid = directory.name
+        index_meta = session.get("index") or {}
+        artifact = index_meta.get("artifact") or _index_artifact(sid, None)
+        if (root / artifact / MANIFEST_FILE).is_file():
+            _SESSION_INDEXES.attach(
+                sid,
+                root / artifact,
+                version=index_meta.get("index_id"),
+                key=_key_for_artifact(sid, artifact),
+                meta=_shared_meta(sid, artifact, root / artifact),
+            )
+        else:
+            session["index"] = None
+        backend.create(sid, session, deadline)
+        with _persisted_access_lock:
+            _persisted_access[sid] = float(session.get("last_access") or 0)
+        restored += 1
+    return restored
+
+
+def session_count() -> int:
+    return get_session_backend().count()
+
+
+def reaper_running() -> bool:
+    return _reaper_running
+
+
+def _reaper_pass() -> None:
+    evicted = cleanup_expired_sessions()
+    _prune_local_indexes()
+    compress_idle_session_indexes()
+    compact_global_indexes()
+    if evicted:
+        logger.info("[SESSION_REAPER] evicted=%d active=%d", evicted, session_count())
+
+
+async def run_session_reaper(interval_seconds: float | None = None) -> None:
+    """Background loop that evicts expired sessions off the request path."""
+    global _reaper_running
+    interval = max(1.0, float(interval_seconds or settings.SESSION_REAPER_INTERVAL_SECONDS))
+    _reaper_running = True
+    try:
+        while True:
+            try:
+                # Locks, compression and disk I/O: keep them off the event loop.
+                await asyncio.to_thread(_reaper_pass)
+            except Exception as exc:  # pragma: no cover - defensive log
+                logger.warning("Session reaper pass failed: %s", exc)
+            await asyncio.sleep(interval)
+    finally:
+        _reaper_running = False
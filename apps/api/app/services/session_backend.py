@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import copy
+import heapq
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Set, Tuple
+
+from .concurrency import StripedLocks
+
+# Counters that are updated atomically by incr_query and therefore never taken from
+# a (possibly stale) session dict on save.
+_COUNTER_FIELDS = ("queries_used", "last_query_ts", "last_access")
+# Decoded records kept per process by the SQLite backend (they include document texts).
+_DECODED_CACHE_SIZE = 256
+
+
+class SessionBackend(Protocol):
+    """Storage for session records (metadata only; indexes live in the index store).
+
+    ``shared`` backends may be updated by other worker processes, so callers must
+    not assume a dict returned by ``load`` stays current or that mutating it in
+    place is visible without ``save``.
+    """
+
+    shared: bool
+
+    def create(self, sid: str, session: Dict[str, Any], deadline: float) -> None: ...
+
+    def load(self, sid: str) -> Optional[Dict[str, Any]]: ...
+
+    def save(self, sid: str, session: Dict[str, Any]) -> None: ...
+
+    def touch(self, sid: str, now: float) -> None: ...
+
+    def incr_query(self, sid: str, now: float) -> Optional[int]: ...
+
+    def expire(self, now: float, ttl: float) -> List[str]: ...
+
+    def index_ref(self, sid: str) -> Optional[Tuple[str, Optional[str]]]: ...
+
+    def existing(self, sids: Iterable[str]) -> Set[str]: ...
+
+    def sids(self) -> List[str]: ...
+
+    def count(self) -> int: ...
+
+
+def _placeholders(count: int) -> str:
+    """``?, ?, ...`` for an ``IN`` list: values are always bound, never interpolated."""
+    return ",".join("?" * count)
+
+
+def _index_id(session: Dict[str, Any]) -> Optional[str]:
+    index = session.get("index")
+    return index.get("index_id") if isinstance(index, dict) else None
+
+
+def _artifact(session: Dict[str, Any]) -> Optional[str]:
+    index = session.get("index")
+    return index.get("artifact") if isinstance(index, dict) else None
+
+
+class MemorySessionBackend:
+    """Process-local sessions with a lazily re-armed min-heap of expiry deadlines.
+
+    Record updates hold the session's lock stripe, so read-modify-write counters
+    and touches never race with each other or with expiry of the same session.
+    The heap has its own short-held lock and is never held with a stripe.
+    """
+
+    shared = False
+
+    def __init__(self, stripes: int = 64) -> None:
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.heap: List[Tuple[float, str]] = []
+        self._locks = StripedLocks(stripes)
+        self._heap_lock = threading.Lock()
+
+    def lock(self, sid: str) -> threading.RLock:
+        return self._locks.for_key(sid)
+
+    def create(self, sid: str, session: Dict[str, Any], deadline: float) -> None:
+        with self.lock(sid):
+            self.sessions[sid] = session
+        with self._heap_lock:
+            heapq.heappush(self.heap, (deadline, sid))
+
+    def load(self, sid: str) -> Optional[Dict[str, Any]]:
+        return self.sessions.get(sid)
+
+    def save(self, sid: str, session: Dict[str, Any]) -> None:
+        with self.lock(sid):
+            current = self.sessions.get(sid)
+            if current is None:
+                return
+            if current is not session:
+                # Counters are only ever advanced by touch/incr_query; keep the newest.
+                for field in _COUNTER_FIELDS:
+                    if field in current:
+                        session[field] = current[field]
+            self.sessions[sid] = session
+
+    def touch(self, sid: str, now: float) -> None:
+        with self.lock(sid):
+            session = self.sessions.get(sid)
+            if session is not None:
+                session["last_access"] = max(float(session.get("last_access") or 0), now)
+
+    def incr_query(self, sid: str, now: float) -> Optional[int]:
+        with self.lock(sid):
+            session = self.sessions.get(sid)
+            if session is None:
+                return None
+            session["queries_used"] = int(session.get("queries_used", 0)) + 1
+            session["last_query_ts"] = now
+            session["last_access"] = max(float(session.get("last_access") or 0), now)
+            return session["queries_used"]
+
+    def expire(self, now: float, ttl: float) -> List[str]:
+        """Pop due heap entries only, so the common case (nothing due) is a single peek."""
+        evicted: List[str] = []
+        while True:
+            with self._heap_lock:
+                if not self.heap or self.heap[0][0] > now:
+                    break
+                _deadline, sid = heapq.heappop(self.heap)
+            with self.lock(sid):
+                session = self.sessions.get(sid)
+                if session is None:
+                    continue
+                deadline = float(session.get("last_access") or session["created"]) + ttl
+                if deadline <= now:
+                    del self.sessions[sid]
+                    evicted.append(sid)
+                    continue
+            with self._heap_lock:
+                heapq.heappush(self.heap, (deadline, sid))
+        return evicted
+
+    def index_ref(self, sid: str) -> Optional[Tuple[str, Optional[str]]]:
+        session = self.sessions.get(sid)
+        index_id = _index_id(session) if session is not None else None
+        return (index_id, _artifact(session)) if index_id else None
+
+    def existing(self, sids: Iterable[str]) -> Set[str]:
+        return {sid for sid in sids if sid in self.sessions}
+
+    def sids(self) -> List[str]:
+        return list(self.sessions)
+
+    def count(self) -> int:
+        return len(self.sessions)
+
+
+class SqliteSessionBackend:
+    """Sessions in a SQLite file shared by every worker process on the host.
+
+    Access time and query counters are columns so that touches and ``incr_query``
+    are single atomic UPDATEs; the rest of the record is a JSON blob. Expiry is an
+    indexed range scan on ``last_access``.
+
+    Every write of the blob bumps the row's ``version``. Decoded blobs are cached
+    per process by version, so a ``load`` of an unchanged record reads only the
+    small columns instead of parsing every document's text again.
+    """
+
+    shared = True
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " sid TEXT PRIMARY KEY,"
+            " last_access REAL NOT NULL,"
+            " index_id TEXT,"
+            " artifact TEXT,"
+            " queries_used INTEGER NOT NULL DEFAULT 0,"
+            " last_query_ts REAL,"
+            " data TEXT NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "version" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+        self._decoded: "OrderedDict[str, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._decoded_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                str(self.path), timeout=30.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(session: Dict[str, Any]) -> str:
+        return json.dumps(
+            {k: v for k, v in session.items() if k not in _COUNTER_FIELDS}, default=str
+        )
+
+    def _remember(self, sid: str, version: int, record: Dict[str, Any]) -> None:
+        with self._decoded_lock:
+            self._decoded[sid] = (version, record)
+            self._decoded.move_to_end(sid)
+            while len(self._decoded) > _DECODED_CACHE_SIZE:
+                self._decoded.popitem(last=False)
+
+    def _forget(self, sids: Iterable[str]) -> None:
+        with self._decoded_lock:
+            for sid in sids:
+                self._decoded.pop(sid, None)
+
+    def _record(self, sid: str, version: int) -> Optional[Dict[str, Any]]:
+        """The decoded blob of ``sid`` at ``version``, parsing it only when it changed."""
+        with self._decoded_lock:
+            cached = self._decoded.get(sid)
+            if cached is not None and cached[0] == version:
+                self._decoded.move_to_end(sid)
+                return cached[1]
+        row = (
+            self._conn()
+            .execute("SELECT version, data FROM sessions WHERE sid = ?", (sid,))
+            .fetchone()
+        )
+        if row is None:
+            return None
+        record = json.loads(row[1])
+        self._remember(sid, row[0], record)
+        return record
+
+    def create(self, sid: str, session: Dict[str, Any], deadline: float) -> None:
+        data = self._encode(session)
+        # An upsert rather than REPLACE, so a recreated sid never reuses a cached version.
+        (version,) = (
+            self._conn()
+            .execute(
+                "INSERT INTO sessions"
+                " (sid, last_access, index_id, artifact, queries_used, last_query_ts, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (sid) DO UPDATE SET last_access = excluded.last_access,"
+                " index_id = excluded.index_id, artifact = excluded.artifact,"
+                " queries_used = excluded.queries_used, last_query_ts = excluded.last_query_ts,"
+                " data = excluded.data, version = version + 1"
+                " RETURNING version",
+                (
+                    sid,
+                    float(session.get("last_access") or session["created"]),
+                    _index_id(session),
+                    _artifact(session),
+                    int(session.get("queries_used", 0)),
+                    session.get("last_query_ts"),
+                    data,
+                ),
+            )
+            .fetchone()
+        )
+        self._remember(sid, version, json.loads(data))
+
+    def load(self, sid: str) -> Optional[Dict[str, Any]]:
+        row = (
+            self._conn()
+            .execute(
+                "SELECT last_access, queries_used, last_query_ts, version"
+                " FROM sessions WHERE sid = ?",
+                (sid,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        record = self._record(sid, row[3])
+        if record is None:
+            return None
+        # Callers may mutate what they get; strings are immutable, so the copy stays cheap.
+        session = copy.deepcopy(record)
+        session["last_access"], session["queries_used"], session["last_query_ts"] = (
+            row[0],
+            row[1],
+            row[2],
+        )
+        return session
+
+    def save(self, sid: str, session: Dict[str, Any]) -> None:
+        data = self._encode(session)
+        row = (
+            self._conn()
+            .execute(
+                "UPDATE sessions SET data = ?, index_id = ?, artifact = ?, version = version + 1"
+                " WHERE sid = ? RETURNING version",
+                (data, _index_id(session), _artifact(session), sid),
+            )
+            .fetchone()
+        )
+        if row is not None:
+            self._remember(sid, row[0], json.loads(data))
+
+    def touch(self, sid: str, now: float) -> None:
+        self._conn().execute(
+            "UPDATE sessions SET last_access = MAX(last_access, ?) WHERE sid = ?", (now, sid)
+        )
+
+    def incr_query(self, sid: str, now: float) -> Optional[int]:
+        row = (
+            self._conn()
+            .execute(
+                "UPDATE sessions SET queries_used = queries_used + 1, last_query_ts = ?,"
+                " last_access = MAX(last_access, ?) WHERE sid = ? RETURNING queries_used",
+                (now, now, sid),
+            )
+            .fetchone()
+        )
+        return int(row[0]) if row else None
+
+    def expire(self, now: float, ttl: float) -> List[str]:
+        conn = self._conn()
+        cutoff = now - ttl
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            sids = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT sid FROM sessions WHERE last_access <= ?", (cutoff,)
+                )
+            ]
+            if sids:
+                conn.execute("DELETE FROM sessions WHERE last_access <= ?", (cutoff,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._forget(sids)
+        return sids
+
+    def index_ref(self, sid: str) -> Optional[Tuple[str, Optional[str]]]:
+        row = (
+            self._conn()
+            .execute("SELECT index_id, artifact FROM sessions WHERE sid = ?", (sid,))
+            .fetchone()
+        )
+        return (row[0], row[1]) if row and row[0] else None
+
+    def existing(self, sids: Iterable[str]) -> Set[str]:
+        wanted = list(sids)
+        found: Set[str] = set()
+        for start in range(0, len(wanted), 500):
+            batch = wanted[start : start + 500]
+            # Only "?" placeholders are formatted into the statement; the sids are bound.
+            query = f"SELECT sid FROM sessions WHERE sid IN ({_placeholders(len(batch))})"  # noqa: S608
+            found.update(row[0] for row in self._conn().execute(query, batch))
+        return found
+
+    def sids(self) -> List[str]:
+        return [row[0] for row in self._conn().execute("SELECT sid FROM sessions")]
+
+    def count(self) -> int:
+        return int(self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0])
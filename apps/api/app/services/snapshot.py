@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..config import settings
+from .index_format import load_session_index, save_session_index
+from .observability import record_snapshot
+from .session import (
+    get_session,
+    get_session_backend,
+    get_session_index,
+    restore_persisted_sessions,
+    save_session,
+    session_lock,
+    set_session_index,
+    share_session_index,
+    shared_index_info,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_MANIFEST = "snapshot.json"
+_SHARED_PREFIX = "shared/"
+# gzip level 6 is ~3x faster than the default 9 for a few percent larger files.
+_COMPRESSLEVEL = 6
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot archive is unreadable or from an unknown format version."""
+
+
+def _extract(tar: tarfile.TarFile, root: Path) -> None:
+    """Unpack ``tar`` into ``root`` without letting members escape it."""
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(root, filter="data")
+        return
+    # Python < 3.11.4 has no extraction filters. Snapshots only hold plain files and
+    # directories, so accept nothing else and keep every path inside ``root``.
+    base = root.resolve()
+    members = tar.getmembers()
+    for member in members:
+        target = (base / member.name).resolve()
+        if not (member.isfile() or member.isdir()) or not target.is_relative_to(base):
+            raise tarfile.TarError(f"Refusing to extract snapshot member {member.name!r}")
+    tar.extractall(root, members=members)  # noqa: S202 - members validated above
+
+
+def _dir_bytes(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+
+
+def _add_json(tar: tarfile.TarFile, name: str, payload: Any) -> int:
+    data = json.dumps(payload, default=str).encode("utf-8")
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+    return len(data)
+
+
+def _add_index(tar: tarfile.TarFile, staging: Path, name: str, index: Any) -> int:
+    directory = staging / name
+    save_session_index(index, directory, portable=True)
+    size = _dir_bytes(directory)
+    tar.add(directory, arcname=name)
+    shutil.rmtree(directory, ignore_errors=True)
+    return size
+
+
+def export_snapshot(path: str | Path) -> Dict[str, Any]:
+    """Write every live session (record plus index) to a gzip-compressed tar at ``path``.
+
+    Shared indexes are stored once. The archive is written next to ``path`` and
+    renamed into place, so a reader never sees a partial snapshot. Returns a report
+    with per-session export time and (uncompressed) bytes.
+    """
+    started = time.perf_counter()
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(f"{target.name}.partial")
+    sessions: List[Dict[str, Any]] = []
+    shared: Dict[str, Dict[str, Any]] = {}
+    with (
+        tempfile.TemporaryDirectory(prefix="rag-snapshot-") as staging,
+        tarfile.open(partial, "w:gz", compresslevel=_COMPRESSLEVEL) as tar,
+    ):
+        for sid in get_session_backend().sids():
+            session_started = time.perf_counter()
+            with session_lock(sid):
+                record = get_session(sid)
+                if record is None:
+                    continue  # expired while exporting
+                record = json.loads(json.dumps(record, default=str))
+                index = get_session_index(sid) if record.get("index") else None
+                info = shared_index_info(sid) if index is not None else None
+            nbytes = _add_json(tar, f"sessions/{sid}/session.json", record)
+            location = None
+            if index is not None and info is not None:
+                key, meta = info
+                location = f"{_SHARED_PREFIX}{key}"
+                if key not in shared:
+                    shared[key] = meta
+                    nbytes += _add_index(tar, Path(staging), location, index)
+            elif index is not None:
+                location = f"sessions/{sid}/index"
+                nbytes += _add_index(tar, Path(staging), location, index)
+            sessions.append(
+                {
+                    "session_id": sid,
+                    "index": location,
+                    "bytes": nbytes,
+                    "ms": round((time.perf_counter() - session_started) * 1000, 2),
+                }
+            )
+        _add_json(
+            tar,
+            SNAPSHOT_MANIFEST,
+            {
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "created": time.time(),
+                "sessions": [
+                    {"session_id": s["session_id"], "index": s["index"]} for s in sessions
+                ],
+                "shared": shared,
+            },
+        )
+    os.replace(partial, target)
+    total_ms = round((time.perf_counter() - started) * 1000, 2)
+    report = {
+        "path": str(target),
+        "sessions": sessions,
+        "exported": len(sessions),
+        "bytes": sum(s["bytes"] for s in sessions),
+        "compressed_bytes": target.stat().st_size,
+        "ms": total_ms,
+    }
+    record_snapshot(
+        "export", sessions=len(sessions), nbytes=report["compressed_bytes"], ms=total_ms
+    )
+    logger.info(
+        "[SNAPSHOT] exported sessions=%d bytes=%d ms=%.1f",
+        len(sessions),
+        report["compressed_bytes"],
+        total_ms,
+    )
+    return report
+
+
+def _restore_group(
+    root: Path,
+    entries: List[Dict[str, Any]],
+    shared_meta: Dict[str, Dict[str, Any]],
+    now: float,
+) -> List[Dict[str, Any]]:
+    """Restore sessions that read the same index (one private session, or all sharers of a key)."""
+    backend = get_session_backend()
+    ttl = settings.SESSION_TTL_MINUTES * 60
+    location = entries[0].get("index")
+    share_key = (
+        location[len(_SHARED_PREFIX) :]
+        if location and location.startswith(_SHARED_PREFIX)
+        else None
+    )
+    index = None
+    results: List[Dict[str, Any]] = []
+    for entry in entries:
+        started = time.perf_counter()
+        sid = entry["session_id"]
+        result: Dict[str, Any] = {"session_id": sid, "status": "restored", "bytes": 0}
+        record: Dict[str, Any] | None = None
+        created = False
+        try:
+            record_path = root / "sessions" / sid / "session.json"
+            record = json.loads(record_path.read_text(encoding="utf-8"))
+            result["bytes"] = record_path.stat().st_size
+            deadline = float(record.get("last_access") or record.get("created") or 0) + ttl
+            if deadline <= now:
+                result["status"] = "expired"
+            elif backend.load(sid) is not None:
+                result["status"] = "exists"
+            else:
+                backend.create(sid, record, deadline)
+                created = True
+                if location and record.get("index"):
+                    with session_lock(sid):
+                        meta = share_session_index(sid, share_key) if share_key else None
+                        if meta is not None:
+                            artifact = meta.get("artifact")
+                        else:
+                            if index is None:
+                                index = load_session_index(root / location, mmap=False)
+                                result["bytes"] += _dir_bytes(root / location)
+                            artifact = set_session_index(
+                                sid,
+                                index,
+                                share_key=share_key,
+                                meta=shared_meta.get(share_key or "") or None,
+                            )
+                        record["index"]["artifact"] = artifact
+                        save_session(sid, record)
+                else:
+                    record["index"] = None
+                    save_session(sid, record)
+        except Exception as exc:
+            logger.warning("Failed to restore session %s from snapshot: %s", sid, exc)
+            result["status"] = "failed"
+            result["error"] = str(exc)
+            if created and record is not None:
+                # Keep the session (its documents are still listed) but force a re-index.
+                record["index"] = None
+                save_session(sid, record)
+        result["ms"] = round((time.perf_counter() - started) * 1000, 2)
+        results.append(result)
+    return results
+
+
+def import_snapshot(
+    path: str | Path,
+    *,
+    workers: Optional[int] = None,
+    now: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Restore sessions from a snapshot written by ``export_snapshot``.
+
+    Sessions are restored in parallel (``SESSION_SNAPSHOT_WORKERS`` threads);
+    sessions that already exist or whose TTL has passed are skipped. Returns a
+    report with per-session status, restore time and bytes read.
+    """
+    started = time.perf_counter()
+    now = time.time() if now is None else now
+    with tempfile.TemporaryDirectory(prefix="rag-snapshot-") as staging:
+        root = Path(staging)
+        try:
+            with tarfile.open(path, "r:*") as tar:
+                _extract(tar, root)
+            manifest = json.loads((root / SNAPSHOT_MANIFEST).read_text(encoding="utf-8"))
+        except (OSError, tarfile.TarError, ValueError) as exc:
+            raise SnapshotError(f"Unreadable snapshot {path}: {exc}") from exc
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot format {manifest.get('format_version')!r}")
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in manifest.get("sessions", []):
+            location = entry.get("index")
+            group = (
+                location
+                if location and location.startswith(_SHARED_PREFIX)
+                else entry["session_id"]
+            )
+            groups.setdefault(group, []).append(entry)
+        shared_meta = manifest.get("shared") or {}
+        max_workers = max(1, int(workers or settings.SESSION_SNAPSHOT_WORKERS))
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="snapshot-restore"
+        ) as pool:
+            batches = pool.map(
+                lambda entries: _restore_group(root, entries, shared_meta, now), groups.values()
+            )
+            sessions = [result for batch in batches for result in batch]
+    restored = sum(1 for s in sessions if s["status"] == "restored")
+    total_ms = round((time.perf_counter() - started) * 1000, 2)
+    report = {
+        "path": str(path),
+        "sessions": sessions,
+        "restored": restored,
+        "skipped": len(sessions) - restored,
+        "bytes": sum(s["bytes"] for s in sessions),
+        "ms": total_ms,
+    }
+    record_snapshot("import", sessions=restored, nbytes=report["bytes"], ms=total_ms)
+    logger.info(
+        "[SNAPSHOT] restored sessions=%d skipped=%d ms=%.1f", restored, report["skipped"], total_ms
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export or import a session snapshot.")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot archive (.tar.gz)")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel restore threads")
+    args = parser.parse_args(argv)
+    backend = get_session_backend()
+    if args.action == "export":
+        # A separate process only sees what the running server persisted.
+        restore_persisted_sessions()
+        report = export_snapshot(args.path)
+    else:
+        if not backend.shared and not settings.SESSION_PERSIST_DIR:
+            print(
+                "Nothing durable to import into: "
+                "set SESSION_PERSIST_DIR or SESSION_BACKEND=sqlite.",
+                file=sys.stderr,
+            )
+            return 2
+        report = import_snapshot(args.path, workers=args.workers)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
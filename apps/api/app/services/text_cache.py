@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+from ..config import settings
+from . import disk_cache, gcs_ingestion
+from .extract import ExtractedText
+
+logger = logging.getLogger(__name__)
+
+# Bump when ExtractedText's payload or extraction semantics change.
+_CACHE_FORMAT = 1
+
+
+def _cache_dir() -> Path:
+    if settings.EXTRACT_CACHE_DIR:
+        return Path(settings.EXTRACT_CACHE_DIR)
+    return Path(tempfile.gettempdir()) / "rag-extract-cache"
+
+
+def cache_key(digest: str, file_type: str) -> str:
+    """Key extracted text by content hash plus everything that changes extraction output."""
+    if file_type == "pdf":
+        variant = f"pdf-{settings.PDF_EXTRACTION_MODE}-{settings.PDF_BOILERPLATE_MARGIN:g}"
+    else:
+        variant = file_type
+    return f"{digest}-{variant}-v{_CACHE_FORMAT}"
+
+
+def _sidecar_path(key: str) -> str:
+    return f"{settings.GCS_INGESTION_PREFIX}_extracted/{key}.json.gz"
+
+
+def _encode(extracted: ExtractedText) -> bytes:
+    payload: Dict[str, Any] = {
+        "format": _CACHE_FORMAT,
+        "text": extracted.text,
+        "page_offsets": extracted.page_offsets,
+        "boilerplate_lines_removed": extracted.boilerplate_lines_removed,
+        "boilerplate_chars_removed": extracted.boilerplate_chars_removed,
+        "boilerplate_bytes_removed": extracted.boilerplate_bytes_removed,
+    }
+    return gzip.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"), compresslevel=6)
+
+
+def _decode(blob: bytes) -> ExtractedText | None:
+    payload = json.loads(gzip.decompress(blob).decode("utf-8"))
+    if payload.get("format") != _CACHE_FORMAT:
+        return None
+    return ExtractedText(
+        text=payload["text"],
+        page_offsets=list(payload.get("page_offsets") or [0]),
+        boilerplate_lines_removed=int(payload.get("boilerplate_lines_removed", 0)),
+        boilerplate_chars_removed=int(payload.get("boilerplate_chars_removed", 0)),
+        boilerplate_bytes_removed=int(payload.get("boilerplate_bytes_removed", 0)),
+    )
+
+
+def _write_local(key: str, blob: bytes) -> None:
+    directory = _cache_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(blob)
+        os.replace(tmp_name, directory / f"{key}.json.gz")
+    except Exception:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    disk_cache.evict_lru(directory, "*.json.gz", settings.EXTRACT_CACHE_MAX_MB * 1024 * 1024)
+
+
+def load_extracted(key: str) -> ExtractedText | None:
+    """Return cached extraction from local disk, falling back to the GCS sidecar."""
+    if not settings.EXTRACT_CACHE_ENABLED:
+        return None
+    local = _cache_dir() / f"{key}.json.gz"
+    try:
+        if local.is_file():
+            extracted = _decode(local.read_bytes())
+            disk_cache.touch(local)
+            return extracted
+    except Exception as exc:
+        logger.warning("Discarding unreadable extract cache entry %s: %s", local, exc)
+        local.unlink(missing_ok=True)
+    if not settings.EXTRACT_CACHE_GCS_SIDECAR:
+        return None
+    try:
+        store = gcs_ingestion.get_object_store()
+        sidecar = _sidecar_path(key)
+        if not store.exists(sidecar):
+            return None
+        blob = store.download_bytes(sidecar)
+        extracted = _decode(blob)
+        if extracted is not None:
+            _write_local(key, blob)
+        return extracted
+    except Exception as exc:
+        logger.warning("Extract cache sidecar lookup failed for %s: %s", key, exc)
+        return None
+
+
+def store_extracted(key: str, extracted: ExtractedText) -> None:
+    if not settings.EXTRACT_CACHE_ENABLED:
+        return
+    blob = _encode(extracted)
+    try:
+        _write_local(key, blob)
+    except OSError as exc:
+        logger.warning("Failed to write extract cache entry %s: %s", key, exc)
+    if not settings.EXTRACT_CACHE_GCS_SIDECAR:
+        return
+    try:
+        gcs_ingestion.get_object_store().upload_bytes(_sidecar_path(key), blob)
+    except Exception as exc:
+        logger.warning("Failed to upload extract cache sidecar %s: %s", key, exc)
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Optional
 
 import tiktoken
 
 
-def estimate_tokens(text: str, model: Optional[str] = "gpt-4o-mini") -> int:
+@lru_cache(maxsize=8)
+def get_encoding(model: Optional[str] = "gpt-4o-mini") -> tiktoken.Encoding:
+    """Return the tiktoken encoding for ``model``, cached per process."""
     try:
-        encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
     except Exception:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text: str, model: Optional[str] = "gpt-4o-mini") -> int:
+    return len(get_encoding(model).encode(text))
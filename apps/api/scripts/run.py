@@ -9,7 +9,8 @@ COMMANDS = {
     "dev": ["-m", "uvicorn", "app.main:app", "--reload", "--host", "0.0.0.0", "--port", "8000"],
     "test": ["-m", "pytest"],
     "lint": ["-m", "ruff", "check", "app", "tests"],
-    "typecheck": ["-m", "mypy", "app"]
+    "typecheck": ["-m", "mypy", "app"],
+    "snapshot": ["-m", "app.services.snapshot"],
 }
 
 
@@ -24,9 +25,17 @@ def handle_fmt(extra: list[str]) -> None:
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Run FastAPI app helper commands inside the local venv.")
-    parser.add_argument("task", choices=["dev", "test", "fmt", "lint", "typecheck"], help="Task to execute")
-    parser.add_argument("extra", nargs=argparse.REMAINDER, help="Extra args passed to the underlying tool")
+    parser = argparse.ArgumentParser(
+        description="Run FastAPI app helper commands inside the local venv."
+    )
+    parser.add_argument(
+        "task",
+        choices=["dev", "test", "fmt", "lint", "typecheck", "snapshot"],
+        help="Task to execute",
+    )
+    parser.add_argument(
+        "extra", nargs=argparse.REMAINDER, help="Extra args passed to the underlying tool"
+    )
     parsed = parser.parse_args()
 
     setup_venv.main()
@@ -2,8 +2,26 @@ import os
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parent.parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+
+@pytest.fixture(autouse=True)
+def _isolated_extract_cache(tmp_path, monkeypatch):
+    """Keep on-disk caches and spill files per test so nothing leaks between runs."""
+    from app.services import text_cache
+
+    monkeypatch.setattr(
+        text_cache.settings, "EXTRACT_CACHE_DIR", str(tmp_path / "extract-cache"), raising=False
+    )
+    monkeypatch.setattr(
+        text_cache.settings, "SESSION_INDEX_SPILL_DIR", str(tmp_path / "index-spill"), raising=False
+    )
+    monkeypatch.setattr(
+        text_cache.settings, "GRAPH_CACHE_DIR", str(tmp_path / "graph-cache"), raising=False
+    )
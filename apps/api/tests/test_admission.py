@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import gc
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.admission import (
+    Overloaded,
+    _Gate,
+    get_admission_controller,
+    release_after,
+    reset_admission_controller,
+)
+from app.services.session import ensure_session, new_session
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_controller():
+    reset_admission_controller()
+    yield
+    reset_admission_controller()
+
+
+def test_gate_admits_up_to_limit_then_queues_fifo():
+    async def scenario():
+        gate = _Gate("query", limit=2, max_queue=4, timeout=5.0)
+        first, second = await gate.acquire(), await gate.acquire()
+        order = []
+
+        async def waiter(name):
+            ticket = await gate.acquire()
+            order.append(name)
+            return ticket
+
+        waiters = [asyncio.create_task(waiter(name)) for name in ("a", "b")]
+        await asyncio.sleep(0.01)
+        assert gate.stats()["queue_depth"] == 2 and gate.stats()["active"] == 2
+
+        first.release()
+        first.release()  # idempotent: must not free a second slot
+        await asyncio.sleep(0.01)
+        assert order == ["a"] and gate.stats()["active"] == 2
+
+        # Releasing from a worker thread (as streaming responses do) still wakes the waiter.
+        await asyncio.to_thread(second.release)
+        tickets = await asyncio.gather(*waiters)
+        assert order == ["a", "b"]
+        for ticket in tickets:
+            ticket.release()
+        return gate.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0 and stats["queue_depth"] == 0
+    assert stats["admitted"] == 4 and stats["queued"] == 2
+    assert stats["avg_wait_ms"] > 0 and stats["max_wait_ms"] >= stats["avg_wait_ms"]
+
+
+def test_gate_sheds_when_queue_full_or_wait_times_out():
+    async def scenario():
+        gate = _Gate("compare", limit=1, max_queue=1, timeout=0.05)
+        held = await gate.acquire()
+        queued = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as full:
+            await gate.acquire()
+        assert full.value.reason == "queue_full" and full.value.retry_after >= 1
+        with pytest.raises(Overloaded) as late:
+            await queued
+        assert late.value.reason == "timeout"
+        held.release()
+        # The slot is free again and nobody is left queued.
+        (await gate.acquire()).release()
+        return gate.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1 and stats["timed_out"] == 1
+    assert stats["active"] == 0 and stats["queue_depth"] == 0
+
+
+def test_overloaded_endpoint_returns_503_with_retry_after(monkeypatch):
+    monkeypatch.setenv("EMBEDDINGS_PROVIDER", "fake")
+    monkeypatch.setattr(settings, "ADMISSION_COMPARE_CONCURRENCY", 1, raising=False)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_SIZE", 0, raising=False)
+    session_id = new_session()
+    ensure_session(session_id)["docs"]["doc"] = {
+        "name": "policy.txt",
+        "text": "Vacation policy: 15 days of PTO.",
+    }
+    payload = {
+        "session_id": session_id,
+        "query": "vacation policy",
+        "profile_a": {"name": "A", "k": 2, "chunk_size": 200, "overlap": 40},
+        "profile_b": {"name": "B", "k": 2, "chunk_size": 200, "overlap": 40},
+    }
+
+    ticket = asyncio.run(get_admission_controller().gate("compare").acquire())
+    busy = client.post("/api/compare", json=payload)
+    assert busy.status_code == 503
+    assert int(busy.headers["Retry-After"]) >= 1
+
+    ticket.release()
+    assert client.post("/api/compare", json=payload).status_code == 200
+    stats = get_admission_controller().stats()["endpoints"]["compare"]
+    assert stats["rejected"] == 1 and stats["admitted"] == 2 and stats["active"] == 0
+
+
+def test_disabled_admission_control_admits_everything(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_CONTROL_ENABLED", False, raising=False)
+    assert asyncio.run(get_admission_controller().admit("query")) is None
+    assert get_admission_controller().stats() == {"enabled": False, "endpoints": {}}
+
+
+def test_concurrent_releases_keep_counts_consistent():
+    async def scenario():
+        gate = _Gate("answer", limit=3, max_queue=64, timeout=5.0)
+
+        async def worker():
+            ticket = await gate.acquire()
+            await asyncio.sleep(0.001)
+            await asyncio.to_thread(ticket.release)
+
+        await asyncio.gather(*(worker() for _ in range(40)))
+        return gate.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["admitted"] == 40 and stats["active"] == 0 and stats["queue_depth"] == 0
+
+
+@pytest.mark.parametrize("ending", ["exhausted", "closed", "collected"])
+def test_streams_release_their_ticket_however_they_end(ending):
+    gate = _Gate("answer", limit=1, max_queue=0, timeout=1.0)
+    ticket = asyncio.run(gate.acquire())
+    stream = release_after(ticket, iter(["a", "b"]))
+    if ending == "exhausted":
+        assert list(stream) == ["a", "b"]
+    elif ending == "closed":
+        stream.close()  # never iterated: a generator's finally would not run
+    else:
+        del stream
+        gc.collect()
+    assert gate.stats()["active"] == 0
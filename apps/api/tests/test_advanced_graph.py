@@ -2,15 +2,19 @@ from __future__ import annotations
 
 import io
 
+import numpy as np
+import pytest
 from fastapi.testclient import TestClient
 
-from app.main import app
 from app.config import settings
-from app.services import session_auth
+from app.main import app
 from app.services import advanced as advanced_service
 from app.services import runtime_config as runtime_config_service
+from app.services import session_auth
+from app.services.index import build_faiss_index
+from app.services.retrieve import build_bm25, hybrid_retrieve, score_candidates
 from app.services.runtime_config import FeatureFlags, GraphRagConfig, RuntimeConfig
-
+from app.services.session import SessionIndex
 
 client = TestClient(app)
 
@@ -21,11 +25,19 @@ def _disable_auth(monkeypatch) -> None:
 
 def _upload_and_index(monkeypatch) -> str:
     monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake")
-    files = {"files": ("policy.txt", b"Our PTO Policy references Remote Policy and Security Guide.", "text/plain")}
+    files = {
+        "files": (
+            "policy.txt",
+            b"Our PTO Policy references Remote Policy and Security Guide.",
+            "text/plain",
+        )
+    }
     upload = client.post("/api/upload", files=files)
     assert upload.status_code == 200
     session_id = upload.json()["session_id"]
-    index = client.post("/api/index", json={"session_id": session_id, "chunk_size": 200, "overlap": 40})
+    index = client.post(
+        "/api/index", json={"session_id": session_id, "chunk_size": 200, "overlap": 40}
+    )
     assert index.status_code == 200
     return session_id
 
@@ -52,6 +64,81 @@ def _set_runtime_config(monkeypatch, **overrides) -> RuntimeConfig:
     return cfg
 
 
+def _scoring_index() -> SessionIndex:
+    texts = [f"filler chunk {i} about logistics" for i in range(12)] + [
+        "Turbine blades need inspection every spring.",
+        "Blade inspection reports go to the plant manager.",
+    ]
+    rng = np.random.default_rng(5)
+    vectors = rng.standard_normal((len(texts), 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    bm25, tokens = build_bm25(texts)
+    return SessionIndex(
+        faiss_index=None,
+        chunk_map=[("doc", i, i + 1, text) for i, text in enumerate(texts)],
+        embeddings=vectors,
+        texts=texts,
+        bm25=bm25,
+        bm25_tokens=tokens,
+    )
+
+
+def test_graph_candidates_are_scored_against_the_query():
+    index = _scoring_index()
+    query = "blade inspection"
+    q_vec = index.embeddings[13]
+    dense, lexical = score_candidates(index, q_vec, query, [13, 2, 12])
+    np.testing.assert_allclose(dense, index.embeddings[[13, 2, 12]] @ q_vec, rtol=1e-6)
+    full_bm25 = index.bm25.get_scores(["blade", "inspection"])
+    np.testing.assert_allclose(lexical, full_bm25[[13, 2, 12]], rtol=1e-6)
+    assert lexical[0] > 0 and lexical[1] == 0
+
+    meta = {
+        "dense_scores": {13: 1.0, 4: 0.5, 7: 0.1},
+        "lexical_scores": {13: float(full_bm25[13]), 12: float(full_bm25[12])},
+        "selected": [13],
+    }
+    hits = advanced_service._score_graph_hits(index, q_vec, query, [2, 12, 13], meta)
+    by_idx = {hit.idx: hit for hit in hits}
+    k = settings.FUSION_RRF_K
+    assert by_idx[13].fused_score == 0.0  # already retrieved: its hybrid hit carries the score
+    # Below every pooled dense score (no dense term), second in the lexical pool.
+    assert by_idx[12].dense_score < 0.1
+    assert by_idx[12].fused_score == pytest.approx(1 / (k + 2))
+    assert by_idx[2].fused_score == 0.0 and by_idx[2].dense_score < 0.1
+    assert by_idx[2].lexical_score == 0.0
+
+    ranked = advanced_service._score_graph_hits(index, q_vec, query, [2, 12, 13], meta, ranked=True)
+    assert ranked[2].fused_score == pytest.approx(1 / (k + 3))
+    assert ranked[1].fused_score == pytest.approx(hits[1].fused_score + 1 / (k + 2))
+
+
+def test_graph_hits_merge_on_the_hybrid_scale():
+    index = _scoring_index()
+    query = "turbine blade inspection"
+    q_vec = index.embeddings[12]
+    index.faiss_index = build_faiss_index(index.embeddings.copy())
+    hybrid, meta = hybrid_retrieve(
+        index,
+        q_vec,
+        query,
+        strategy="hybrid",
+        dense_k=3,
+        lexical_k=3,
+        fusion_rrf_k=settings.FUSION_RRF_K,
+        answer_top_k=3,
+        mmr_lambda=0.5,
+        use_mmr=False,
+    )
+    graph_hits = advanced_service._score_graph_hits(index, q_vec, query, [0, 1, 13], meta)
+    merged = advanced_service._merge_hits(graph_hits, hybrid, 4)
+    # The on-topic graph neighbour outranks the off-topic ones, which no longer
+    # crowd out retrieved chunks.
+    order = [hit.idx for hit in merged]
+    assert order[0] == 12 and 13 in order and order.index(13) < 3
+    assert set(order) - {0, 1} >= {hit.idx for hit in hybrid}
+
+
 def test_advanced_query_disabled(monkeypatch):
     _disable_auth(monkeypatch)
     _set_runtime_config(monkeypatch, graph_enabled=False)
@@ -91,9 +178,41 @@ def test_advanced_query_flow(monkeypatch):
     assert first["metrics"]["graph_candidates"] >= 0
 
 
+def test_advanced_query_traversal_mode(monkeypatch):
+    _disable_auth(monkeypatch)
+    _set_runtime_config(monkeypatch, graph_enabled=True, max_graph_hops=2)
+    session_id = _upload_and_index(monkeypatch)
+    modes = []
+    prepare = advanced_service._prepare_retrieval
+
+    def spy(session_id, query, *, traversal_mode, **kwargs):
+        modes.append(traversal_mode)
+        return prepare(session_id, query, traversal_mode=traversal_mode, **kwargs)
+
+    monkeypatch.setattr(advanced_service, "_prepare_retrieval", spy)
+    payload = {
+        "session_id": session_id,
+        "query": "Which guide does the PTO policy reference?",
+        "k": 3,
+    }
+    resp = client.post("/api/query/advanced", json={**payload, "traversal": "cooccurrence"})
+    assert resp.status_code == 200
+    assert resp.json()["subqueries"][0]["metrics"]["graph_candidates"] >= 1
+    assert set(modes) == {"cooccurrence"}
+
+    modes.clear()
+    assert client.post("/api/query/advanced", json=payload).status_code == 200
+    assert set(modes) == {settings.GRAPH_SCORER}
+    assert (
+        client.post("/api/query/advanced", json={**payload, "traversal": "walk"}).status_code == 422
+    )
+
+
 def test_advanced_query_llm_verification_flag(monkeypatch):
     _disable_auth(monkeypatch)
-    _set_runtime_config(monkeypatch, graph_enabled=True, max_graph_hops=1, fact_check_llm_enabled=False)
+    _set_runtime_config(
+        monkeypatch, graph_enabled=True, max_graph_hops=1, fact_check_llm_enabled=False
+    )
     session_id = _upload_and_index(monkeypatch)
 
     resp = client.post(
@@ -218,11 +337,16 @@ def test_advanced_query_no_verification_still_llm(monkeypatch):
     _set_runtime_config(monkeypatch, graph_enabled=True, max_graph_hops=1, llm_rerank_enabled=True)
     session_id = _upload_and_index(monkeypatch)
     monkeypatch.setattr(advanced_service, "_llm_capable", lambda: True)
-    monkeypatch.setattr(advanced_service, "_summarize_subquery_llm", lambda *args, **kwargs: "LLM sub-answer")
+    monkeypatch.setattr(
+        advanced_service, "_summarize_subquery_llm", lambda *args, **kwargs: "LLM sub-answer"
+    )
     monkeypatch.setattr(
         advanced_service,
         "_synthesize_answer_llm",
-        lambda *args, **kwargs: ("Synthesis output", [{"id": "S1", "doc_id": "doc-id", "chunk_index": 0, "start": 0, "end": 10}]),
+        lambda *args, **kwargs: (
+            "Synthesis output",
+            [{"id": "S1", "doc_id": "doc-id", "chunk_index": 0, "start": 0, "end": 10}],
+        ),
     )
 
     resp = client.post(
@@ -245,7 +369,7 @@ def test_advanced_trace_warns_when_no_evidence(monkeypatch):
     _set_runtime_config(monkeypatch, graph_enabled=True, max_graph_hops=1)
     session_id = _upload_and_index(monkeypatch)
 
-    def fake_prepare(session_id, query, *, max_hops, answer_top_k):
+    def fake_prepare(session_id, query, *, max_hops, answer_top_k, traversal_mode):
         diagnostics = advanced_service.SubQueryDiagnostics([], 0, 0, 0, 0, 0.0)
         return [], [], diagnostics
 
@@ -1,4 +1,8 @@
-from app.services.chunk import chunk_text
+import re
+import types
+
+from app.services import chunk as chunk_module
+from app.services.chunk import chunk_text, iter_token_chunks
 
 
 def test_chunker_basic_overlap():
@@ -8,3 +12,118 @@ def test_chunker_basic_overlap():
     _, end_first, _ = chunks[0]
     start_second, _, _ = chunks[1]
     assert start_second < end_first
+
+
+class _WordEncoding:
+    """Deterministic stand-in for a tiktoken encoding: one token per word plus its leading space."""
+
+    _pattern = re.compile(r" ?\S+|\s+")
+
+    def encode(self, text):
+        return self._pattern.findall(text)
+
+    def decode_with_offsets(self, tokens):
+        offsets, cursor = [], 0
+        for token in tokens:
+            offsets.append(cursor)
+            cursor += len(token)
+        return "".join(tokens), offsets
+
+
+def _use_word_encoding(monkeypatch):
+    monkeypatch.setattr(chunk_module, "get_encoding", lambda model=None: _WordEncoding())
+
+
+def test_token_chunker_is_lazy_and_snaps_to_sentences(monkeypatch):
+    _use_word_encoding(monkeypatch)
+    sentences = [f"Sentence number {i} has exactly six words." for i in range(20)]
+    text = " ".join(sentences)
+    chunks = iter_token_chunks(text, max_tokens=20, overlap_tokens=0)
+    assert isinstance(chunks, types.GeneratorType)
+    chunks = list(chunks)
+    assert len(chunks) >= 6
+    for start, end, chunk in chunks:
+        assert chunk == text[start:end]
+        assert chunk.endswith(".")
+        assert len(chunk.split()) <= 20
+    assert (
+        "".join(c for _, _, c in chunks).replace(".", ". ").split()
+        == text.replace(".", ". ").split()
+    )
+
+
+def test_token_chunker_overlap_and_oversized_sentences(monkeypatch):
+    _use_word_encoding(monkeypatch)
+    text = "Short one. Another short one. " + " ".join(["word"] * 25) + ". Tail sentence here."
+    chunks = list(iter_token_chunks(text, max_tokens=10, overlap_tokens=3))
+    assert all(len(c.split()) <= 10 for _, _, c in chunks)
+    assert any(c.startswith("word") for _, _, c in chunks)
+    assert chunks[-1][2].endswith("Tail sentence here.")
+
+    text = " ".join(f"Three word s{i}." for i in range(6))
+    chunks = list(iter_token_chunks(text, max_tokens=10, overlap_tokens=3))
+    # the trailing sentence of each chunk is carried into the next one
+    assert chunks[1][0] < chunks[0][1]
+    assert chunks[1][2].startswith("Three word s2.")
+
+
+def test_token_budget_counts_separators_between_sentences(monkeypatch):
+    class SeparatorEncoding(_WordEncoding):
+        """Words and whitespace runs are separate tokens, as with newlines in tiktoken."""
+
+        _pattern = re.compile(r"\S+|\s+")
+
+    encoding = SeparatorEncoding()
+    monkeypatch.setattr(chunk_module, "get_encoding", lambda model=None: encoding)
+    text = "\n\n".join(f"Item {i} ok." for i in range(12))
+    chunks = list(iter_token_chunks(text, max_tokens=10, overlap_tokens=0))
+    assert len(chunks) > 1
+    for _start, _end, chunk in chunks:
+        assert len(encoding.encode(chunk)) <= 10, chunk
+
+
+def test_paragraph_break_closes_nearly_full_chunk(monkeypatch):
+    _use_word_encoding(monkeypatch)
+    text = "One two three four five six seven eight.\n\nNew paragraph starts here."
+    chunks = list(iter_token_chunks(text, max_tokens=10, overlap_tokens=0))
+    assert [c for _, _, c in chunks] == [
+        "One two three four five six seven eight.",
+        "New paragraph starts here.",
+    ]
+
+
+def test_index_streams_token_chunks_into_embed_batches(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.config import settings
+    from app.main import app
+    from app.services import embed as embed_module
+
+    _use_word_encoding(monkeypatch)
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_ENABLED", False, raising=False)
+    monkeypatch.setattr(settings, "EMBED_BATCH_SIZE", 4, raising=False)
+    batch_sizes = []
+    original = embed_module.embed_texts
+
+    def counting_embed(texts, model="text-embedding-3-large"):
+        batch_sizes.append(len(texts))
+        return original(texts, model=model)
+
+    monkeypatch.setattr(embed_module, "embed_texts", counting_embed)
+    client = TestClient(app)
+    body = " ".join(f"Fact {i} is recorded in the ledger." for i in range(30)).encode()
+    upload = client.post("/api/upload", files={"files": ("ledger.txt", body, "text/plain")})
+    session_id = upload.json()["session_id"]
+    resp = client.post(
+        "/api/index",
+        json={
+            "session_id": session_id,
+            "chunker": "tokens",
+            "chunk_tokens": 14,
+            "overlap_tokens": 0,
+        },
+    )
+    assert resp.status_code == 200
+    assert resp.json()["chunks_indexed"] == 15
+    assert batch_sizes == [4, 4, 4, 3]
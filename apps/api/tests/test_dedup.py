@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.dedup import ChunkDeduper, content_hash, doc_id_for_hash, simhash64
+from app.services.session import get_session_index
+
+client = TestClient(app)
+
+BOILERPLATE = (
+    "All product names, logos, and brands are property of their respective owners and are used "
+    "for identification purposes only within this manual."
+)
+
+
+def test_doc_id_is_stable_for_identical_content():
+    digest = content_hash(b"same bytes")
+    assert doc_id_for_hash(digest) == doc_id_for_hash(content_hash(b"same bytes"))
+    assert doc_id_for_hash(digest) != doc_id_for_hash(content_hash(b"other bytes"))
+
+
+def test_deduper_exact_ignores_whitespace():
+    deduper = ChunkDeduper()
+    assert deduper.check("alpha beta gamma") is None
+    assert deduper.check("alpha  beta\ngamma") == (0, "exact")
+    assert deduper.check("delta") is None
+    assert deduper.exact_skipped == 1
+    assert deduper.near_skipped == 0
+
+
+def test_deduper_near_duplicates_only_when_enabled():
+    original = BOILERPLATE + " Revision 7."
+    variant = BOILERPLATE + " Revision 8."
+    assert (simhash64(original)[0] ^ simhash64(variant)[0]).bit_count() <= 6
+
+    exact_only = ChunkDeduper()
+    assert exact_only.check(original) is None
+    assert exact_only.check(variant) is None
+
+    near = ChunkDeduper(near_max_distance=6)
+    assert near.check(original) is None
+    assert near.check(variant) == (0, "near")
+    assert (
+        near.check("A completely different paragraph about warranty claims and repair depots.")
+        is None
+    )
+    assert near.near_skipped == 1
+
+
+def test_upload_and_index_skip_duplicates(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_ENABLED", False, raising=False)
+    body_a = (BOILERPLATE + "\n").encode() + b"Chapter one covers installation."
+    body_b = (BOILERPLATE + "\n").encode() + b"Chapter two covers maintenance."
+    files = [
+        ("files", ("a.txt", body_a, "text/plain")),
+        ("files", ("a-copy.txt", body_a, "text/plain")),
+        ("files", ("b.txt", body_b, "text/plain")),
+    ]
+    upload = client.post("/api/upload", files=files)
+    assert upload.status_code == 200
+    payload = upload.json()
+    assert len(payload["doc_ids"]) == 2
+    assert payload["duplicate_files"] == ["a-copy.txt"]
+
+    session_id = payload["session_id"]
+    resp = client.post(
+        "/api/index",
+        json={"session_id": session_id, "chunk_size": len(BOILERPLATE) + 1, "overlap": 0},
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["duplicate_chunks_skipped"] == 1
+    assert data["near_duplicate_chunks_skipped"] == 0
+    sidx = get_session_index(session_id)
+    assert sidx is not None
+    assert len(sidx.chunk_map) == data["chunks_indexed"]
+    assert sidx.embeddings.shape[0] == data["chunks_indexed"]
+    assert sidx.chunk_aliases and sum(len(v) for v in sidx.chunk_aliases.values()) == 1
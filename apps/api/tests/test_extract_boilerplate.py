@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import fitz  # type: ignore[attr-defined]
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.extract import extract_pdf
+
+client = TestClient(app)
+
+
+def _manual_pdf(pages: int = 4) -> bytes:
+    doc = fitz.open()
+    for idx in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 40), "ACME Widget Manual - Confidential")
+        page.insert_text((72, 300), f"Section {idx} explains how to calibrate widget number {idx}.")
+        page.insert_text((280, 820), f"Page {idx + 1} of {pages}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_extract_pdf_strips_repeated_headers_and_footers():
+    extracted = extract_pdf(_manual_pdf())
+    assert "ACME Widget Manual" not in extracted.text
+    assert "Page 1 of 4" not in extracted.text
+    for idx in range(4):
+        assert f"calibrate widget number {idx}" in extracted.text
+    assert extracted.boilerplate_lines_removed == 8
+    assert extracted.boilerplate_bytes_removed > 0
+    assert len(extracted.page_offsets) == 4
+    assert extracted.text[extracted.page_offsets[2] :].startswith("Section 2")
+
+
+def test_extract_pdf_plain_mode_keeps_everything():
+    extracted = extract_pdf(_manual_pdf(), strip_boilerplate=False)
+    assert extracted.text.count("ACME Widget Manual") == 4
+    assert extracted.boilerplate_lines_removed == 0
+
+
+def test_short_documents_are_left_alone():
+    extracted = extract_pdf(_manual_pdf(pages=2))
+    assert extracted.boilerplate_lines_removed == 0
+    assert "Page 2 of 2" in extracted.text
+
+
+def test_index_reports_boilerplate_savings(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_ENABLED", False, raising=False)
+    monkeypatch.setattr(settings, "PDF_EXTRACTION_MODE", "layout", raising=False)
+    upload = client.post(
+        "/api/upload", files={"files": ("manual.pdf", _manual_pdf(), "application/pdf")}
+    )
+    assert upload.status_code == 200
+    session_id = upload.json()["session_id"]
+    resp = client.post(
+        "/api/index", json={"session_id": session_id, "chunk_size": 40, "overlap": 0}
+    )
+    assert resp.status_code == 200
+    (doc,) = resp.json()["documents"]
+    assert doc["name"] == "manual.pdf"
+    assert doc["boilerplate_lines_removed"] == 8
+    assert doc["boilerplate_bytes_removed"] > 0
+    assert doc["boilerplate_chunks_saved"] > 0
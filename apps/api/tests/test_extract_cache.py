@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import base64
+import os
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import gcs_ingestion, text_cache
+from app.services.extract import ExtractedText
+
+client = TestClient(app)
+
+
+def _enable_local_gcs(monkeypatch, root) -> None:
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_ENABLED", True, raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_BACKEND", "local", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_LOCAL_ROOT", str(root), raising=False)
+
+
+def _count_downloads(monkeypatch) -> list:
+    calls = []
+    original = gcs_ingestion.download_blob_bytes
+
+    def counting(path):
+        calls.append(path)
+        return original(path)
+
+    monkeypatch.setattr(gcs_ingestion, "download_blob_bytes", counting)
+    return calls
+
+
+def test_round_trip_preserves_offsets_and_stats():
+    extracted = ExtractedText(
+        text="page one\npage two",
+        page_offsets=[0, 9],
+        boilerplate_lines_removed=2,
+        boilerplate_chars_removed=20,
+        boilerplate_bytes_removed=21,
+    )
+    key = text_cache.cache_key("abc", "pdf")
+    assert text_cache.load_extracted(key) is None
+    text_cache.store_extracted(key, extracted)
+    assert text_cache.load_extracted(key) == extracted
+
+
+def test_cache_key_tracks_extraction_mode(monkeypatch):
+    layout = text_cache.cache_key("abc", "pdf")
+    monkeypatch.setattr(settings, "PDF_EXTRACTION_MODE", "plain", raising=False)
+    assert text_cache.cache_key("abc", "pdf") != layout
+
+
+def test_reindex_skips_download_and_parse(monkeypatch, tmp_path):
+    _enable_local_gcs(monkeypatch, tmp_path / "bucket")
+    downloads = _count_downloads(monkeypatch)
+    upload = client.post(
+        "/api/upload", files={"files": ("notes.txt", b"Cached text for reindexing.", "text/plain")}
+    )
+    session_id = upload.json()["session_id"]
+
+    first = client.post(
+        "/api/index", json={"session_id": session_id, "chunk_size": 200, "overlap": 0}
+    )
+    assert first.status_code == 200
+    assert len(downloads) == 1
+
+    second = client.post(
+        "/api/index", json={"session_id": session_id, "chunk_size": 10, "overlap": 2}
+    )
+    assert second.status_code == 200
+    assert len(downloads) == 1
+    assert second.json()["chunks_indexed"] > first.json()["chunks_indexed"]
+
+
+def test_sidecar_serves_fresh_instances(monkeypatch, tmp_path):
+    _enable_local_gcs(monkeypatch, tmp_path / "bucket")
+    monkeypatch.setattr(settings, "EXTRACT_CACHE_GCS_SIDECAR", True, raising=False)
+    downloads = _count_downloads(monkeypatch)
+    upload = client.post(
+        "/api/upload", files={"files": ("notes.txt", b"Sidecar cached text.", "text/plain")}
+    )
+    session_id = upload.json()["session_id"]
+    assert client.post("/api/index", json={"session_id": session_id}).status_code == 200
+    assert list((tmp_path / "bucket").rglob("*.json.gz"))
+
+    # A new instance has an empty local cache but can still read the sidecar.
+    monkeypatch.setattr(settings, "EXTRACT_CACHE_DIR", str(tmp_path / "fresh-cache"), raising=False)
+    assert (
+        client.post("/api/index", json={"session_id": session_id, "chunk_size": 123}).status_code
+        == 200
+    )
+    assert len(downloads) == 1
+    assert list((tmp_path / "fresh-cache").glob("*.json.gz"))
+
+
+def test_local_cache_evicts_least_recently_used_entries(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACT_CACHE_MAX_MB", 2, raising=False)
+    directory = text_cache._cache_dir()
+    # Incompressible text: each entry is ~600 KB on disk, so three fit and a fourth does not.
+    texts = {name: base64.b64encode(os.urandom(600_000)).decode() for name in "abcd"}
+    for stamp, name in enumerate("abc", start=1):
+        text_cache.store_extracted(name, ExtractedText(text=texts[name]))
+        os.utime(directory / f"{name}.json.gz", (stamp, stamp))
+
+    assert text_cache.load_extracted("a").text == texts["a"]  # a hit makes "a" the most recent
+    text_cache.store_extracted("d", ExtractedText(text=texts["d"]))
+    assert sorted(path.stem for path in directory.glob("*.json.gz")) == [
+        "a.json",
+        "c.json",
+        "d.json",
+    ]
+    assert text_cache.load_extracted("b") is None
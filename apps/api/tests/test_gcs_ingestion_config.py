@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import io
+import tempfile
+import threading
+import time
 import types
+from pathlib import Path
 
 import pytest
 
@@ -95,7 +100,9 @@ def test_upload_uses_storage_client(monkeypatch):
         def bucket(self, name):
             return DummyBucket(name)
 
-    monkeypatch.setattr(gcs_ingestion, "storage", types.SimpleNamespace(Client=lambda: DummyClient()))
+    monkeypatch.setattr(
+        gcs_ingestion, "storage", types.SimpleNamespace(Client=lambda: DummyClient())
+    )
     result = gcs_ingestion.upload_file_for_session("sess", "doc", "file.txt", b"hello")
     assert result.startswith("uploads/")
     assert uploaded["bucket"] == "bucket"
@@ -127,6 +134,148 @@ def test_download_blob_bytes(monkeypatch):
             assert name == "bucket"
             return DummyBucket(name)
 
-    monkeypatch.setattr(gcs_ingestion, "storage", types.SimpleNamespace(Client=lambda: DummyClient()))
+    monkeypatch.setattr(
+        gcs_ingestion, "storage", types.SimpleNamespace(Client=lambda: DummyClient())
+    )
     result = gcs_ingestion.download_blob_bytes("uploads/session/doc/file.txt")
     assert result == b"payload"
+
+
+def test_storage_client_is_shared_across_transfers(monkeypatch):
+    config_obj = GcsIngestionConfig(enabled=True, bucket="bucket", prefix="uploads/", ttl_days=1)
+    monkeypatch.setattr(gcs_ingestion, "get_gcs_ingestion_config", lambda: config_obj)
+    created = []
+
+    class DummyBlob:
+        def upload_from_string(self, data):
+            pass
+
+        def download_as_bytes(self):
+            return b"payload"
+
+    class DummyClient:
+        def __init__(self):
+            created.append(self)
+
+        def bucket(self, name):
+            return types.SimpleNamespace(blob=lambda path: DummyBlob())
+
+    monkeypatch.setattr(gcs_ingestion, "storage", types.SimpleNamespace(Client=DummyClient))
+    gcs_ingestion.upload_file_for_session("sess", "doc", "a.txt", b"a")
+    gcs_ingestion.download_blob_bytes("uploads/sess/doc/a.txt")
+    gcs_ingestion.upload_files_for_session("sess", [("d1", "b.txt", b"b"), ("d2", "c.txt", b"c")])
+    assert len(created) == 1
+
+
+def test_gcs_ranged_download_streams_in_chunks(monkeypatch):
+    payload = bytes(range(256)) * 10
+    calls = []
+
+    class DummyBlob:
+        size = None
+
+        def reload(self):
+            self.size = len(payload)
+
+        def download_as_bytes(self, start=None, end=None):
+            calls.append((start, end))
+            if start >= len(payload):
+                raise AssertionError("416 Requested Range Not Satisfiable")
+            return payload[start : end + 1]
+
+    class DummyClient:
+        def bucket(self, name):
+            return types.SimpleNamespace(blob=lambda path: DummyBlob())
+
+    monkeypatch.setattr(gcs_ingestion, "storage", types.SimpleNamespace(Client=DummyClient))
+    buffer = io.BytesIO()
+    written = gcs_ingestion.GcsObjectStore("bucket").download_to_file(
+        "obj", buffer, chunk_size=1000
+    )
+    assert written == len(payload)
+    assert buffer.getvalue() == payload
+    assert calls == [(0, 999), (1000, 1999), (2000, 2559)]
+
+    # An exact multiple of the chunk size stops at the end instead of reading past it.
+    calls.clear()
+    buffer = io.BytesIO()
+    assert gcs_ingestion.GcsObjectStore("bucket").download_to_file(
+        "obj", buffer, chunk_size=1280
+    ) == len(payload)
+    assert calls == [(0, 1279), (1280, 2559)]
+
+
+def test_map_bounded_preserves_order_and_limits_in_flight():
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(value):
+        with lock:
+            in_flight.append(value)
+            peak.append(len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.remove(value)
+        return value * 2
+
+    results = list(gcs_ingestion.map_bounded(work, range(12), window=3))
+    assert results == [v * 2 for v in range(12)]
+    assert max(peak) <= 3
+
+
+def test_map_bounded_discards_prefetched_results_when_stopped_early(tmp_path):
+    def work(value):
+        path = tmp_path / f"{value}.bin"
+        path.write_bytes(b"x")
+        return path
+
+    results = gcs_ingestion.map_bounded(
+        work, range(6), window=3, discard=lambda path: path.unlink()
+    )
+    first = next(results)
+    results.close()
+    first.unlink()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_local_object_store_round_trip(tmp_path):
+    store = gcs_ingestion.LocalObjectStore(tmp_path)
+    store.upload_bytes("uploads/s/d/file.txt", b"hello world")
+    assert store.exists("uploads/s/d/file.txt")
+    assert store.download_bytes("uploads/s/d/file.txt") == b"hello world"
+    buffer = io.BytesIO()
+    assert store.download_to_file("uploads/s/d/file.txt", buffer, chunk_size=4) == 11
+    assert buffer.getvalue() == b"hello world"
+    with pytest.raises(RuntimeError):
+        store.upload_bytes("../escape.txt", b"x")
+
+
+def test_upload_and_index_with_local_store(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    monkeypatch.setattr(config.settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(config.settings, "GCS_INGESTION_ENABLED", True, raising=False)
+    monkeypatch.setattr(config.settings, "GCS_INGESTION_BACKEND", "local", raising=False)
+    monkeypatch.setattr(config.settings, "GCS_INGESTION_LOCAL_ROOT", str(tmp_path), raising=False)
+    monkeypatch.setattr(config.settings, "GCS_INGESTION_BUCKET", None, raising=False)
+    monkeypatch.setattr(config.settings, "GCS_INGESTION_STREAM_THRESHOLD_MB", 0, raising=False)
+    client = TestClient(app)
+    files = [
+        ("files", ("one.txt", b"First local document about storage.", "text/plain")),
+        ("files", ("two.txt", b"Second local document about transfers.", "text/plain")),
+    ]
+    upload = client.post("/api/upload", files=files)
+    assert upload.status_code == 200
+    session_id = upload.json()["session_id"]
+    stored = sorted(p.name for p in tmp_path.rglob("*.txt"))
+    assert stored == ["one.txt", "two.txt"]
+
+    index = client.post(
+        "/api/index", json={"session_id": session_id, "chunk_size": 200, "overlap": 0}
+    )
+    assert index.status_code == 200
+    assert index.json()["chunks_indexed"] == 2
+    assert not list(Path(tempfile.gettempdir()).glob("rag-ingest-*"))
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import gc
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import session as session_service
+from app.services.global_index import GlobalIndexView, GlobalVectorStore, global_index_stats
+from app.services.index import build_session_vector_index
+from app.services.index_store import SessionIndexStore, estimate_index_bytes
+from app.services.session import SessionIndex
+
+client = TestClient(app)
+
+
+def _vectors(seed: int, rows: int, dim: int = 16) -> np.ndarray:
+    x = np.random.default_rng(seed).standard_normal((rows, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw"])
+def test_search_is_restricted_to_the_owner_range(monkeypatch, kind):
+    monkeypatch.setattr(settings, "GLOBAL_INDEX_TYPE", kind, raising=False)
+    store = GlobalVectorStore(16)
+    a, b = _vectors(1, 50), _vectors(2, 80)
+    view_a = store.add("a", a)
+    view_b = store.add("b", b)
+
+    scores, idxs = view_b.search(b[7:8], 5)
+    assert idxs[0, 0] == 7
+    assert np.all((idxs >= 0) & (idxs < 80))
+    assert scores[0, 0] == pytest.approx(1.0, abs=1e-4)
+    assert store.locate(50 + 7) == ("b", 7)
+
+    _scores, idxs = view_a.search(b[7:8], 60)
+    assert np.all(idxs[0, :50] < 50) and np.all(idxs[0, 50:] == -1)
+
+
+def test_released_owners_are_deleted_and_compacted(monkeypatch):
+    monkeypatch.setattr(settings, "GLOBAL_INDEX_TYPE", "hnsw", raising=False)
+    store = GlobalVectorStore(16)
+    view_a = store.add("a", _vectors(1, 40))
+    view_b = store.add("b", _vectors(2, 40))
+    del view_a
+    gc.collect()
+
+    stats = store.stats()
+    assert stats["owners"] == 1 and stats["tombstoned"] == 40
+    assert store.needs_compaction()
+    store.compact()
+    stats = store.stats()
+    assert stats["vectors"] == 40 and stats["tombstoned"] == 0
+    assert view_b.search(view_b.embeddings[3:4], 1)[1][0, 0] == 3
+
+
+def test_flat_store_removes_in_place(monkeypatch):
+    monkeypatch.setattr(settings, "GLOBAL_INDEX_TYPE", "flat", raising=False)
+    store = GlobalVectorStore(16)
+    view = store.add("a", _vectors(1, 10))
+    _keep = store.add("b", _vectors(2, 10))
+    del view
+    gc.collect()
+    assert store.stats()["vectors"] == 10 and not store.needs_compaction()
+
+
+def test_ivf_is_trained_once_enough_vectors_exist(monkeypatch):
+    monkeypatch.setattr(settings, "GLOBAL_INDEX_TYPE", "ivf", raising=False)
+    monkeypatch.setattr(settings, "GLOBAL_INDEX_IVF_NLIST", 2, raising=False)
+    monkeypatch.setattr(settings, "GLOBAL_INDEX_IVF_NPROBE", 2, raising=False)
+    store = GlobalVectorStore(16)
+    views = [store.add(f"s{i}", _vectors(i, 30)) for i in range(3)]
+    assert store.kind == "flat" and store.needs_compaction()
+    store.compact()
+    assert store.kind == "ivf"
+    assert views[2].search(views[2].embeddings[5:6], 3)[1][0, 0] == 5
+    del views[0]
+    gc.collect()
+    assert store.stats()["vectors"] == 60
+
+
+def test_sessions_index_into_the_global_store(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_ENABLED", False, raising=False)
+    monkeypatch.setattr(settings, "VECTOR_STORE_MODE", "global", raising=False)
+    monkeypatch.setattr(settings, "GLOBAL_INDEX_TYPE", "flat", raising=False)
+    upload = client.post(
+        "/api/upload",
+        files={"files": ("fleet.txt", b"Global indexes pool every session. " * 12, "text/plain")},
+    )
+    session_id = upload.json()["session_id"]
+    assert (
+        client.post("/api/index", json={"session_id": session_id, "chunk_size": 90}).status_code
+        == 200
+    )
+
+    sidx = session_service.get_session_index(session_id)
+    owners_before = sum(s["owners"] for s in global_index_stats())
+    assert sidx.faiss_index.ntotal == len(sidx.chunk_map)
+    _scores, idxs = sidx.faiss_index.search(np.asarray(sidx.embeddings[:1]), 1)
+    assert idxs[0, 0] == 0
+
+    del sidx
+    created = session_service.get_session(session_id)["created"]
+    session_service.cleanup_expired_sessions(now=created + settings.SESSION_TTL_MINUTES * 60 + 3600)
+    gc.collect()
+    assert sum(s["owners"] for s in global_index_stats()) < owners_before
+
+
+def test_spilled_views_are_counted_and_rejoin_the_global_index(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "VECTOR_STORE_MODE", "global", raising=False)
+    monkeypatch.setattr(settings, "GLOBAL_INDEX_TYPE", "flat", raising=False)
+    monkeypatch.setattr(settings, "SESSION_INDEX_SPILL_DIR", str(tmp_path / "spill"), raising=False)
+    monkeypatch.setattr(settings, "SESSION_INDEX_MEMORY_BUDGET_MB", 1, raising=False)
+    store = SessionIndexStore()
+    indexes = {}
+    for name, seed in (("a", 11), ("b", 12)):
+        vectors = _vectors(
+            seed, 3000, dim=64
+        )  # ~770 KB each, plus the same again in the global index
+        indexes[name] = SessionIndex(
+            faiss_index=build_session_vector_index(vectors, owner=f"spill-{name}"),
+            chunk_map=[("doc", i, i + 1, f"chunk {i}") for i in range(len(vectors))],
+            embeddings=vectors,
+            index_id=f"spill-{name}",
+        )
+    assert estimate_index_bytes(indexes["a"]) >= 2 * indexes["a"].embeddings.nbytes
+    first = indexes["a"].embeddings[:1].copy()
+    store.put("a", indexes.pop("a"))
+    store.put("b", indexes.pop("b"))
+    assert store.stats()["spills"] == 1
+
+    reloaded = store.get("a")
+    assert isinstance(reloaded.faiss_index, GlobalIndexView)
+    assert reloaded.faiss_index.search(first, 1)[1][0, 0] == 0
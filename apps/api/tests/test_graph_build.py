@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.services import graph_build
+from app.services import session as session_service
+from app.services.graph import EntityCache, build_graph_store
+from app.services.index import build_faiss_index
+from app.services.retrieve import build_bm25
+from app.services.session import SessionIndex
+
+TEXTS = [
+    "The Turbine Hall houses the Main Generator.",
+    "Main Generator maintenance follows the Outage Plan.",
+    "The Outage Plan lists Turbine Hall access rules.",
+]
+
+
+def _indexed_session(share_key: str | None = None) -> str:
+    rng = np.random.default_rng(3)
+    vectors = rng.standard_normal((len(TEXTS), 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    bm25, tokens = build_bm25(TEXTS)
+    index = SessionIndex(
+        faiss_index=build_faiss_index(vectors.copy()),
+        chunk_map=[("plant", i * 50, i * 50 + len(t), t) for i, t in enumerate(TEXTS)],
+        embeddings=vectors,
+        texts=list(TEXTS),
+        bm25=bm25,
+        bm25_tokens=tokens,
+        embed_model="fake",
+        index_id=f"graph-build-{share_key or 'private'}",
+    )
+    sid = session_service.new_session()
+    session = session_service.ensure_session(sid)
+    session["docs"] = {"plant": {"name": "plant.txt"}}
+    session_service.save_session(sid, session)
+    meta = {"index_id": index.index_id} if share_key else None
+    session_service.set_session_index(sid, index, share_key=share_key, meta=meta)
+    return sid
+
+
+def test_graph_is_built_on_first_use_and_reused():
+    sid = _indexed_session()
+    assert session_service.get_session_index(sid).graph is None
+    before = graph_build.graph_build_stats()["builds"]
+
+    graph = graph_build.ensure_session_graph(sid)
+    assert graph is not None and graph.node_id("main generator") is not None
+    assert session_service.get_session_index(sid).graph is graph
+    assert graph_build.ensure_session_graph(sid) is graph
+    stats = graph_build.graph_build_stats()
+    assert stats["builds"] == before + 1 and stats["last_build_ms"] is not None
+
+
+def test_concurrent_callers_share_one_build(monkeypatch):
+    sid = _indexed_session()
+    calls = []
+    real_build = graph_build.build_session_graph
+
+    def slow_build(docs, chunk_map, **kwargs):
+        calls.append(1)
+        time.sleep(0.05)
+        return real_build(docs, chunk_map, **kwargs)
+
+    monkeypatch.setattr(graph_build, "build_session_graph", slow_build)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(graph_build.ensure_session_graph(sid)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(results) == 4 and all(result is results[0] for result in results)
+
+
+def test_background_build_is_visible_to_sessions_sharing_the_index():
+    first = _indexed_session(share_key="graph-build-corpus")
+    second = session_service.new_session()
+    second_session = session_service.ensure_session(second)
+    second_session["docs"] = {"plant": {"name": "plant.txt"}}
+    session_service.save_session(second, second_session)
+    assert session_service.share_session_index(second, "graph-build-corpus") is not None
+
+    graph_build.schedule_session_graph(first).result(timeout=10)
+    graph = session_service.get_session_index(second).graph
+    assert graph is not None and graph is session_service.get_session_index(first).graph
+
+
+def _same_graph(left, right) -> bool:
+    arrays = (
+        "node_type",
+        "frequency",
+        "section_chunk",
+        "section_doc",
+        "indptr",
+        "indices",
+        "edge_kind",
+    )
+    same_arrays = all(np.array_equal(getattr(left, name), getattr(right, name)) for name in arrays)
+    return same_arrays and left.keys == right.keys and left.labels == right.labels
+
+
+def test_rechunking_only_extracts_chunks_not_seen_before():
+    docs = {"plant": {"name": "plant.txt"}}
+    first = [("plant", i, i + 1, text) for i, text in enumerate(TEXTS)]
+    # A re-index that splits the last chunk: two chunks are unchanged.
+    second = first[:2] + [
+        ("plant", 2, 3, "The Outage Plan lists"),
+        ("plant", 3, 4, "Turbine Hall access rules."),
+    ]
+    cache = EntityCache(100)
+    assert _same_graph(
+        build_graph_store(docs, first, entity_cache=cache), build_graph_store(docs, first)
+    )
+    assert cache.stats() == {"entries": 3, "hits": 0, "misses": 3}
+
+    graph = build_graph_store(docs, second, entity_cache=cache)
+    assert cache.stats() == {"entries": 5, "hits": 2, "misses": 5}
+    assert _same_graph(graph, build_graph_store(docs, second))
+
+    small = EntityCache(2)
+    build_graph_store(docs, second, entity_cache=small)
+    assert small.stats()["entries"] == 2
+
+
+def test_session_graphs_are_cached_by_documents_and_chunks(monkeypatch, tmp_path):
+    monkeypatch.setattr(graph_build.settings, "GRAPH_BACKEND", "memory", raising=False)
+    docs = {"plant": {"name": "plant.txt"}}
+    chunk_map = [("plant", i, i + 1, text) for i, text in enumerate(TEXTS)]
+    before = graph_build.graph_build_stats()
+    graph = graph_build.build_session_graph(docs, chunk_map)
+    assert len(list((tmp_path / "graph-cache").glob("graph-*.npz"))) == 1
+
+    monkeypatch.setattr(
+        graph_build, "build_graph_store", lambda *args, **kwargs: pytest.fail("rebuilt")
+    )
+    cached = graph_build.build_session_graph(docs, chunk_map)
+    assert cached is not graph and _same_graph(cached, graph)
+    assert "entity_index" in cached.__dict__
+    stats = graph_build.graph_build_stats()
+    assert (
+        stats["cache_hits"] == before["cache_hits"] + 1
+        and stats["cache_misses"] == before["cache_misses"] + 1
+    )
+
+    renamed = {"plant": {"name": "plant-v2.txt"}}
+    assert graph_build.graph_cache_key(renamed, chunk_map) != graph_build.graph_cache_key(
+        docs, chunk_map
+    )
+    assert graph_build.graph_cache_key(docs, chunk_map[:2]) != graph_build.graph_cache_key(
+        docs, chunk_map
+    )
+
+
+def test_graph_cache_evicts_least_recently_used_entries(monkeypatch, tmp_path):
+    monkeypatch.setattr(graph_build.settings, "GRAPH_BACKEND", "memory", raising=False)
+    monkeypatch.setattr(graph_build.settings, "GRAPH_CACHE_MAX_MB", 1, raising=False)
+    cache = tmp_path / "graph-cache"
+    cache.mkdir()
+    stale = cache / "graph-stale.npz"
+    stale.write_bytes(b"\0" * 1_500_000)
+    os.utime(stale, (1_000, 1_000))
+
+    graph_build.build_session_graph({"plant": {"name": "plant.txt"}}, [("plant", 0, 1, TEXTS[0])])
+    assert not stale.exists()
+    assert len(list(cache.glob("graph-*.npz"))) == 1
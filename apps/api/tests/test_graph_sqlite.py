@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import gc
+import os
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services import graph_build
+from app.services.graph import (
+    build_graph_store,
+    expand_cooccurrence,
+    expand_graph,
+    match_entities,
+    rank_graph_sections,
+    traverse_graph,
+)
+from app.services.graph_build import build_session_graph, graph_cache_key
+from app.services.graph_sqlite import SqliteGraphBuilder, SqliteGraphStore
+from app.services.index import build_faiss_index
+from app.services.index_format import load_session_index, save_session_index
+from app.services.index_store import SessionIndexStore
+from app.services.session import SessionIndex
+
+DOCS = {
+    "handbook": {"name": "handbook.txt"},
+    "faq": {"name": "faq.txt"},
+    "ops": {"name": "ops.txt"},
+}
+CHUNKS = [
+    (
+        "handbook",
+        0,
+        60,
+        "The Vacation Policy grants fifteen days. Vacation requests go to Payroll.",
+    ),
+    ("handbook", 60, 120, "Payroll processes Vacation payouts at year end."),
+    ("faq", 0, 50, "Remote Work requires manager approval from Human Resources."),
+    ("ops", 0, 40, "Payroll Systems run on the Finance Cluster."),
+    ("ops", 40, 90, "The Finance Cluster is patched by Site Reliability."),
+]
+QUERIES = [
+    "How does payroll handle vacation?",
+    "who approves remote work",
+    "finan clust",
+    "nothing relevant here",
+]
+
+
+@pytest.fixture
+def stores(tmp_path):
+    memory = build_graph_store(DOCS, CHUNKS)
+    disk = build_graph_store(DOCS, CHUNKS, builder=SqliteGraphBuilder(tmp_path / "graph.sqlite3"))
+    return memory, disk
+
+
+def test_sqlite_store_matches_and_traverses_like_the_memory_store(stores):
+    memory, disk = stores
+    assert isinstance(disk, SqliteGraphStore) and disk.nbytes == 0
+    assert (disk.num_nodes, disk.num_edges, disk.section_count) == (
+        memory.num_nodes,
+        memory.num_edges,
+        memory.section_count,
+    )
+
+    for query in QUERIES:
+        seeds = match_entities(memory, query)
+        assert match_entities(disk, query) == seeds, query
+        for hops in (1, 2, 3):
+            assert traverse_graph(disk, seeds, hops) == traverse_graph(memory, seeds, hops), (
+                query,
+                hops,
+            )
+            limited = expand_graph(disk, seeds, hops, limit=2)
+            assert limited.sections == expand_graph(memory, seeds, hops, limit=2).sections
+            co = expand_cooccurrence(disk, seeds, hops)
+            assert co.sections == expand_cooccurrence(memory, seeds, hops).sections, (query, hops)
+
+
+def test_sqlite_ranking_scores_the_seed_neighbourhood(stores):
+    memory, disk = stores
+    seeds = match_entities(disk, "finance cluster")
+    ranked = rank_graph_sections(disk, seeds, 2, limit=3)
+    reachable = set(expand_graph(memory, seeds, 2, limit=None).sections)
+    assert ranked.sections and set(ranked.sections) <= reachable
+    assert np.all(np.diff(ranked.scores) <= 0)
+    start = ranked.paths()[0]["nodes"][0]
+    assert start["type"] == "entity" and start["id"] in seeds
+
+
+def test_owned_databases_are_removed_with_the_store(tmp_path):
+    path = tmp_path / "owned.sqlite3"
+    store = build_graph_store(DOCS, CHUNKS, builder=SqliteGraphBuilder(path, owned=True))
+    assert "payroll" in match_entities(store, "payroll") and path.is_file()
+    del store
+    gc.collect()
+    assert not path.exists()
+
+
+def test_persistent_graphs_are_reused_and_saved_with_the_index(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "GRAPH_BACKEND", "sqlite", raising=False)
+    monkeypatch.setattr(settings, "GRAPH_SQLITE_DIR", str(tmp_path / "graphs"), raising=False)
+    graph = build_session_graph(DOCS, CHUNKS)
+    assert isinstance(graph, SqliteGraphStore)
+    assert graph.path == tmp_path / "graphs" / f"{graph_cache_key(DOCS, CHUNKS)}.sqlite3"
+
+    # A restarted process finds the database instead of rebuilding it.
+    monkeypatch.setattr(
+        graph_build, "build_graph_store", lambda *args, **kwargs: pytest.fail("rebuilt")
+    )
+    assert build_session_graph(DOCS, CHUNKS).path == graph.path
+
+    vectors = np.eye(len(CHUNKS), 4, dtype=np.float32)
+    index = SessionIndex(
+        faiss_index=build_faiss_index(vectors.copy()),
+        chunk_map=CHUNKS,
+        embeddings=vectors,
+        graph=graph,
+    )
+    saved = save_session_index(index, tmp_path / "artifact")
+    assert not (saved / "graph.sqlite3").exists()  # referenced, not copied
+    loaded = load_session_index(saved)
+    assert isinstance(loaded.graph, SqliteGraphStore) and loaded.graph.path == graph.path
+    seeds = match_entities(loaded.graph, "payroll")
+    assert traverse_graph(loaded.graph, seeds, 2) == traverse_graph(graph, seeds, 2)
+
+    # Snapshots may be restored elsewhere, so they carry the database itself.
+    portable = load_session_index(save_session_index(index, tmp_path / "snapshot", portable=True))
+    assert portable.graph.owned and portable.graph.path != graph.path
+    assert match_entities(portable.graph, "payroll") == seeds
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_spilled_sqlite_graphs_stay_readable_after_reload(monkeypatch, tmp_path, persistent):
+    monkeypatch.setattr(settings, "GRAPH_BACKEND", "sqlite", raising=False)
+    monkeypatch.setattr(
+        settings,
+        "GRAPH_SQLITE_DIR",
+        str(tmp_path / "graphs") if persistent else None,
+        raising=False,
+    )
+    monkeypatch.setattr(settings, "SESSION_PERSIST_DIR", None, raising=False)
+    monkeypatch.setattr(settings, "SESSION_INDEX_MEMORY_BUDGET_MB", 1, raising=False)
+    store = SessionIndexStore()
+    for sid in ("a", "b"):
+        vectors = (
+            np.random.default_rng(0).standard_normal((len(CHUNKS) * 12_000, 4)).astype(np.float32)
+        )
+        store.put(
+            sid,
+            SessionIndex(
+                faiss_index=build_faiss_index(vectors.copy()),
+                chunk_map=CHUNKS,
+                embeddings=vectors,
+                graph=build_session_graph(DOCS, CHUNKS),
+            ),
+        )
+    assert store.stats()["spilled"] == 1
+    gc.collect()
+
+    reloaded = store.get("a")
+    assert store.stats()["reloads"] == 1
+    gc.collect()  # the spill directory is gone by now
+    assert "payroll" in match_entities(reloaded.graph, "payroll")
+
+
+def test_persistent_graphs_are_evicted_unless_open(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "GRAPH_BACKEND", "sqlite", raising=False)
+    monkeypatch.setattr(settings, "GRAPH_SQLITE_DIR", str(tmp_path / "graphs"), raising=False)
+    monkeypatch.setattr(settings, "GRAPH_SQLITE_MAX_MB", 1, raising=False)
+    (tmp_path / "graphs").mkdir()
+    stale, in_use = (
+        tmp_path / "graphs" / "graph-stale.sqlite3",
+        tmp_path / "graphs" / "graph-open.sqlite3",
+    )
+    for path in (stale, in_use):
+        path.write_bytes(b"\0" * 1_500_000)
+        os.utime(path, (1_000, 1_000))
+    opened = SqliteGraphStore(in_use)
+
+    graph = build_session_graph(DOCS, CHUNKS)
+    assert not stale.exists()
+    assert in_use.exists() and opened.path == in_use
+    assert "payroll" in match_entities(graph, "payroll")
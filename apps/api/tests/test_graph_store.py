@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.graph import (
+    EDGE_KINDS,
+    MAX_GRAPH_SECTIONS,
+    NODE_DOC,
+    NODE_ENTITY,
+    NODE_SECTION,
+    build_graph_store,
+    expand_cooccurrence,
+    expand_graph,
+    match_entities,
+    personalized_pagerank,
+    rank_graph_sections,
+    shutdown_extract_pool,
+    traverse_graph,
+)
+
+DOCS = {"handbook": {"name": "handbook.txt"}, "faq": {"name": "faq.txt"}}
+CHUNKS = [
+    (
+        "handbook",
+        0,
+        60,
+        "The Vacation Policy grants fifteen days. Vacation requests go to Payroll.",
+    ),
+    ("handbook", 60, 120, "Payroll processes Vacation payouts at year end."),
+    ("faq", 0, 50, "Remote Work requires manager approval."),
+]
+
+
+def test_nodes_are_interned_and_adjacency_is_symmetric_csr():
+    store = build_graph_store(DOCS, CHUNKS)
+    assert store.node_type.dtype == np.int8 and store.indices.dtype == np.int32
+    assert store.indptr[-1] == len(store.indices) == len(store.edge_kind)
+    assert store.section_count == 3 and len(store.nodes_of_type(NODE_DOC)) == 2
+
+    section = store.node_id("handbook:1")
+    assert store.node_type[section] == NODE_SECTION and store.section_chunk[section] == 1
+    assert store.describe(section) == {"id": "handbook:1", "type": "section", "doc_id": "handbook"}
+    assert store.describe(store.node_id("faq")) == {"id": "faq", "type": "doc", "title": "faq.txt"}
+
+    vacation = store.node_id("vacation")
+    assert store.node_type[vacation] == NODE_ENTITY and store.frequency[vacation] == 2
+    for node in range(store.num_nodes):
+        neighbors = store.neighbors(node)
+        # Sorted and de-duplicated even though REFERS_TO is added once per mention.
+        assert np.all(np.diff(neighbors) > 0)
+        for neighbor in neighbors.tolist():
+            assert node in store.neighbors(neighbor).tolist()
+    kinds = {EDGE_KINDS[k] for k in store.edge_kind.tolist()}
+    assert kinds == set(EDGE_KINDS)
+
+
+def test_match_and_traverse_return_chunk_indices_and_paths():
+    store = build_graph_store(DOCS, CHUNKS)
+    seeds = match_entities(store, "How does payroll handle vacation?")
+    assert "payroll" in seeds and "vacation" in seeds
+
+    sections, paths, hops, seed_count = traverse_graph(store, seeds, max_hops=2)
+    assert sorted(set(sections)) == [0, 1] and seed_count == len(seeds) and hops == 1
+    first = paths[0]["nodes"]
+    assert first[0]["type"] == "entity" and first[-1]["type"] == "section"
+
+    # Without a matching entity the walk starts from the first documents.
+    sections, paths, _, seeds_used = traverse_graph(store, [], max_hops=1)
+    assert seeds_used == 0 and set(sections) == {0, 1, 2}
+    assert paths[0]["nodes"][0]["type"] == "doc"
+
+
+def test_empty_corpus_builds_an_empty_graph():
+    store = build_graph_store({}, [])
+    assert store.num_nodes == 0 and store.indptr.tolist() == [0]
+    assert match_entities(store, "anything") == [] and traverse_graph(store, ["x"], 2) == (
+        [],
+        [],
+        0,
+        0,
+    )
+
+
+def test_entity_lookup_matches_phrases_words_and_prefixes():
+    store = build_graph_store(DOCS, CHUNKS)
+    index = store.entity_index
+    assert index.names["the vacation policy"] == store.node_id("the vacation policy")
+    assert index.max_words == 3
+
+    assert "the vacation policy" in match_entities(store, "Explain the vacation policy.")
+    assert "remote work" in match_entities(store, "who approves remote work")
+    # Stopwords alone never match, and unrelated words fall through to prefix search.
+    assert match_entities(store, "the a of") == []
+    prefixed = match_entities(store, "payrol vacat")
+    assert prefixed[0] == "vacation" and "payroll" in prefixed and len(prefixed) <= 5
+
+
+def test_entity_lookup_scales_with_query_not_entity_count():
+    docs = {"big": {"name": "big.txt"}}
+    chunks = [("big", i, i + 1, f"Component{i} Assembly ships with Widget{i}") for i in range(3000)]
+    store = build_graph_store(docs, chunks)
+    assert len(store.entity_index.names) > 3000
+    assert match_entities(store, "where does widget42 ship") == ["widget42"]
+
+
+def test_expansion_records_parents_and_builds_paths_on_demand():
+    store = build_graph_store(DOCS, CHUNKS)
+    traversal = expand_graph(store, ["remote work"], max_hops=3)
+    assert traversal.sections[0] == 2 and traversal.hops_used == 2
+    section = store.node_id("faq:2")
+    assert store.keys[traversal.parent[section]] == "remote work"
+    assert traversal.parent[store.node_id("remote work")] == -1
+
+    only_faq = traversal.paths([2])
+    assert [node["id"] for node in only_faq[0]["nodes"]] == ["remote work", "faq:2"]
+    assert (
+        len(traversal.paths()) == len(traversal.sections) == 1
+    )  # faq shares no entity with handbook
+
+
+def test_expansion_stops_at_the_section_limit_on_large_graphs():
+    docs = {"big": {"name": "big.txt"}}
+    chunks = [("big", i, i + 1, f"Shared Topic plus Item{i}") for i in range(5000)]
+    store = build_graph_store(docs, chunks)
+    traversal = expand_graph(store, ["shared topic"], max_hops=6)
+    assert len(traversal.sections) == MAX_GRAPH_SECTIONS
+    assert traversal.sections == list(range(MAX_GRAPH_SECTIONS))
+    assert traversal.hops_used == 0
+
+
+def test_cooccurrence_index_counts_shared_sections():
+    store = build_graph_store(DOCS, CHUNKS)
+    co = store.cooccurrence
+    assert co.indptr[-1] == len(co.partners) == len(co.weight) == len(co.support_ptr) - 1
+
+    def mentioned(section):
+        row = store.indices[store.indptr[section] : store.indptr[section + 1]]
+        return set(row[store.node_type[row] == NODE_ENTITY].tolist())
+
+    expected = {}
+    for section in store.nodes_of_type(NODE_SECTION):
+        for a in mentioned(section):
+            for b in mentioned(section) - {a}:
+                expected.setdefault((a, b), []).append(int(section))
+    actual = {}
+    for entity in range(store.num_nodes):
+        for j in range(co.indptr[entity], co.indptr[entity + 1]):
+            supports = co.support[co.support_ptr[j] : co.support_ptr[j + 1]].tolist()
+            assert len(supports) == co.weight[j]
+            actual[(entity, int(co.partners[j]))] = supports
+    assert actual == {pair: sorted(sections) for pair, sections in expected.items()}
+    assert all((b, a) in actual for a, b in actual)  # symmetric
+    assert actual[(store.node_id("vacation"), store.node_id("payroll"))] == [
+        store.node_id("handbook:0"),
+        store.node_id("handbook:1"),
+    ]
+
+
+def test_cooccurrence_expansion_reaches_what_a_three_hop_walk_reaches():
+    texts = [
+        "Turbine Blade inspection by Plant Manager",
+        "Plant Manager approves Budget Review",
+        "Plant Manager signs off",
+        "Budget Review meets Finance Office",
+        "Cafeteria Menu changes",
+    ]
+    # One document per section, so the walk can only bridge sections through entities.
+    docs = {f"d{i}": {"name": f"d{i}.txt"} for i in range(len(texts))}
+    store = build_graph_store(docs, [(f"d{i}", i, i + 1, text) for i, text in enumerate(texts)])
+    traversal = expand_cooccurrence(store, ["turbine blade"], max_hops=3)
+    assert traversal.sections[0] == 0 and traversal.hops_used == 2
+    assert set(traversal.sections) == set(
+        expand_graph(store, ["turbine blade"], 3, limit=None).sections
+    )
+    assert set(traversal.sections) == {0, 1, 2}
+    path = traversal.paths([1])[0]["nodes"]
+    assert [node["id"] for node in path] == ["turbine blade", "d0:0", "plant manager", "d1:1"]
+
+    direct = expand_cooccurrence(store, ["turbine blade"], max_hops=1)
+    assert direct.sections == [0] and direct.hops_used == 0
+    # Direct sections only, nothing bridged: one hop, as the BFS walk reports it.
+    unbridged = expand_cooccurrence(store, ["cafeteria menu"], max_hops=3)
+    assert unbridged.sections == [4] and unbridged.hops_used == 1
+    assert expand_cooccurrence(store, ["turbine blade"], max_hops=3, limit=2).sections[0] == 0
+    assert len(expand_cooccurrence(store, ["turbine blade"], max_hops=3, limit=2).sections) == 2
+    # No entity seed: same as the BFS fallback from the documents.
+    assert expand_cooccurrence(store, [], 2).sections == expand_graph(store, [], 2).sections
+
+
+def test_personalized_pagerank_concentrates_mass_near_the_seeds():
+    store = build_graph_store(DOCS, CHUNKS)
+    start = np.array([store.node_id("payroll")], dtype=np.int32)
+    scores = personalized_pagerank(store, start)
+    assert scores.sum() == pytest.approx(1.0)
+    near = scores[store.node_id("handbook:1")]
+    assert near > scores[store.node_id("faq:2")] == 0.0  # faq is disconnected from payroll
+    assert scores[store.node_id("payroll")] > scores[store.node_id("grants")]
+
+
+def test_ranked_sections_are_capped_and_ordered_by_score():
+    docs = {"a": {"name": "a.txt"}}
+    chunks = [("a", 0, 1, "Turbine Blade inspection")]
+    chunks += [("a", i, i + 1, f"Filler{i} paragraph text") for i in range(1, 30)]
+    chunks += [("a", 30, 31, "Turbine Blade cracks and Turbine Blade repair")]
+    store = build_graph_store(docs, chunks)
+    ranked = rank_graph_sections(store, ["turbine blade"], max_hops=3, limit=5)
+    assert len(ranked.sections) == 5 and len(ranked.scores) == 5
+    assert set(ranked.sections[:2]) == {0, 30}
+    assert np.all(np.diff(ranked.scores) <= 0)
+    assert [node["id"] for node in ranked.paths([30])[0]["nodes"]] == ["turbine blade", "a:30"]
+
+
+def test_parallel_extraction_builds_the_same_graph_as_serial():
+    docs = {"a": {"name": "a.txt"}, "b": {"name": "b.txt"}}
+    chunks = [
+        (
+            "a" if i % 3 else "b",
+            i,
+            i + 1,
+            f"Reactor Core{i % 7} feeds Steam Loop and Turbine Hall {i % 5}",
+        )
+        for i in range(60)
+    ]
+    serial = build_graph_store(docs, chunks)
+    try:
+        parallel = build_graph_store(docs, chunks, workers=2, batch_size=7, min_parallel_chunks=0)
+    finally:
+        shutdown_extract_pool()
+    assert parallel.keys == serial.keys and parallel.labels == serial.labels
+    for name in (
+        "node_type",
+        "frequency",
+        "section_chunk",
+        "section_doc",
+        "indptr",
+        "indices",
+        "edge_kind",
+    ):
+        assert np.array_equal(getattr(parallel, name), getattr(serial, name)), name
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import session as session_service
+from app.services.index import build_faiss_index
+from app.services.index_compress import compress_index, hydrate_index
+from app.services.index_store import SessionIndexStore, estimate_index_bytes, private_key
+from app.services.pipeline import prepare_answer_context
+from app.services.retrieve import build_bm25
+from app.services.session import SessionIndex
+
+client = TestClient(app)
+
+
+def _make_index(seed: int, rows: int = 64, dim: int = 32) -> SessionIndex:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = [f"idle chunk {seed} number {i} about turbines and gearboxes" for i in range(rows)]
+    bm25, tokens = build_bm25(texts)
+    return SessionIndex(
+        faiss_index=build_faiss_index(vectors.copy()),
+        chunk_map=[(f"doc-{seed}", i, i + 1, text) for i, text in enumerate(texts)],
+        embeddings=vectors,
+        texts=texts,
+        bm25=bm25,
+        bm25_tokens=tokens,
+        embed_model="fake",
+        index_id=f"idx-{seed}",
+    )
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8", "disk"])
+def test_compressed_index_hydrates_equivalently(mode, tmp_path):
+    index = _make_index(1)
+    compressed = compress_index(index, embeddings_mode=mode, disk_dir=tmp_path)
+    assert compressed.base.faiss_index is None and compressed.base.texts is None
+    assert compressed.nbytes < estimate_index_bytes(index)
+    if mode == "disk":
+        assert len(list(tmp_path.iterdir())) == 1
+
+    hydrated = hydrate_index(compressed)
+    assert hydrated.chunk_map == index.chunk_map and hydrated.texts == index.texts
+    assert hydrated.index_id == "idx-1" and hydrated.embeddings.dtype == np.float32
+    np.testing.assert_allclose(hydrated.embeddings, index.embeddings, atol=0.02)
+    q = index.embeddings[:4]
+    assert (
+        hydrated.faiss_index.search(q, 1)[1].tolist() == index.faiss_index.search(q, 1)[1].tolist()
+    )
+    assert (
+        hydrated.bm25.get_scores(["turbines"]).tolist()
+        == index.bm25.get_scores(["turbines"]).tolist()
+    )
+    assert not list(tmp_path.iterdir())
+
+
+def test_store_compresses_idle_entries_and_hydrates_on_read():
+    store = SessionIndexStore()
+    store.put("idle", _make_index(2))
+    store.put("busy", _make_index(3))
+    before = store.stats()["resident_bytes"]
+
+    assert store.compress_idle(3600) == 0  # both were just used
+    assert store.compress_idle(0) == 2
+    stats = store.stats()
+    assert stats["compressed"] == 2 and stats["resident"] == 0
+    assert stats["bytes_reclaimed"] > 0 and stats["resident_bytes"] < before
+
+    restored = store.get("idle")
+    assert (
+        restored is not None
+        and restored.chunk_map[5][3] == "idle chunk 2 number 5 about turbines and gearboxes"
+    )
+    stats = store.stats()
+    assert stats["hydrations"] == 1 and stats["compressed"] == 1 and stats["resident"] == 1
+    assert stats["last_hydration_ms"] is not None
+    assert store.get("idle") is restored  # resident again: no second hydration
+    store.pop("busy")
+    assert store.stats()["compressed"] == 0
+
+
+@pytest.mark.parametrize("mode", ["float16", "disk"])
+def test_compressed_entries_are_spilled_when_over_budget(monkeypatch, mode):
+    store = SessionIndexStore()
+    store.put("idle", _make_index(2))
+    assert store.compress_idle(0, embeddings_mode=mode) == 1
+    compressed_bytes = store.stats()["resident_bytes"]
+    fresh = _make_index(3)
+    budget = estimate_index_bytes(fresh) + compressed_bytes // 2
+    monkeypatch.setattr("app.services.index_store._budget_bytes", lambda: budget)
+
+    store.put("busy", fresh)
+    stats = store.stats()
+    assert stats["compressed"] == 0 and stats["spilled"] == 1 and stats["resident"] == 1
+    assert stats["resident_bytes"] <= budget
+
+    restored = store.get("idle")
+    assert (
+        restored is not None
+        and restored.chunk_map[5][3] == "idle chunk 2 number 5 about turbines and gearboxes"
+    )
+    assert store.stats()["reloads"] == 1
+
+
+def test_hydrating_a_queued_spill_victim_cancels_the_spill(monkeypatch):
+    from app.services import index_store
+
+    store = SessionIndexStore()
+    store.put("idle", _make_index(2))
+    assert store.compress_idle(0) == 1
+    monkeypatch.setattr("app.services.index_store._budget_bytes", lambda: 1)
+    with store._lock.write():
+        store._enforce_budget(keep="other")
+    key = private_key("idle")
+    assert key in store._to_spill
+
+    restored = store._hydrate(key, store._compressed[key][0])
+    saves = []
+    save = index_store.save_session_index
+
+    def counting_save(index, path):
+        saves.append(path)
+        if len(saves) > 3:
+            raise OSError("spill retried forever")  # ends the loop as a failed save
+        return save(index, path)
+
+    monkeypatch.setattr(index_store, "save_session_index", counting_save)
+    store._flush_spills()
+    assert len(saves) <= 1
+    assert store.stats()["resident"] == 1 and not store._to_spill
+    assert store.get("idle") is restored
+
+
+def test_queries_hydrate_idle_sessions(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_ENABLED", False, raising=False)
+    monkeypatch.setattr(settings, "SESSION_IDLE_COMPRESS_MINUTES", 1, raising=False)
+    monkeypatch.setattr(settings, "RERANK_STRATEGY", "none", raising=False)
+    upload = client.post(
+        "/api/upload",
+        files={
+            "files": (
+                "idle.txt",
+                "The idle windmill gearbox needs oil every spring. " * 20,
+                "text/plain",
+            )
+        },
+    )
+    session_id = upload.json()["session_id"]
+    assert (
+        client.post("/api/index", json={"session_id": session_id, "chunk_size": 80}).status_code
+        == 200
+    )
+
+    assert session_service.compress_idle_session_indexes() == 0  # read moments ago
+    assert session_service._SESSION_INDEXES.compress_idle(0) >= 1
+    assert session_service.session_index_stats()["compressed"] >= 1
+
+    context = prepare_answer_context(session_id, "windmill gearbox oil", 4, "cosine", "grounded")
+    assert context["citations"] and "windmill" in context["chunk_map"][0][3]
+    assert session_service.session_index_stats()["hydrations"] >= 1
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import json
+import types
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import session as session_service
+from app.services.graph import build_graph_store
+from app.services.index import build_faiss_index
+from app.services.index_format import (
+    MANIFEST_FILE,
+    IndexFormatError,
+    load_graph_file,
+    load_session_index,
+    save_graph_file,
+    save_session_index,
+)
+from app.services.retrieve import build_bm25
+from app.services.session import SessionIndex
+
+client = TestClient(app)
+
+
+def _index_with_graph() -> SessionIndex:
+    texts = [
+        "Ada Lovelace wrote notes on the Analytical Engine.",
+        "Charles Babbage designed the Analytical Engine.",
+        "The Difference Engine preceded it.",
+    ]
+    chunk_map = [("doc-1", i * 60, i * 60 + len(t), t) for i, t in enumerate(texts)]
+    rng = np.random.default_rng(7)
+    vectors = rng.standard_normal((len(texts), 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    bm25, tokens = build_bm25(texts)
+    return SessionIndex(
+        faiss_index=build_faiss_index(vectors.copy()),
+        chunk_map=chunk_map,
+        embeddings=vectors,
+        texts=texts,
+        bm25=bm25,
+        bm25_tokens=tokens,
+        embed_model="fake",
+        graph=build_graph_store({"doc-1": {"name": "history.txt"}}, chunk_map),
+    )
+
+
+def test_round_trip_is_memory_mapped_and_equivalent(tmp_path):
+    original = _index_with_graph()
+    save_session_index(original, tmp_path / "idx")
+    manifest = json.loads((tmp_path / "idx" / MANIFEST_FILE).read_text())
+    assert manifest["format_version"] == 3 and manifest["chunks"] == 3
+
+    loaded = load_session_index(tmp_path / "idx")
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert not loaded.embeddings.flags.writeable
+    assert loaded.chunk_map == original.chunk_map
+    q = original.embeddings[:1]
+    assert (
+        loaded.faiss_index.search(q, 3)[1].tolist() == original.faiss_index.search(q, 3)[1].tolist()
+    )
+    assert (
+        loaded.bm25.get_scores(["engine"]).tolist() == original.bm25.get_scores(["engine"]).tolist()
+    )
+    assert loaded.graph.keys == original.graph.keys and loaded.graph.labels == original.graph.labels
+    assert np.array_equal(loaded.graph.indptr, original.graph.indptr)
+    assert np.array_equal(loaded.graph.indices, original.graph.indices)
+    assert loaded.graph.section_chunk[loaded.graph.node_id("doc-1:1")] == 1
+
+
+def test_graph_file_keeps_unicode_and_missing_labels(tmp_path):
+    chunk_map = [
+        ("doc-ü", 0, 30, "Zoë Müller met Ångström Labs."),
+        ("orphan", 0, 10, "Nobody here."),
+    ]
+    graph = build_graph_store({"doc-ü": {"name": "Résumé.pdf"}}, chunk_map)
+    assert graph.labels[graph.node_id("orphan")] is None
+    save_graph_file(graph, tmp_path / "graph.npz")
+    loaded = load_graph_file(tmp_path / "graph.npz")
+    assert loaded.keys == graph.keys and loaded.labels == graph.labels
+    assert np.array_equal(loaded.indptr, graph.indptr)
+
+
+def test_save_replaces_previous_directory(tmp_path):
+    index = _index_with_graph()
+    save_session_index(index, tmp_path / "idx")
+    index.graph = None
+    save_session_index(index, tmp_path / "idx")
+    assert load_session_index(tmp_path / "idx").graph is None
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["idx"]
+
+
+def test_unknown_format_version_is_rejected(tmp_path):
+    save_session_index(_index_with_graph(), tmp_path / "idx")
+    manifest_path = tmp_path / "idx" / MANIFEST_FILE
+    manifest = json.loads(manifest_path.read_text())
+    manifest["format_version"] = 999
+    manifest_path.write_text(json.dumps(manifest))
+    with pytest.raises(IndexFormatError):
+        load_session_index(tmp_path / "idx")
+    with pytest.raises(IndexFormatError):
+        load_session_index(tmp_path / "missing")
+
+
+def test_persisted_session_survives_restart(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_ENABLED", False, raising=False)
+    monkeypatch.setattr(settings, "SESSION_PERSIST_DIR", str(tmp_path / "sessions"), raising=False)
+    upload = client.post(
+        "/api/upload",
+        files={"files": ("notes.txt", b"Persisted sessions restore quickly. " * 10, "text/plain")},
+    )
+    session_id = upload.json()["session_id"]
+    assert (
+        client.post("/api/index", json={"session_id": session_id, "chunk_size": 80}).status_code
+        == 200
+    )
+    before = session_service.get_session_index(session_id).chunk_map
+
+    # Simulate a process restart.
+    session_service.get_session_backend().sessions.pop(session_id)
+    session_service._SESSION_INDEXES.pop(session_id)
+    assert session_service.restore_persisted_sessions() >= 1
+
+    sess = session_service.ensure_session(session_id)
+    assert sess["index"]["embed_model"]
+    restored = session_service.get_session_index(session_id)
+    assert restored is not None and restored.chunk_map == before
+    assert isinstance(restored.embeddings, np.memmap)
+    assert (tmp_path / "sessions" / sess["index"]["artifact"] / MANIFEST_FILE).is_file()
+
+
+def test_expired_persisted_sessions_are_dropped(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SESSION_PERSIST_DIR", str(tmp_path / "sessions"), raising=False)
+    monkeypatch.setattr(settings, "SESSION_TTL_MINUTES", 1, raising=False)
+    sid = session_service.new_session()
+    session_service.save_session(sid, session_service.ensure_session(sid))
+    session_service.get_session_backend().sessions.pop(sid)
+
+    created = json.loads((tmp_path / "sessions" / sid / "session.json").read_text())["created"]
+    assert session_service.restore_persisted_sessions(now=created + 120) == 0
+    assert not (tmp_path / "sessions" / sid).exists()
+
+
+def test_reads_keep_the_persisted_last_access_current(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SESSION_PERSIST_DIR", str(tmp_path / "sessions"), raising=False)
+    monkeypatch.setattr(settings, "SESSION_TTL_MINUTES", 30, raising=False)
+    clock = [1_000.0]
+    monkeypatch.setattr(session_service, "time", types.SimpleNamespace(time=lambda: clock[0]))
+    sid = session_service.new_session()
+    session_service.save_session(sid, session_service.ensure_session(sid))
+    record = tmp_path / "sessions" / sid / "session.json"
+
+    clock[0] += 10  # within the throttle window: no write
+    session_service.ensure_session(sid)
+    assert json.loads(record.read_text())["last_access"] == 1_000.0
+    clock[0] += 25 * 60  # active 25 minutes later, by queries only
+    session_service.incr_query(sid)
+    assert json.loads(record.read_text())["last_access"] == clock[0]
+
+    # Restarted 20 minutes after that last use: still within the TTL.
+    session_service.get_session_backend().sessions.pop(sid)
+    assert session_service.restore_persisted_sessions(now=clock[0] + 20 * 60) == 1
+    assert session_service.get_session(sid) is not None
+
+
+def test_version_1_graph_is_still_readable(tmp_path):
+    original = _index_with_graph()
+    save_session_index(original, tmp_path / "idx")
+    root = tmp_path / "idx"
+    manifest = json.loads((root / MANIFEST_FILE).read_text())
+    graph = original.graph
+    docs = graph.nodes_of_type(0).tolist()
+    sections = graph.nodes_of_type(1).tolist()
+    entities = graph.nodes_of_type(2).tolist()
+    rows = [
+        [src, int(dst), int(kind)]
+        for src in range(graph.num_nodes)
+        for dst, kind in zip(
+            graph.neighbors(src), graph.edge_kind[graph.indptr[src] : graph.indptr[src + 1]]
+        )
+        if src < dst
+    ]
+    (root / "graph_nodes.json").write_text(
+        json.dumps(
+            {
+                "nodes": graph.keys,
+                "kinds": ["SUPPORTS", "MENTIONS", "REFERS_TO"],
+                "docs": [[graph.keys[n], graph.labels[n]] for n in docs],
+                "sections": [
+                    [graph.keys[n], graph.keys[graph.section_doc[n]], int(graph.section_chunk[n])]
+                    for n in sections
+                ],
+                "entities": [
+                    [graph.keys[n], graph.labels[n], int(graph.frequency[n])] for n in entities
+                ],
+            }
+        )
+    )
+    np.save(root / "graph_edges.npy", np.asarray(rows, dtype=np.int32))
+    (root / "graph.npz").unlink()
+    manifest["format_version"] = 1
+    manifest["files"].pop("graph")
+    manifest["files"].update(graph_nodes="graph_nodes.json", graph_edges="graph_edges.npy")
+    (root / MANIFEST_FILE).write_text(json.dumps(manifest))
+
+    loaded = load_session_index(root).graph
+    assert sorted(loaded.keys) == sorted(graph.keys)
+
+    def neighborhood(store, key):
+        node = store.node_id(key)
+        return int(store.frequency[node]), sorted(
+            store.keys[n] for n in store.neighbors(node).tolist()
+        )
+
+    for key in graph.keys:
+        assert neighborhood(loaded, key) == neighborhood(graph, key)
+
+
+def test_version_2_graph_is_still_readable(tmp_path):
+    original = _index_with_graph()
+    root = save_session_index(original, tmp_path / "idx")
+    manifest = json.loads((root / MANIFEST_FILE).read_text())
+    graph = original.graph
+    (root / "graph_nodes.json").write_text(json.dumps({"keys": graph.keys, "labels": graph.labels}))
+    arrays = (
+        "node_type",
+        "frequency",
+        "section_chunk",
+        "section_doc",
+        "indptr",
+        "indices",
+        "edge_kind",
+    )
+    np.savez(root / "graph_csr.npz", **{name: getattr(graph, name) for name in arrays})
+    (root / "graph.npz").unlink()
+    manifest["format_version"] = 2
+    manifest["files"].pop("graph")
+    manifest["files"].update(graph_nodes="graph_nodes.json", graph_arrays="graph_csr.npz")
+    (root / MANIFEST_FILE).write_text(json.dumps(manifest))
+
+    loaded = load_session_index(root).graph
+    assert loaded.keys == graph.keys and loaded.labels == graph.labels
+    assert np.array_equal(loaded.indices, graph.indices) and np.array_equal(
+        loaded.edge_kind, graph.edge_kind
+    )
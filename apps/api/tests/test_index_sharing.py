@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.routers import ingest as ingest_router
+from app.services import session as session_service
+from app.services.index_store import SessionIndexStore
+
+client = TestClient(app)
+
+DOC = b"Onboarding guide. Step one installs the agent. Step two registers the device. " * 8
+
+
+def _configure(monkeypatch) -> list:
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_ENABLED", False, raising=False)
+    calls = []
+    original = ingest_router.embed_stream
+
+    def counting(texts, model, batch_size=None):
+        calls.append(model)
+        return original(texts, model=model, batch_size=batch_size)
+
+    monkeypatch.setattr(ingest_router, "embed_stream", counting)
+    return calls
+
+
+def _upload(name: str = "guide.txt", data: bytes = DOC) -> str:
+    resp = client.post("/api/upload", files={"files": (name, data, "text/plain")})
+    assert resp.status_code == 200
+    return resp.json()["session_id"]
+
+
+def _index(session_id: str, **params) -> dict:
+    resp = client.post(
+        "/api/index", json={"session_id": session_id, "chunk_size": 120, "overlap": 20, **params}
+    )
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def test_identical_corpora_share_one_index(monkeypatch):
+    embed_calls = _configure(monkeypatch)
+    first, second = _upload(), _upload(name="copy-of-guide.txt")
+    built = _index(first)
+    reused = _index(second)
+
+    assert len(embed_calls) == 1
+    assert reused["index_id"] == built["index_id"]
+    assert reused["chunks_indexed"] == built["chunks_indexed"]
+    assert reused["documents"][0]["name"] == "copy-of-guide.txt"
+    assert session_service.get_session_index(first) is session_service.get_session_index(second)
+    assert session_service.session_index_stats()["shared"] >= 1
+
+
+def test_different_parameters_build_separately(monkeypatch):
+    embed_calls = _configure(monkeypatch)
+    data = DOC + b"Parameters differ."
+    first, second = _upload(data=data), _upload(data=data)
+    _index(first)
+    _index(second, chunk_size=60)
+    assert len(embed_calls) == 2
+    assert session_service.get_session_index(first) is not session_service.get_session_index(second)
+
+
+def test_shared_index_outlives_one_session(monkeypatch):
+    _configure(monkeypatch)
+    monkeypatch.setattr(settings, "SESSION_TTL_MINUTES", 1, raising=False)
+    first = _upload(data=DOC + b"Unique tail for the expiry test.")
+    _index(first)
+    second = _upload(data=DOC + b"Unique tail for the expiry test.")
+    _index(second)
+    key = session_service._SESSION_INDEXES.key(second)
+    assert session_service._SESSION_INDEXES.ref_count(key) == 2
+
+    backend = session_service.get_session_backend()
+    backend.sessions[second]["last_access"] += 3600
+    created = backend.sessions[first]["created"]
+    session_service.cleanup_expired_sessions(now=created + 120)
+
+    assert session_service.get_session(first) is None
+    assert session_service._SESSION_INDEXES.ref_count(key) == 1
+    assert session_service.get_session_index(second) is not None
+
+
+def test_mutation_clones_the_shared_index(monkeypatch):
+    _configure(monkeypatch)
+    first, second = _upload(data=DOC + b"Clone me."), _upload(data=DOC + b"Clone me.")
+    _index(first)
+    _index(second)
+    shared = session_service.get_session_index(first)
+
+    private = session_service.session_index_for_update(second)
+    assert private is not shared
+    private.graph = object()
+    assert shared.graph is None
+    assert session_service.get_session_index(second) is private
+    assert session_service.get_session_index(first) is shared
+    assert private.faiss_index is shared.faiss_index  # read-only arrays stay shared
+
+
+def test_identical_reindex_after_restart_reuses_the_persisted_index(monkeypatch, tmp_path):
+    embed_calls = _configure(monkeypatch)
+    monkeypatch.setattr(settings, "SESSION_PERSIST_DIR", str(tmp_path / "sessions"), raising=False)
+    data = DOC + b"Survives a restart."
+    first = _upload(data=data)
+    built = _index(first)
+
+    # Simulate a process restart: the shared entry comes back from disk, attached lazily.
+    session_service.get_session_backend().sessions.pop(first)
+    session_service._SESSION_INDEXES.pop(first)
+    assert session_service.restore_persisted_sessions() >= 1
+    assert session_service.shared_index_info(first)[1]["index_id"] == built["index_id"]
+
+    reused = _index(_upload(data=data))
+    assert reused["index_id"] == built["index_id"]
+    assert len(embed_calls) == 1
+
+
+def test_entries_without_build_metadata_are_not_shared(tmp_path):
+    store = SessionIndexStore()
+    store.attach("a", tmp_path / "shared", version="v1", key="corpus-x")
+    assert store.share("b", "corpus-x") is None and store.key("b") is None
+
+    store.attach("a", tmp_path / "shared", version="v1", key="corpus-x", meta={"index_id": "v1"})
+    assert store.share("b", "corpus-x") == {"index_id": "v1"}
+    assert store.key("b") == "corpus-x"
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.index import build_faiss_index
+from app.services.index_store import SessionIndexStore, estimate_index_bytes
+from app.services.retrieve import build_bm25, hybrid_retrieve
+from app.services.session import SessionIndex, get_session_index
+
+client = TestClient(app)
+
+
+def _make_index(seed: int, rows: int = 64, dim: int = 32) -> SessionIndex:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = [f"chunk {seed} number {i} about widgets" for i in range(rows)]
+    bm25, tokens = build_bm25(texts)
+    return SessionIndex(
+        faiss_index=build_faiss_index(vectors.copy()),
+        chunk_map=[(f"doc-{seed}", i, i + 1, text) for i, text in enumerate(texts)],
+        embeddings=vectors,
+        texts=texts,
+        bm25=bm25,
+        bm25_tokens=tokens,
+        embed_model="fake",
+        chunk_aliases={0: [(f"doc-{seed}-copy", 0, 1)]},
+    )
+
+
+def test_least_recently_used_index_spills_and_reloads(monkeypatch):
+    first, second = _make_index(1), _make_index(2)
+    budget = estimate_index_bytes(first) + estimate_index_bytes(second) // 2
+    store = SessionIndexStore()
+    monkeypatch.setattr("app.services.index_store._budget_bytes", lambda: budget)
+
+    store.put("a", first)
+    store.put("b", second)
+    stats = store.stats()
+    assert stats["resident"] == 1 and stats["spilled"] == 1 and stats["spills"] == 1
+
+    reloaded = store.get("a")
+    assert reloaded is not None
+    assert isinstance(reloaded.embeddings, np.memmap)
+    assert reloaded.chunk_map == first.chunk_map
+    assert reloaded.chunk_aliases == first.chunk_aliases
+    np.testing.assert_allclose(reloaded.embeddings, first.embeddings)
+    q = first.embeddings[:1]
+    assert (
+        reloaded.faiss_index.search(q, 3)[1].tolist() == first.faiss_index.search(q, 3)[1].tolist()
+    )
+    assert (
+        reloaded.bm25.get_scores(["widgets"]).tolist()
+        == first.bm25.get_scores(["widgets"]).tolist()
+    )
+    # Loading "a" pushed "b" out instead.
+    assert store.stats()["spilled"] == 1 and store.stats()["reloads"] == 1
+    assert "b" in store
+
+
+def test_pop_removes_spill_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SESSION_INDEX_SPILL_DIR", str(tmp_path / "spill"), raising=False)
+    monkeypatch.setattr("app.services.index_store._budget_bytes", lambda: 1)
+    store = SessionIndexStore()
+    store.put("a", _make_index(1))
+    store.put("b", _make_index(2))
+    assert (tmp_path / "spill" / "session-a").is_dir()
+    store.pop("a")
+    assert "a" not in store
+    assert not (tmp_path / "spill" / "session-a").exists()
+
+
+def test_spills_are_written_outside_the_store_lock(monkeypatch):
+    from app.services import index_store
+
+    monkeypatch.setattr("app.services.index_store._budget_bytes", lambda: 1)
+    store = SessionIndexStore()
+    writers = []
+    save = index_store.save_session_index
+
+    def recording_save(index, path):
+        writers.append(store._lock._writer)
+        return save(index, path)
+
+    monkeypatch.setattr(index_store, "save_session_index", recording_save)
+    store.put("a", _make_index(1))
+    store.put("b", _make_index(2))
+    assert writers == [None]
+    assert store.stats()["spilled"] == 1
+    assert store.get("a").chunk_map == _make_index(1).chunk_map
+
+
+def test_failed_spills_keep_the_index_resident(monkeypatch):
+    from app.services import index_store
+
+    def failing_save(index, path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("app.services.index_store._budget_bytes", lambda: 1)
+    monkeypatch.setattr(index_store, "save_session_index", failing_save)
+    store = SessionIndexStore()
+    store.put("a", _make_index(1))
+    store.put("b", _make_index(2))
+    stats = store.stats()
+    assert stats["resident"] == 2 and stats["spilled"] == 0
+    assert store.get("a") is not None
+
+
+def test_queries_survive_a_spill(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_ENABLED", False, raising=False)
+    monkeypatch.setattr("app.services.index_store._budget_bytes", lambda: 1)
+
+    sessions = []
+    for name in ("alpha", "beta"):
+        upload = client.post(
+            "/api/upload",
+            files={
+                "files": (
+                    f"{name}.txt",
+                    f"The {name} reactor uses cooling rods. " * 20,
+                    "text/plain",
+                )
+            },
+        )
+        session_id = upload.json()["session_id"]
+        assert (
+            client.post("/api/index", json={"session_id": session_id, "chunk_size": 80}).status_code
+            == 200
+        )
+        sessions.append(session_id)
+
+    sidx = get_session_index(sessions[0])
+    assert sidx is not None and isinstance(sidx.embeddings, np.memmap)
+    hits, _info = hybrid_retrieve(
+        sidx,
+        np.asarray(sidx.embeddings[:1]),
+        "alpha reactor",
+        strategy="hybrid",
+        dense_k=4,
+        lexical_k=4,
+        fusion_rrf_k=60,
+        answer_top_k=2,
+        mmr_lambda=0.5,
+        use_mmr=True,
+    )
+    assert hits and "alpha" in sidx.chunk_map[hits[0].idx][3]
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import session as session_service
+from app.services.index_store import SessionIndexStore
+from app.services.session_backend import SqliteSessionBackend
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def sqlite_sessions(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "fake", raising=False)
+    monkeypatch.setattr(settings, "GCS_INGESTION_ENABLED", False, raising=False)
+    monkeypatch.setattr(settings, "SESSION_BACKEND", "sqlite", raising=False)
+    monkeypatch.setattr(settings, "SESSION_PERSIST_DIR", str(tmp_path / "shared"), raising=False)
+    return tmp_path / "shared"
+
+
+def _upload_and_index(text: str, chunk_size: int = 80) -> str:
+    upload = client.post("/api/upload", files={"files": ("notes.txt", text.encode(), "text/plain")})
+    assert upload.status_code == 200
+    session_id = upload.json()["session_id"]
+    resp = client.post("/api/index", json={"session_id": session_id, "chunk_size": chunk_size})
+    assert resp.status_code == 200
+    return session_id
+
+
+def _as_other_worker(monkeypatch) -> None:
+    """Drop everything held in this process so state must come from shared storage."""
+    monkeypatch.setattr(session_service, "_SESSION_INDEXES", SessionIndexStore())
+
+
+def test_other_worker_serves_session_from_shared_storage(sqlite_sessions, monkeypatch):
+    session_id = _upload_and_index("Shared storage lets any worker answer. " * 10)
+    built = session_service.get_session_index(session_id)
+
+    _as_other_worker(monkeypatch)
+    sess = session_service.ensure_session(session_id)
+    assert sess["docs"] and sess["index"]["embed_model"]
+    loaded = session_service.get_session_index(session_id)
+    assert loaded is not None and loaded.chunk_map == built.chunk_map
+    assert isinstance(loaded.embeddings, np.memmap)
+
+
+def test_reindex_on_one_worker_is_picked_up_by_another(sqlite_sessions, monkeypatch):
+    session_id = _upload_and_index(
+        " ".join(f"Sentence {i} about rebuilt indexes." for i in range(40)), chunk_size=400
+    )
+    stale = session_service.get_session_index(session_id)
+    original_store = session_service._SESSION_INDEXES
+
+    _as_other_worker(monkeypatch)
+    assert (
+        client.post("/api/index", json={"session_id": session_id, "chunk_size": 40}).status_code
+        == 200
+    )
+
+    monkeypatch.setattr(session_service, "_SESSION_INDEXES", original_store)
+    fresh = session_service.get_session_index(session_id)
+    assert fresh.index_id != stale.index_id
+    assert len(fresh.chunk_map) > len(stale.chunk_map)
+
+
+def test_query_counter_is_atomic_across_connections(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    first, second = SqliteSessionBackend(path), SqliteSessionBackend(path)
+    first.create("sid", {"created": 0.0, "last_access": 0.0, "docs": {}, "index": None}, 0.0)
+
+    def bump(backend: SqliteSessionBackend) -> None:
+        for _ in range(50):
+            backend.incr_query("sid", 1.0)
+
+    threads = [
+        threading.Thread(target=bump, args=(backend,)) for backend in (first, second, first, second)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert second.load("sid")["queries_used"] == 200
+    # A stale record written back must not clobber the counter.
+    first.save("sid", {"created": 0.0, "docs": {"d": {}}, "index": None, "queries_used": 1})
+    assert second.load("sid")["queries_used"] == 200
+
+
+def test_unchanged_records_are_not_decoded_again(tmp_path, monkeypatch):
+    from app.services import session_backend
+
+    path = tmp_path / "sessions.sqlite3"
+    first, second = SqliteSessionBackend(path), SqliteSessionBackend(path)
+    docs = {"d": {"name": "d.txt", "text": "full document text " * 1000}}
+    first.create("sid", {"created": 0.0, "last_access": 0.0, "docs": docs, "index": None}, 0.0)
+    assert second.load("sid")["docs"] == docs
+
+    decoded = []
+    loads = session_backend.json.loads
+    monkeypatch.setattr(
+        session_backend.json, "loads", lambda data: decoded.append(1) or loads(data)
+    )
+    loaded = second.load("sid")
+    loaded["docs"]["d"]["name"] = "mutated by a caller"
+    assert second.load("sid")["docs"] == docs and not decoded
+
+    # A write by another worker bumps the version and is picked up.
+    first.save("sid", {"created": 0.0, "docs": {}, "index": None})
+    assert second.load("sid")["docs"] == {}
+    # Recreating an expired sid must not serve the old cached record either.
+    second.expire(10.0, 1.0)
+    first.create("sid", {"created": 5.0, "last_access": 5.0, "docs": docs, "index": None}, 6.0)
+    assert second.load("sid")["docs"] == docs
+
+
+def test_expiry_removes_records_and_artifacts(sqlite_sessions, monkeypatch):
+    session_id = _upload_and_index("Expired sessions free their artifacts. " * 10)
+    assert (sqlite_sessions / session_service.get_session(session_id)["index"]["artifact"]).is_dir()
+    created = session_service.get_session(session_id)["created"]
+
+    evicted = session_service.cleanup_expired_sessions(
+        now=created + settings.SESSION_TTL_MINUTES * 60 + 3600
+    )
+    assert evicted >= 1
+    assert session_service.get_session(session_id) is None
+    assert not (
+        sqlite_sessions / session_id
+    ).exists()  # session record dir; shared artifacts are kept
+    assert session_service.get_session_index(session_id) is None
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services import session as session_service
+from app.services.concurrency import RWLock
+from app.services.index import build_faiss_index
+from app.services.index_store import SessionIndexStore, estimate_index_bytes
+from app.services.session import SessionIndex
+from app.services.session_backend import MemorySessionBackend
+
+
+def _make_index(seed: int, rows: int = 32, dim: int = 16) -> SessionIndex:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = [f"chunk {seed} number {i}" for i in range(rows)]
+    return SessionIndex(
+        faiss_index=build_faiss_index(vectors.copy()),
+        chunk_map=[(f"doc-{seed}", i, i + 1, text) for i, text in enumerate(texts)],
+        embeddings=vectors,
+        texts=texts,
+        index_id=f"idx-{seed}",
+    )
+
+
+def test_rwlock_admits_concurrent_readers_and_excludes_writers():
+    lock = RWLock()
+    inside = []
+    both_reading = threading.Barrier(2, timeout=5)
+
+    def reader() -> None:
+        with lock.read():
+            both_reading.wait()  # would time out if readers excluded each other
+            inside.append("r")
+
+    threads = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert inside == ["r", "r"]
+
+    order = []
+
+    def late_reader() -> None:
+        with lock.read():
+            order.append("read")
+
+    with lock.write():
+        blocked = threading.Thread(target=late_reader)
+        blocked.start()
+        time.sleep(0.05)
+        order.append("write")
+        with lock.read():  # the writer may re-enter as a reader
+            pass
+    blocked.join(timeout=5)
+    assert order == ["write", "read"]
+
+
+def test_concurrent_query_counts_are_exact():
+    backend = MemorySessionBackend(stripes=4)
+    now = time.time()
+    for sid in ("a", "b"):
+        backend.create(sid, {"created": now, "last_access": now, "queries_used": 0}, now + 60)
+
+    def hammer(sid: str) -> None:
+        for _ in range(500):
+            backend.incr_query(sid, time.time())
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(hammer, ["a", "b"] * 4))
+    assert backend.load("a")["queries_used"] == 2000
+    assert backend.load("b")["queries_used"] == 2000
+
+
+def test_save_keeps_counters_advanced_by_other_threads():
+    backend = MemorySessionBackend()
+    backend.create("sid", {"created": 0.0, "last_access": 0.0, "queries_used": 0}, 60.0)
+    stale = dict(backend.load("sid"))
+    backend.incr_query("sid", 5.0)
+    backend.save("sid", {**stale, "docs": {"d": {}}})
+    record = backend.load("sid")
+    assert record["queries_used"] == 1 and record["docs"] == {"d": {}}
+
+
+def test_index_swaps_under_concurrent_readers(monkeypatch):
+    first, second = _make_index(1), _make_index(2)
+    budget = estimate_index_bytes(first) + estimate_index_bytes(second) // 2
+    monkeypatch.setattr("app.services.index_store._budget_bytes", lambda: budget)
+    store = SessionIndexStore()
+    store.put("other", _make_index(3))
+    store.put("sid", first)
+    stop = threading.Event()
+    seen: set[str] = set()
+    errors: list[BaseException] = []
+
+    def read() -> None:
+        try:
+            while not stop.is_set():
+                index = store.get("sid")
+                if index is not None:
+                    assert index.index_id in {"idx-1", "idx-2"}
+                    assert len(index.chunk_map) == 32
+                    seen.add(index.index_id)
+                store.get("other")  # forces spills and reloads of the neighbour
+        except BaseException as exc:  # pragma: no cover - surfaced below
+            errors.append(exc)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for i in range(50):
+        store.put("sid", second if i % 2 else first)
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert not errors
+    assert seen <= {"idx-1", "idx-2"}
+    assert store.stats()["sessions"] == 2
+
+
+def test_index_install_after_eviction_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TTL_MINUTES", 1, raising=False)
+    sid = session_service.new_session()
+    created = session_service.get_session(sid)["created"]
+    assert session_service.cleanup_expired_sessions(now=created + 61) >= 1
+
+    with pytest.raises(ValueError):
+        session_service.set_session_index(sid, _make_index(4))
+    assert session_service.get_session_index(sid) is None
+
+
+def test_cleanup_races_with_queries_without_errors(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TTL_MINUTES", 1, raising=False)
+    sids = [session_service.new_session() for _ in range(20)]
+    for i, sid in enumerate(sids):
+        session_service.set_session_index(sid, _make_index(100 + i))
+    far_future = time.time() + 3600
+
+    def query(sid: str) -> str:
+        try:
+            session_service.incr_query(sid)
+        except ValueError:
+            return "expired"
+        index = session_service.get_session_index(sid)
+        return "ok" if index is None or index.chunk_map else "broken"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(query, sid) for sid in sids * 5]
+        evicted = session_service.cleanup_expired_sessions(now=far_future)
+        results = [future.result() for future in futures]
+
+    assert evicted >= 1 and "broken" not in results
+    assert all(session_service.get_session(sid) is None for sid in sids)
+    assert not any(sid in session_service._SESSION_INDEXES for sid in sids)
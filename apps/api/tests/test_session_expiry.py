@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from app.config import settings
+from app.services import session as session_service
+from app.services.observability import get_metrics_summary, reset_metrics
+
+
+def test_idle_sessions_are_evicted_after_ttl(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TTL_MINUTES", 1, raising=False)
+    reset_metrics()
+    sid = session_service.new_session()
+    created = session_service.get_session(sid)["created"]
+
+    assert session_service.cleanup_expired_sessions(now=created + 30) == 0
+    assert session_service.get_session(sid) is not None
+
+    assert session_service.cleanup_expired_sessions(now=created + 61) >= 1
+    assert session_service.get_session(sid) is None
+    summary = get_metrics_summary()
+    assert summary["sessions_evicted"] >= 1
+    assert summary["last_eviction_ts"] is not None
+
+
+def test_access_extends_the_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TTL_MINUTES", 1, raising=False)
+    sid = session_service.new_session()
+    session = session_service.ensure_session(sid)
+    session["last_access"] = session["created"] + 50
+
+    session_service.cleanup_expired_sessions(now=session["created"] + 61)
+    assert session_service.get_session(sid) is not None
+
+    session_service.cleanup_expired_sessions(now=session["created"] + 111)
+    assert session_service.get_session(sid) is None
+
+
+def test_cleanup_is_a_peek_when_nothing_is_due(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TTL_MINUTES", 60, raising=False)
+    for _ in range(5):
+        session_service.new_session()
+    heap = session_service.get_session_backend().heap
+    heap_before = list(heap)
+    assert session_service.cleanup_expired_sessions(now=time.time()) == 0
+    assert heap == heap_before
+
+
+def test_background_reaper_runs_and_stops(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TTL_MINUTES", 0, raising=False)
+    sid = session_service.new_session()
+
+    async def run_once() -> None:
+        task = asyncio.create_task(session_service.run_session_reaper(interval_seconds=1))
+        await asyncio.sleep(0.05)
+        assert session_service.reaper_running()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run_once())
+    assert session_service.get_session(sid) is None
+    assert not session_service.reaper_running()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import io
+import tarfile
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import session as session_service
+from app.services.index import build_faiss_index
+from app.services.observability import get_metrics_summary, reset_metrics
+from app.services.retrieve import build_bm25
+from app.services.session import SessionIndex
+from app.services.snapshot import SnapshotError, export_snapshot, import_snapshot
+
+client = TestClient(app)
+
+
+def _make_index(seed: int, rows: int = 24, dim: int = 16) -> SessionIndex:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = [f"snapshot chunk {seed} number {i}" for i in range(rows)]
+    bm25, tokens = build_bm25(texts)
+    return SessionIndex(
+        faiss_index=build_faiss_index(vectors.copy()),
+        chunk_map=[(f"doc-{seed}", i, i + 1, text) for i, text in enumerate(texts)],
+        embeddings=vectors,
+        texts=texts,
+        bm25=bm25,
+        bm25_tokens=tokens,
+        embed_model="fake",
+        index_id=f"idx-{seed}",
+    )
+
+
+def _indexed_session(
+    index: SessionIndex, share_key: str | None = None, meta: dict | None = None
+) -> str:
+    sid = session_service.new_session()
+    session = session_service.ensure_session(sid)
+    session["docs"] = {"d1": {"name": "doc.txt"}}
+    artifact = session_service.set_session_index(sid, index, share_key=share_key, meta=meta)
+    session["index"] = {
+        "index_id": index.index_id,
+        "chunks": len(index.chunk_map),
+        "artifact": artifact,
+    }
+    session_service.incr_query(sid)
+    session_service.save_session(sid, session)
+    return sid
+
+
+def _evict(sids: list[str]) -> None:
+    backend = session_service.get_session_backend()
+    for sid in sids:
+        backend.sessions.pop(sid, None)
+        session_service._SESSION_INDEXES.pop(sid)
+
+
+def test_export_then_import_restores_sessions_and_indexes(tmp_path):
+    reset_metrics()
+    private = _indexed_session(_make_index(1))
+    meta = {"index_id": "idx-2", "chunks_indexed": 24}
+    sharers = [_indexed_session(_make_index(2), share_key="corpus-snap-a", meta=meta)]
+    sharers.append(session_service.new_session())
+    assert session_service.share_session_index(sharers[1], "corpus-snap-a") is not None
+    session_service.get_session(sharers[1])["index"] = {"index_id": "idx-2", "chunks": 24}
+
+    path = tmp_path / "sessions.tar.gz"
+    exported = export_snapshot(path)
+    by_sid = {entry["session_id"]: entry for entry in exported["sessions"]}
+    assert path.is_file() and exported["compressed_bytes"] > 0
+    assert by_sid[sharers[0]]["index"] == by_sid[sharers[1]]["index"] == "shared/corpus-snap-a"
+    # The shared index is written once.
+    assert min(by_sid[s]["bytes"] for s in sharers) < by_sid[private]["bytes"]
+
+    _evict([private, *sharers])
+    report = import_snapshot(path, workers=2)
+    statuses = {entry["session_id"]: entry["status"] for entry in report["sessions"]}
+    assert statuses[private] == statuses[sharers[0]] == statuses[sharers[1]] == "restored"
+    assert all(entry["ms"] >= 0 and entry["bytes"] > 0 for entry in report["sessions"])
+
+    assert session_service.get_session(private)["queries_used"] == 1
+    restored = session_service.get_session_index(private)
+    assert restored.index_id == "idx-1" and restored.chunk_map[3][3] == "snapshot chunk 1 number 3"
+    assert session_service.get_session_index(sharers[1]) is session_service.get_session_index(
+        sharers[0]
+    )
+
+    summary = get_metrics_summary()["snapshots"]
+    assert summary["export"]["sessions"] >= 3 and summary["import"]["sessions"] >= 3
+
+
+def test_import_skips_live_and_expired_sessions(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_TTL_MINUTES", 1, raising=False)
+    sid = _indexed_session(_make_index(3))
+    path = tmp_path / "sessions.tar.gz"
+    export_snapshot(path)
+
+    live = import_snapshot(path)
+    assert {e["session_id"]: e["status"] for e in live["sessions"]}[sid] == "exists"
+
+    _evict([sid])
+    late = import_snapshot(path, now=time.time() + 120)
+    assert {e["session_id"]: e["status"] for e in late["sessions"]}[sid] == "expired"
+    assert session_service.get_session(sid) is None
+
+
+def test_import_rejects_garbage(tmp_path):
+    bogus = tmp_path / "bogus.tar.gz"
+    bogus.write_bytes(b"not a tarball")
+    with pytest.raises(SnapshotError):
+        import_snapshot(bogus)
+
+
+def test_import_without_extraction_filters_stays_inside_its_directory(tmp_path, monkeypatch):
+    # Python < 3.11.4: no tarfile.data_filter, and extractall takes no filter argument.
+    monkeypatch.delattr(tarfile, "data_filter")
+    extractall = tarfile.TarFile.extractall
+
+    def old_extractall(self, path=".", members=None, *, numeric_owner=False, **kwargs):
+        if kwargs:
+            raise TypeError(f"unexpected keyword arguments {sorted(kwargs)}")
+        return extractall(self, path, members, numeric_owner=numeric_owner)
+
+    monkeypatch.setattr(tarfile.TarFile, "extractall", old_extractall)
+    sid = _indexed_session(_make_index(4))
+    path = tmp_path / "sessions.tar.gz"
+    export_snapshot(path)
+    _evict([sid])
+    report = import_snapshot(path)
+    assert {e["session_id"]: e["status"] for e in report["sessions"]}[sid] == "restored"
+
+    escaping = tmp_path / "escaping.tar.gz"
+    with tarfile.open(escaping, "w:gz") as tar:
+        info = tarfile.TarInfo("../outside.txt")
+        info.size = 2
+        tar.addfile(info, io.BytesIO(b"hi"))
+    with pytest.raises(SnapshotError):
+        import_snapshot(escaping)
+    assert not (tmp_path / "outside.txt").exists()
+
+
+def test_snapshot_endpoints_require_auth():
+    assert client.post("/api/admin/sessions/export").status_code == 403
+
+
+def test_snapshot_endpoints_round_trip(monkeypatch):
+    monkeypatch.setattr("app.routers.snapshots.google_auth_enabled_effective", lambda: True)
+    monkeypatch.setattr("app.routers.snapshots.require_admin", lambda user: user)
+    sid = _indexed_session(_make_index(4))
+
+    exported = client.post("/api/admin/sessions/export")
+    assert exported.status_code == 200
+    assert int(exported.headers["X-Snapshot-Sessions"]) >= 1
+
+    _evict([sid])
+    imported = client.post(
+        "/api/admin/sessions/import",
+        files={"file": ("sessions.tar.gz", exported.content, "application/gzip")},
+    )
+    assert imported.status_code == 200
+    assert {e["session_id"]: e["status"] for e in imported.json()["sessions"]}[sid] == "restored"
+    assert session_service.get_session_index(sid).index_id == "idx-4"